@@ -4,17 +4,38 @@ Export MVP dataset from EDA notebook for application development
 """
 
 import pandas as pd
+import numpy as np
 import json
 import os
+import sys
 from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.diet_app.config.settings import settings
+from src.diet_app.data.classifier import CATEGORIES, FLAG_EXCLUDES, classify_recipes
+from src.diet_app.data.cube import CUBE_FILE, AggregateCube
+from src.diet_app.data.dedup import (CLUSTER_COLUMN, CLUSTER_SIZE_COLUMN, DUPLICATES_FILE, MinHashDeduplicator,
+                                     collapse_near_duplicates)
+from src.diet_app.data.ingredients import QUANTITY_TABLE_FILE, build_quantity_table
+from src.diet_app.data.keywords import (INGREDIENT_MATRIX_FILE, INGREDIENT_VOCAB_FILE, KEYWORD_MATRIX_FILE,
+                                        KEYWORD_VOCAB_FILE, build_keyword_index)
+from src.diet_app.data.partitions import MANIFEST_FILE, PARTITION_DIR, write_partitions
+from src.diet_app.models.ranking import add_rank_score, category_ranges, sort_by_rank
+from src.diet_app.utils.profiling import profiler
 
 def export_mvp_dataset():
     """Export the clean MVP dataset and metadata"""
     
+    # DIET_APP_PROFILE_MEMORY=1 records memory per stage below; a stage that
+    # pushes peak RSS over DIET_APP_MEMORY_BUDGET_MB fails the export
+    profiler.checkpoint('startup')
     print("Loading original dataset...")
     # Load the original dataset
     df = pd.read_csv('data/recipes.csv')
     print(f"Original dataset shape: {df.shape}")
+    profiler.checkpoint('read recipes.csv')
     
     # Apply the same cleaning and feature engineering as in notebook
     print("Applying data cleaning...")
@@ -31,6 +52,7 @@ def export_mvp_dataset():
             df = df[~outliers]
     
     print(f"After outlier removal: {df.shape}")
+    profiler.checkpoint('outlier removal')
     
     # Feature engineering - Clean keywords
     print("Engineering features...")
@@ -43,23 +65,13 @@ def export_mvp_dataset():
     # Encode Easy feature
     df['Easy'] = df['Keywords'].apply(lambda x: 1 if 'easy' in x else 0)
     
-    # Encode Vegan feature
-    meat_list = ['beef', 'pork', 'chicken', 'turkey', 'fish', 'lamb', 'meat', 'bacon', 'ham']
-    animal_products = ['cheese', 'milk', 'butter', 'cream', 'egg', 'honey', 'yogurt']
-    df['Vegan'] = df['Keywords'].apply(
-        lambda x: 1 if not any(item in x for item in meat_list + animal_products) else 0
-    )
-    
-    # Encode Vegetarian feature  
-    df['Vegetarian'] = df['Keywords'].apply(
-        lambda x: 1 if not any(meat_item in x for meat_item in meat_list) else 0
-    )
-    
-    # Encode Pescatarian feature (allows fish but no other meat)
-    non_fish_meat = ['beef', 'pork', 'chicken', 'turkey', 'lamb', 'meat', 'bacon', 'ham']
-    df['Pescatarian'] = df['Keywords'].apply(
-        lambda x: 1 if not any(meat_item in x for meat_item in non_fish_meat) else 0
-    )
+    # Diet flags (Vegan, Vegetarian, Pescatarian, GlutenFree, DairyFree) from the
+    # ingredient list: every term list runs as one automaton, scanned once per
+    # distinct ingredient; the ingredient index built here is exported below
+    diet_flags, ingredient_index = classify_recipes(df['RecipeIngredientParts'], df['RecipeId'])
+    for flag in diet_flags.columns:
+        df[flag] = diet_flags[flag].to_numpy()
+    profiler.checkpoint('ingredient classification')
     
     # Encode time-based features
     quick_keywords = ['< 15 mins', '< 30 mins', 'quick', 'fast']
@@ -78,19 +90,6 @@ def export_mvp_dataset():
         lambda x: 1 if any(kw in x for kw in long_prep_keywords) else 0
     )
     
-    # Encode dietary restriction features
-    gluten_free_keywords = ['gluten-free', 'gluten free', 'celiac', 'wheat-free', 'wheat free']
-    df['GlutenFree'] = df['Keywords'].apply(
-        lambda x: 1 if any(kw in x for kw in gluten_free_keywords) else 0
-    )
-    
-    dairy_free_keywords = ['dairy-free', 'dairy free', 'lactose-free', 'lactose free', 'vegan']
-    dairy_products = ['milk', 'cheese', 'butter', 'cream', 'yogurt']
-    df['DairyFree'] = df['Keywords'].apply(
-        lambda x: 1 if (any(kw in x for kw in dairy_free_keywords) or 
-                       not any(dairy in x for dairy in dairy_products)) else 0
-    )
-    
     # Encode nutritional categories
     df['LowCalorie'] = (df['Calories'] < 300).astype(int)
     df['ModerateCalorie'] = ((df['Calories'] >= 300) & (df['Calories'] <= 600)).astype(int)
@@ -116,6 +115,37 @@ def export_mvp_dataset():
     
     df['MealCat'] = df['RecipeCategory'].str.lower().map(meal_category_mapping).fillna('Lunch/Dinner')
     
+    # Ranking score (Bayesian average of rating and review count), with rows
+    # presorted best-first inside each MealCat so the planner never sorts
+    print("Computing ranking scores...")
+    ranking_info = add_rank_score(df)
+    df = sort_by_rank(df)
+    profiler.checkpoint('features + ranking')
+    
+    # Collapse near-duplicate recipes (MinHash/LSH over ingredients + name words,
+    # within each MealCat) to their best-ranked variant
+    dedup_report = None
+    duplicates = None
+    if settings.DEDUP_ENABLED:
+        print("Collapsing near-duplicate recipes...")
+        deduplicator = MinHashDeduplicator(threshold=settings.DEDUP_THRESHOLD,
+                                           time_budget=settings.DEDUP_TIME_BUDGET_S or None)
+        df, duplicates, dedup_report = collapse_near_duplicates(df, ingredient_index, deduplicator)
+        print(f"After deduplication: {df.shape} "
+              f"({dedup_report['rows_removed']:,} rows in {dedup_report['clusters_with_duplicates']:,} clusters "
+              f"collapsed, -{dedup_report['shrink_pct']:.1f}%, "
+              f"{dedup_report['memory_mb_before']:.1f} -> {dedup_report['memory_mb_after']:.1f} MB, "
+              f"{dedup_report['seconds']:.1f}s)")
+        for cluster in dedup_report['largest_clusters'][:5]:
+            print(f"  {cluster['size']:>4} x {cluster['name']}")
+        if not dedup_report['complete']:
+            print(f"⚠️  Deduplication stopped at its {settings.DEDUP_TIME_BUDGET_S:.0f}s budget; "
+                  f"remaining rows kept as-is")
+    else:
+        df[CLUSTER_COLUMN] = df['RecipeId']
+        df[CLUSTER_SIZE_COLUMN] = 1
+    profiler.checkpoint('deduplication')
+    
     # Define MVP features and columns
     mvp_features = [
         'Easy', 'Vegan', 'Vegetarian', 'Pescatarian',
@@ -129,6 +159,7 @@ def export_mvp_dataset():
         # Basic recipe information
         'RecipeId', 'Name', 'Description', 'RecipeCategory', 'MealCat', 'AggregatedRating', 'ReviewCount',
         'CookTime', 'PrepTime', 'TotalTime', 'RecipeYield', 'RecipeInstructions', 'RecipeIngredientQuantities',
+        'RankScore', CLUSTER_COLUMN, CLUSTER_SIZE_COLUMN,
         
         # Nutritional information
         'Calories', 'ProteinContent', 'FatContent', 'SaturatedFatContent', 
@@ -150,6 +181,7 @@ def export_mvp_dataset():
     
     print(f"MVP dataset shape: {mvp_df.shape}")
     print(f"Memory usage: {mvp_df.memory_usage(deep=True).sum() / 1024**2:.1f} MB")
+    profiler.checkpoint('select MVP columns')
     
     # Export dataset
     print("Exporting MVP dataset...")
@@ -159,6 +191,47 @@ def export_mvp_dataset():
     
     mvp_df.to_pickle('data/mvp_recipes_clean.pkl')
     print(f"✅ Exported Pickle: {len(mvp_df):,} recipes to mvp_recipes_clean.pkl")
+    profiler.checkpoint('write CSV + pickle')
+    
+    if duplicates is not None:
+        duplicates.to_csv(Path('data') / DUPLICATES_FILE, index=False)
+        print(f"✅ Exported {len(duplicates):,} collapsed recipe IDs to {DUPLICATES_FILE}")
+    
+    # One CSV per (MealCat, diet class) + manifest, so scoped loaders read only what they need
+    manifest = write_partitions(mvp_df, Path('data'), mvp_features)
+    print(f"✅ Exported {len(manifest.partitions)} partitions to data/{PARTITION_DIR}/ "
+          f"(manifest: {MANIFEST_FILE})")
+    profiler.checkpoint('partitions')
+    
+    # Keyword vocabulary + sparse recipe x keyword matrix, rows in dataset order
+    keyword_index = build_keyword_index(mvp_df['Keywords'], mvp_df['RecipeId'])
+    keyword_index.save(Path('data'))
+    print(f"✅ Exported keyword index: {len(keyword_index.vocabulary):,} keywords, "
+          f"{keyword_index.matrix.nnz:,} recipe tags")
+    profiler.checkpoint('keyword index')
+    
+    # Same encoding for ingredient names, used by ingredient: filter expressions
+    # (built by the diet classifier before ranking reordered the rows)
+    ingredient_index = ingredient_index.aligned_to(mvp_df['RecipeId'].to_numpy())
+    ingredient_index.save(Path('data'), INGREDIENT_VOCAB_FILE, INGREDIENT_MATRIX_FILE)
+    print(f"✅ Exported ingredient index: {len(ingredient_index.vocabulary):,} ingredients")
+    profiler.checkpoint('ingredient index')
+    
+    # Numeric amounts with normalized units per (recipe, ingredient), for shopping lists
+    quantity_table = build_quantity_table(mvp_df['RecipeIngredientParts'], mvp_df['RecipeIngredientQuantities'],
+                                          mvp_df['RecipeId'], ingredient_index.vocabulary)
+    quantity_table.save(Path('data'))
+    print(f"✅ Exported ingredient quantities: {quantity_table.n_entries:,} entries "
+          f"({int(np.isnan(quantity_table.amounts).sum()):,} without a parseable amount)")
+    profiler.checkpoint('ingredient quantities')
+    
+    # Count / sum / sum-of-squares per (flag combination x MealCat) for O(1) stats
+    nutrition_columns = ['Calories', 'ProteinContent', 'FatContent', 'SaturatedFatContent',
+                         'CarbohydrateContent', 'SodiumContent', 'FiberContent', 'SugarContent']
+    cube = AggregateCube.from_frame(mvp_df, mvp_features, nutrition_columns)
+    cube.save(Path('data'))
+    print(f"✅ Exported aggregate cube: {cube.n_groups:,} groups")
+    profiler.checkpoint('aggregate cube')
     
     # Export feature metadata
     feature_metadata = {
@@ -167,6 +240,55 @@ def export_mvp_dataset():
         'features': mvp_features,
         'feature_counts': {feature: int(mvp_df[feature].sum()) for feature in mvp_features},
         'nutritional_columns': ['Calories', 'ProteinContent', 'FatContent', 'CarbohydrateContent', 'SodiumContent', 'FiberContent', 'SugarContent'],
+        'ranking': {
+            **ranking_info,
+            'column': 'RankScore',
+            'presorted_by': ['MealCat', 'RankScore'],
+            'category_ranges': category_ranges(mvp_df)
+        },
+        'keyword_index': {
+            'vocabulary_file': KEYWORD_VOCAB_FILE,
+            'matrix_file': KEYWORD_MATRIX_FILE,
+            'format': 'csr',
+            'vocabulary_size': len(keyword_index.vocabulary),
+            'nnz': int(keyword_index.matrix.nnz)
+        },
+        'diet_classifier': {
+            'source': 'RecipeIngredientParts',
+            'categories': CATEGORIES,
+            'flag_excludes': FLAG_EXCLUDES
+        },
+        'ingredient_quantities': {
+            'file': QUANTITY_TABLE_FILE,
+            'entries': quantity_table.n_entries,
+            'units': ['count', 'g', 'ml']
+        },
+        'aggregate_cube': {
+            'file': CUBE_FILE,
+            'flags': cube.flags,
+            'categories': cube.categories,
+            'nutrients': cube.nutrients,
+            'groups': cube.n_groups
+        },
+        'ingredient_index': {
+            'vocabulary_file': INGREDIENT_VOCAB_FILE,
+            'matrix_file': INGREDIENT_MATRIX_FILE,
+            'format': 'csr',
+            'vocabulary_size': len(ingredient_index.vocabulary),
+            'nnz': int(ingredient_index.matrix.nnz)
+        },
+        'deduplication': {
+            **(dedup_report or {'method': None}),
+            'cluster_column': CLUSTER_COLUMN,
+            'cluster_size_column': CLUSTER_SIZE_COLUMN,
+            'duplicates_file': DUPLICATES_FILE if duplicates is not None else None
+        },
+        'partitions': {
+            'directory': PARTITION_DIR,
+            'manifest': MANIFEST_FILE,
+            'partition_by': ['MealCat', 'diet'],
+            'count': len(manifest.partitions)
+        },
         'dataset_info': {
             'shape': mvp_df.shape,
             'memory_mb': round(mvp_df.memory_usage(deep=True).sum() / 1024**2, 1),
@@ -186,6 +308,13 @@ def export_mvp_dataset():
     print(f"  - mvp_recipes_clean.csv ({mvp_df.shape[0]:,} recipes)")
     print(f"  - mvp_recipes_clean.pkl (faster loading)")
     print(f"  - mvp_metadata.json (feature definitions)")
+    print(f"  - {KEYWORD_VOCAB_FILE} + {KEYWORD_MATRIX_FILE} (keyword index)")
+    print(f"  - {INGREDIENT_VOCAB_FILE} + {INGREDIENT_MATRIX_FILE} (ingredient index)")
+    print(f"  - {CUBE_FILE} (aggregate cube)")
+    if duplicates is not None:
+        print(f"  - {DUPLICATES_FILE} (collapsed recipe -> {CLUSTER_COLUMN})")
+    print(f"  - {QUANTITY_TABLE_FILE} (ingredient quantities)")
+    print(f"  - {PARTITION_DIR}/ ({len(manifest.partitions)} MealCat x diet partitions + {MANIFEST_FILE})")
     
     # Show feature summary
     print(f"\n=== FEATURE SUMMARY ===")
@@ -194,5 +323,10 @@ def export_mvp_dataset():
         percentage = count / len(mvp_df) * 100
         print(f"{feature:<20}: {count:>6,} recipes ({percentage:>5.1f}%)")
 
+    if profiler.enabled:
+        report_path = profiler.write_report(Path('data') / settings.MEMORY_REPORT_FILE)
+        print(f"\n=== MEMORY PROFILE ===\n{profiler.report()}")
+        print(f"✅ Memory profile written to {report_path}")
+
 if __name__ == "__main__":
     export_mvp_dataset()
@@ -0,0 +1,256 @@
+"""
+Concurrent-user load test for the meal planner.
+
+Drives the same code path as a Streamlit rerun that generates a plan
+(``filter_by_preferences`` then ``generate_daily_meal_plan``) from a pool of
+worker threads, one per simulated user, at each requested concurrency level.
+Streamlit runs every session's script on its own thread in one process, so
+this reproduces the contention a single app instance sees. With ``--url``
+it instead (or additionally) hammers an HTTP endpoint, e.g. a running app's
+``/_stcore/health`` or the ``/metrics`` endpoint.
+
+Reports per level: throughput, p50/p95/p99 latency, errors, RSS growth,
+and the concurrency at which each path saturates (throughput stops growing
+or tail latency blows up).
+
+    python scripts/load_test.py --concurrency 1,2,4,8,16 --requests 200
+    python scripts/load_test.py --mix vegan:1,high_protein:3 --duration 20
+    python scripts/load_test.py --url http://localhost:8501/_stcore/health --skip-planner
+    python scripts/load_test.py --profile-memory --memory-budget-mb 1500 --requests 50
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.diet_app.data.loaders import RecipeDataLoader
+from src.diet_app.models.query import QueryEngine
+from src.diet_app.models.recommender import filter_by_preferences, generate_daily_meal_plan
+from src.diet_app.utils.profiling import MemoryBudgetExceeded, current_rss_bytes, profiler
+
+# Preference profiles a simulated user may pick: (preferences, daily goals)
+PROFILES = {
+    'omnivore': ({'calories': 'm', 'protein': 'm', 'preptime': 's'},
+                 {'target_calories': 2500, 'target_protein': 120}),
+    'high_protein': ({'calories': 'h', 'protein': 'h', 'preptime': 'q'},
+                     {'target_calories': 3000, 'target_protein': 180}),
+    'vegetarian': ({'vegetarian': 'y', 'calories': 'm', 'protein': 'm'},
+                   {'target_calories': 2200, 'target_protein': 90}),
+    'vegan': ({'vegan': 'y', 'easy': 'y', 'calories': 'l'},
+              {'target_calories': 2000, 'target_protein': 70}),
+    'quick_easy': ({'easy': 'y', 'preptime': 'q'},
+                   {'target_calories': 2400, 'target_protein': 110}),
+    # Several restrictions at once, with a standard prep time so the real dataset can still plan them
+    'restrictive': ({'vegan': 'y', 'dairyfree': 'y', 'protein': 'h', 'preptime': 's'},
+                    {'target_calories': 2300, 'target_protein': 100}),
+}
+
+# A level counts as saturated when adding users buys less than this much throughput...
+SATURATION_GAIN = 1.10
+# ...or when p95 latency exceeds this multiple of the single-user p95
+SATURATION_P95_FACTOR = 4.0
+
+
+def parse_mix(text):
+    """'vegan:1,omnivore:3' -> (profile names, normalized weights)"""
+    names, weights = [], []
+    for item in text.split(','):
+        name, _, weight = item.partition(':')
+        name = name.strip()
+        if name not in PROFILES:
+            raise SystemExit(f"Unknown profile '{name}'. Available: {', '.join(PROFILES)}")
+        names.append(name)
+        weights.append(float(weight or 1))
+    weights = np.asarray(weights) / sum(weights)
+    return names, weights
+
+
+def plan_request(df, engine, profile_name, rng):
+    """One simulated 'Generate My Meal Plan' click."""
+    preferences, goals = PROFILES[profile_name]
+    df_filtered = filter_by_preferences(df, preferences, engine=engine)
+    meal_plan, _, _, _ = generate_daily_meal_plan(df_filtered, rng=rng, **goals)
+    if meal_plan is None:
+        raise RuntimeError(f"No plan for profile '{profile_name}'")
+
+
+def http_request(url, timeout=30):
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        response.read()
+        if response.status >= 400:
+            raise RuntimeError(f"HTTP {response.status}")
+
+
+def run_level(task, concurrency, requests=None, duration=None, seed=0):
+    """Run ``task(worker_rng)`` from ``concurrency`` threads; return per-request latencies and errors."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    issued = [0]
+    deadline = time.perf_counter() + duration if duration else None
+
+    def next_ticket():
+        with lock:
+            if requests is not None and issued[0] >= requests:
+                return False
+            issued[0] += 1
+            return True
+
+    def worker(worker_index):
+        rng = np.random.default_rng(seed + worker_index)
+        while (deadline is None or time.perf_counter() < deadline) and next_ticket():
+            start = time.perf_counter()
+            try:
+                task(rng)
+            except MemoryBudgetExceeded:
+                raise
+            except Exception as e:
+                with lock:
+                    errors.append(repr(e))
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    rss_before = current_rss_bytes()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    wall = time.perf_counter() - started
+    rss_after = current_rss_bytes()
+
+    latencies = np.asarray(latencies)
+    p50, p95, p99 = (np.percentile(latencies, [50, 95, 99]) * 1000) if len(latencies) else (np.nan,) * 3
+    return {
+        'concurrency': concurrency,
+        'requests': int(len(latencies)),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'wall_s': wall,
+        'throughput_rps': len(latencies) / wall if wall > 0 else 0.0,
+        'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+        'rss_mb': rss_after / 1024**2,
+        'rss_growth_mb': (rss_after - rss_before) / 1024**2,
+    }
+
+
+def saturation_point(levels):
+    """Lowest concurrency past which more users stop paying off, or None if never reached."""
+    if not levels:
+        return None
+    baseline_p95 = levels[0]['p95_ms']
+    for previous, level in zip(levels, levels[1:]):
+        gained = level['throughput_rps'] / previous['throughput_rps'] if previous['throughput_rps'] else 0
+        if gained < SATURATION_GAIN or level['p95_ms'] > baseline_p95 * SATURATION_P95_FACTOR:
+            return previous['concurrency']
+    return None
+
+
+def print_report(name, levels):
+    print(f"\n=== {name} ===")
+    print(f"{'users':>6} {'reqs':>6} {'err':>4} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'RSS MB':>8} {'ΔRSS MB':>8}")
+    for level in levels:
+        print(f"{level['concurrency']:>6} {level['requests']:>6} {level['errors']:>4} "
+              f"{level['throughput_rps']:>8.1f} {level['p50_ms']:>8.1f} {level['p95_ms']:>8.1f} "
+              f"{level['p99_ms']:>8.1f} {level['rss_mb']:>8.1f} {level['rss_growth_mb']:>+8.1f}")
+        if level['first_error']:
+            print(f"       first error: {level['first_error']}")
+    saturated = saturation_point(levels)
+    if saturated is None:
+        print(f"No saturation up to {levels[-1]['concurrency']} concurrent users")
+    else:
+        print(f"Saturates at ~{saturated} concurrent users")
+    return saturated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--concurrency', default='1,2,4,8,16', help='Comma-separated user counts to test')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per concurrency level')
+    parser.add_argument('--duration', type=float, default=None, help='Seconds per level (overrides --requests)')
+    parser.add_argument('--mix', default=','.join(f'{name}:1' for name in PROFILES),
+                        help='Weighted preference profiles, e.g. vegan:1,omnivore:3')
+    parser.add_argument('--data-dir', default=None, help='Dataset directory (defaults to settings.DATA_DIR)')
+    parser.add_argument('--url', default=None, help='Also load-test this HTTP endpoint')
+    parser.add_argument('--skip-planner', action='store_true', help='Only run the HTTP test')
+    parser.add_argument('--warmup', type=int, default=5, help='Untimed planner requests before measuring')
+    parser.add_argument('--json', default=None, help='Write the raw results to this file')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='Trace allocations per stage (load, filter, plan) and print a report; slow')
+    parser.add_argument('--memory-budget-mb', type=float, default=None,
+                        help='Exit non-zero when a profiled stage pushes peak RSS over this many MB')
+    parser.add_argument('--memory-report', default=None, help='Also write the memory report to this file')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    requests = None if args.duration else args.requests
+    results = {'config': vars(args), 'paths': {}}
+    if args.profile_memory or args.memory_budget_mb:
+        profiler.enable(args.memory_budget_mb)
+
+    if not args.skip_planner:
+        names, weights = parse_mix(args.mix)
+        print("Loading recipe data...")
+        rss_start = current_rss_bytes()
+        loader = RecipeDataLoader(args.data_dir)
+        df = loader.load_filter_columns()
+        engine = QueryEngine(df, keyword_index=loader.load_keyword_index(), statistics=loader.load_metadata())
+        print(f"Loaded {len(df):,} recipes (+{(current_rss_bytes() - rss_start) / 1024**2:.0f} MB RSS)")
+
+        def task(rng):
+            plan_request(df, engine, names[rng.choice(len(names), p=weights)], rng)
+
+        warmup_rng = np.random.default_rng(args.seed)
+        warmup_errors = []
+        for _ in range(args.warmup):
+            try:
+                task(warmup_rng)
+            except MemoryBudgetExceeded:
+                raise
+            except Exception as e:
+                warmup_errors.append(repr(e))
+        if warmup_errors:
+            print(f"⚠️ {len(warmup_errors)}/{args.warmup} warm-up requests failed; first error: {warmup_errors[0]}")
+        results['warmup_errors'] = len(warmup_errors)
+
+        planner_levels = [run_level(task, level, requests, args.duration, args.seed) for level in levels]
+        saturated = print_report('Planner: filter_by_preferences + generate_daily_meal_plan', planner_levels)
+        results['paths']['planner'] = {'levels': planner_levels, 'saturates_at': saturated}
+
+    if args.url:
+        http_levels = [run_level(lambda rng: http_request(args.url), level, requests, args.duration, args.seed)
+                       for level in levels]
+        saturated = print_report(f'HTTP: {args.url}', http_levels)
+        results['paths']['http'] = {'levels': http_levels, 'saturates_at': saturated}
+
+    if profiler.enabled:
+        print(f"\n=== Memory profile ===\n{profiler.report()}")
+        results['memory'] = [vars(stats) for stats in profiler.stats()]
+        if args.memory_report:
+            profiler.write_report(args.memory_report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except MemoryBudgetExceeded as e:
+        print(f"\n❌ {e}")
+        if profiler.stats():
+            print(profiler.report())
+        sys.exit(2)
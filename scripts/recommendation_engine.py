@@ -1,242 +1,214 @@
-import pandas as pd
+#!/usr/bin/env python3
+"""
+Batch meal planner: streams user profiles (JSONL) in, streams plans (JSONL) out.
+
+Non-interactive replacement for the original ``input()``-driven prototype,
+built on the same planner as the app (``filter_by_preferences`` +
+``generate_meal_plans``). Profiles are read lazily from a file or stdin,
+planned by a pool of workers with a bounded number of profiles in flight, and
+written to stdout in input order as soon as each one (and all before it) is
+done, so memory stays constant however many profiles are streamed through.
+
+    python scripts/recommendation_engine.py profiles.jsonl > plans.jsonl
+    generate_profiles | python scripts/recommendation_engine.py --workers 8 --names > plans.jsonl
+    python scripts/recommendation_engine.py profiles.jsonl --executor process --workers 4
+
+One profile per line; every field except ``preferences`` is optional::
+
+    {"id": "u1", "preferences": {"vegan": "y", "calories": "l", "keywords": ["breakfast"]},
+     "target_calories": 2000, "target_protein": 80, "max_meals": 4, "tolerance": 0.2,
+     "n_plans": 1, "nutrient_targets": {"FiberContent": 30}, "nutrient_limits": {"SodiumContent": 2300},
+     "exclude_recipe_ids": [12, 34], "portions": true, "min_portion": 0.5, "max_portion": 2.0, "seed": 7}
+
+Preference keys are those of the app (``vegetarian``, ``vegan``, ``easy``,
+``calories`` l/m/h, ``protein`` l/m/h, ``preptime`` q/s/l, ``keywords``,
+``expression`` ...). With ``portions`` every meal is served at a continuous
+multiple of a serving (``servings`` in the output, nutrients scaled to it).
+Each output line carries the profile's ``id`` (or its 1-based ``line``) and
+either ``plans`` or an ``error``; the exit status is 1 when any profile
+failed. Plans are reproducible: a profile without ``seed`` is seeded from
+``--seed`` and its line number.
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, TextIO, Tuple
+
 import numpy as np
-import random
-
-df = pd.read_csv('data/mvp_recipes_clean.csv')
-print(df.tail())
-
-def choose_preferences():
-    """Collect user dietary preferences."""
-    
-    def get_input(prompt, valid_options):
-        while True:
-            user_input = input(prompt).lower().strip()
-            if user_input in valid_options:
-                return user_input
-            print(f"Invalid input! Please enter: {'/'.join(valid_options)}\n")
-    
-    questions = [
-        ("Do you want meals that are vegetarian? (y/n): ", ['y', 'n'], 'vegetarian'),
-        ("Do you want your meals pescatarian? (y/n): ", ['y', 'n'], 'pescatarian'),
-        ("Do you want your meals vegan? (y/n): ", ['y', 'n'], 'vegan'),
-        ("Do you want your meals easy? (y/n): ", ['y', 'n'], 'easy'),
-        ("Do you want your meals diary free? (y/n): ", ['y', 'n'], 'diaryfree'),
-        ('Do you want your meals gluten free? (y/n): ', ['y', 'n',], 'glutenfree'),
-        ("Caloric content - low/moderate/high? (l/m/h): ", ['l', 'm', 'h'], 'calories'),
-        ("Protein content - low/moderate/high? (l/m/h): ", ['l', 'm', 'h'], 'protein'),
-        ("Prep time - quick/standard/long? (q/s/l): ", ['q', 's', 'l'], 'preptime')
-    ]
-    
-    preferences = {}
-    for prompt, options, key in questions:
-        preferences[key] = get_input(prompt, options)
-    
-    return preferences
-    
-
-def filter_by_preferences(dataframe = df, preferences = 0): #in future iterations this function could use less hardcoding of the categories, similar to choose_preferences()
-    '''For the time being this function will make you choose at least one option from each filter category, later on you will be able to choose only the ones you actually want to specify and the rest will not be modified'''
-    
-    df_filtered = dataframe.copy()
-    preferences = choose_preferences() # in the future this should be outside of the function
-    if preferences.get('vegetarian') == 'y':
-        df_filtered = df_filtered[df_filtered['Vegetarian']==1]
-        
-    if preferences.get('vegan') == 'y':
-        df_filtered = df_filtered[df_filtered['Vegan']==1]
-        
-    if preferences.get('pescatarian') == 'y':
-        df_filtered = df_filtered[df_filtered['Pescatarian'] ==1]
-        
-    if preferences.get('easy') == 'y':
-        df_filtered = df_filtered[df_filtered['Easy']==1]
-        
-    if preferences.get('glutenfree') == 'y':
-        df_filtered = df_filtered[df_filtered['GlutenFree'] ==1]
-        
-    if preferences.get('diaryfree') == 'y':
-        df_filtered = df_filtered[df_filtered['DiaryFree'] ==1]
-        
-    if preferences.get('calories') == 'l':
-        df_filtered = df_filtered[df_filtered['LowCalorie']==1]
-    elif preferences.get('calories') == 'm':
-        df_filtered = df_filtered[df_filtered['ModerateCalorie']==1]
-    elif preferences.get('calories') == 'h':
-        df_filtered = df_filtered[df_filtered['HighCalorie']==1]
-        
-    if preferences.get('protein') == 'l':
-        df_filtered = df_filtered[df_filtered['LowProtein']==1]
-    elif preferences.get('protein') == 'm':
-        df_filtered = df_filtered[df_filtered['ModerateProtein']==1]    
-    elif preferences.get('protein') == 'h':
-        df_filtered = df_filtered[df_filtered['HighProtein']==1]
-        
-    if preferences.get('preptime') == 'q':
-        df_filtered = df_filtered[df_filtered['Quick']==1].reset_index(drop=True)
-    if preferences.get('preptime') == 's':
-        df_filtered = df_filtered[df_filtered['StandardPrepTime']==1].reset_index(drop=True)
-    if preferences.get('preptime') == 'l':
-        df_filtered = df_filtered[df_filtered['LongPrepTime']==1].reset_index(drop=True)
-    return(df_filtered)
-
-list(df.columns.values) #command to list all the names of the columns
-
-print(df.head(1))
-#Now let's get to the daily meal planner
-
-def calories_protein_goals():
-    '''Function to specify your daily goal of calories and of protein'''
-    calories_protein = [None, None]
-    while True:
-        try:
-            calories = int(input("What is your desired caloric goal for the day? Please enter a number "))
-            if calories > 0 and calories < 10000:
-                calories_protein[1] = calories
-                break
-        except ValueError:
-            print("Please enter a valid number")
-    while True:
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.diet_app.data.loaders import RecipeDataLoader
+from src.diet_app.data.table import RecipeTable, enable_copy_on_write
+from src.diet_app.models.query import QueryEngine
+from src.diet_app.models.recommender import filter_by_preferences, generate_meal_plans, preference_flags
+
+# Profile fields passed straight to generate_meal_plans
+PLAN_OPTIONS = {'target_calories', 'target_protein', 'tolerance', 'max_meals', 'top_k',
+                'nutrient_targets', 'nutrient_weights', 'nutrient_limits', 'exclude_recipe_ids',
+                'portions', 'min_portion', 'max_portion'}
+PROFILE_FIELDS = PLAN_OPTIONS | {'id', 'preferences', 'n_plans', 'seed'}
+
+# Per-process planner state, set by init_worker (once per process, shared by threads)
+_state: Dict = {}
+
+
+def init_worker(data_dir: Optional[str], with_names: bool) -> None:
+    """Load the table, its query engine (with keyword and ingredient indexes) and aggregate cube."""
+    enable_copy_on_write()
+    loader = RecipeDataLoader(data_dir)
+    # Read-only, so planner threads sharing it cannot change what the others see
+    df = RecipeTable(loader.load_filter_columns()).frame()
+    _state['df'] = df
+    ingredient_index = loader.load_ingredient_index()
+    if ingredient_index is not None:
+        ingredient_index = ingredient_index.aligned_to(df['RecipeId'].to_numpy())
+    _state['engine'] = QueryEngine(df, keyword_index=loader.load_keyword_index(), ingredient_index=ingredient_index,
+                                   statistics=loader.load_metadata())
+    _state['cube'] = loader.load_cube(df)
+    _state['names'] = loader.load_detail_columns()['Name'] if with_names else None
+
+
+def read_profiles(stream: TextIO) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """Yield ``(line number, profile, parse error)`` for every non-blank line of ``stream``."""
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
         try:
-            protein = int(input("What is your desired protein goal for the day? Please enter a number "))
-            if protein > 0 and protein < 1000:
-                calories_protein[2] = protein
-                break
-            else:
-                print("Please enter a number in the range 0 to 1000 for protein")
-        except ValueError:
-            print("Please enter a valid number")
-    return(calories_protein)
-
-def generate_meal_names(count = 3):
-    """Generate appropriate meal names based on count"""
-    base_names = ["Breakfast", "Lunch", "Dinner"]
-    
-    if count <= 3:
-        return base_names[:count]
-    elif count == 4:
-        return ["Breakfast", "Lunch", "Snack", "Dinner"]
-    elif count == 5:
-        return ["Breakfast", "Mid-Morning", "Lunch", "Afternoon Snack", "Dinner"]
-    elif count == 6:
-        return ["Breakfast", "Mid-Morning", "Lunch", "Afternoon Snack", "Dinner", "Evening Snack"]
-    else:
-        # For 7+ meals, use numbered approach
-        return [f"Meal {i+1}" for i in range(count)]
- 
-def optimal_weights_per_meal(count = 3):
-    '''Give appropriate weight to each meal during the day, to assign appropriate amount of calories/protein to each of them'''
-    #Defining weights for every possible named meal (see function above)
-    meal_weights = {"Breakfast": 3, "Lunch": 4, "Dinner": 4, "Mid-Morning": 2, "Afternoon Snack": 2, "Evening Snack": 2, "Default": 3} 
-    meal_slots = generate_meal_names(count)
-    meal_plan_weights = {meal: None for meal in meal_slots}
-    for meal in meal_plan_weights:
-        if meal in meal_weights: #this should somehow get the key and not the value
-            meal_plan_weights[meal] = meal_weights[meal] 
-        else:
-            meal_plan_weights[meal] = meal_weights["Default"]
-            
-    #calculate the total sum of points
-    # total_points = sum(meal_plan_weights.values())
-    total_weight = sum(meal_plan_weights.values())
-    for meal in meal_plan_weights:
-        meal_plan_weights[meal] = round(meal_plan_weights[meal] / total_weight,2) #possibly remove the rounding if I feel like it will make it simpler
-    
-    return(meal_plan_weights) 
-            
-def number_of_meals(df_filtered = df, target_calories = 2500, target_protein = 120, max_meals = 6):
-    '''Function to estimate the number of meals that would be optimal for given caloric/protein goals
-        The function automatically returns the names of the meals, therefore their count is included but not indicated with an integer'''
-    
-    avg_calories = df_filtered["Calories"].mean()
-    avg_protein = df_filtered["ProteinContent"].mean()
-    
-    estimated_meals_by_cal = min(max_meals, max(2, target_calories // (avg_calories * 0.8)))
-    estimated_meals_by_protein = min(max_meals, max(2, target_protein // (avg_protein * 0.8)))
-    
-    optimal_meals = max(estimated_meals_by_cal, estimated_meals_by_protein)
-    
-    meal_names = generate_meal_names(optimal_meals)
-    
-    return(meal_names)
-
-def generate_daily_meal_plan(df_filtered=df, target_calories=2500, target_protein=120, tolerance = 0.2, max_meals = 6): #doesn't the max meal count contradict the use of the number of meals generator?
-    '''Generates a daily plan of meals from the filtered recipes dataframe'''
-    
-    if df_filtered.empty:
-        print('There are no recipes to choose! Check your filters and try again')
-        return None
-    
-    # Get meal slots and initialize plan
-    meal_slots = number_of_meals(df_filtered, target_calories, target_protein, max_meals)
-    meal_plan = {meal: None for meal in meal_slots}
-    
-    # Calculate targets per meal, the weights could be adjusted
-    calories_per_meal = {meal: optimal_weights_per_meal(len(meal_plan))[meal] * target_calories for meal in optimal_weights_per_meal(len(meal_plan))}
-    protein_per_meal = {meal: optimal_weights_per_meal(len(meal_plan))[meal] * target_protein for meal in optimal_weights_per_meal(len(meal_plan))}
-    
-    # Calculate allowable deviations based on tolerance
-    deviation_calories = {meal: tolerance * calories_per_meal[meal] for meal in meal_slots}
-    deviation_protein = {meal: tolerance * protein_per_meal[meal] for meal in meal_slots}
-    
-    # Initialize totals
-    total_calories = 0
-    total_protein = 0
-        
-    print("🍽️  YOUR DAILY MEAL PLAN")
-    print("\n" + "="*60)
-    print("="*60)
-    
-    for meal in meal_slots:
-        #Filtering the dataframe for a list of meals that fulfill our criteria, +- standard deviation
-        # Calculate remaining targets
-        remaining_meals = len([m for m in meal_slots if meal_plan[m] is None])
-        remaining_calories = target_calories - total_calories
-        remaining_protein = target_protein - total_protein
-        
-        # Flexible targets for this meal
-        target_cal = remaining_calories / remaining_meals if remaining_meals > 0 else calories_per_meal[meal]
-        target_prot = remaining_protein / remaining_meals if remaining_meals > 0 else protein_per_meal[meal]
-        
-        # Find suitable recipes with wider tolerance
-        df_suitable = df_filtered.loc[
-            (df_filtered['Calories'] >= target_cal * (1 - tolerance)) &
-            (df_filtered['Calories'] <= target_cal * (1 + tolerance)) &
-            (df_filtered['ProteinContent'] >= target_prot * (1 - tolerance)) & 
-            (df_filtered['ProteinContent'] <= target_prot * (1 + tolerance))
-        ]
-        
-        meal_category_map = {
-            "Lunch": "Lunch/Dinner",
-            "Dinner": "Lunch/Dinner", 
-            "Snack": "Snacks",
-            "Breakfast": "Breakfast"
-        }
-        
-        if meal in meal_category_map:
-            df_suitable = df_suitable.loc[df_suitable["MealCat"] == meal_category_map[meal]]
-                                        
-        if len(df_suitable) == 0:
-            print(f"No suitable recipes found for {meal}")
+            profile = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
             continue
-        
-        # Select and assign recipe
-        # Get the highest rating
-        max_rating = df_suitable['AggregatedRating'].max()
-
-        # Filter for recipes with the highest rating
-        top_rated = df_suitable[df_suitable['AggregatedRating'] == max_rating]
-
-        # Randomly select from the top-rated recipes
-        selected_recipe = top_rated.sample(n=1).iloc[0]
-        meal_plan[meal] = selected_recipe["Name"]
-        
-        # Update totals
-        total_calories += int(selected_recipe["Calories"])
-        total_protein += int(selected_recipe["ProteinContent"])
-        
-        # Optional: Print each meal as it's selected
-        print(f"{meal}: {selected_recipe['Name']} ({int(selected_recipe['Calories'])} cal, {int(selected_recipe['ProteinContent'])}g protein)")
-            
-    print(f"\nTotal calories: {total_calories}")
-    print(f"Total protein: {total_protein}")
-    return meal_plan
\ No newline at end of file
+        if not isinstance(profile, dict):
+            yield line_number, None, "Each line must be a JSON object"
+            continue
+        yield line_number, profile, None
+
+
+def plan_profile(item: Tuple[int, Optional[Dict], Optional[str]], seed: int = 0) -> Dict:
+    """Plan one parsed profile; failures become an ``error`` record instead of raising."""
+    line_number, profile, error = item
+    result = {'line': line_number}
+    if profile is not None and 'id' in profile:
+        result = {'id': profile['id']}
+    if error is not None:
+        return {**result, 'error': error}
+    try:
+        return {**result, **_plan(profile, line_number, seed)}
+    except Exception as e:
+        return {**result, 'error': f"{type(e).__name__}: {e}"}
+
+
+def _plan(profile: Dict, line_number: int, seed: int) -> Dict:
+    unknown = set(profile) - PROFILE_FIELDS
+    if unknown:
+        raise ValueError(f"Unknown profile fields: {', '.join(sorted(unknown))}")
+    preferences = profile.get('preferences') or {}
+    df_filtered = filter_by_preferences(_state['df'], preferences, engine=_state['engine'])
+    if df_filtered.empty:
+        return {'matches': 0, 'plans': []}
+
+    cube = _state['cube']
+    stats = None
+    if cube is not None and not preferences.get('keywords') and not preferences.get('expression'):
+        stats = cube.stats(preference_flags(preferences))
+    rng = np.random.default_rng(profile['seed'] if 'seed' in profile else [seed, line_number])
+    options = {key: value for key, value in profile.items() if key in PLAN_OPTIONS}
+    plans = generate_meal_plans(df_filtered, int(profile.get('n_plans', 1)), rng=rng,
+                                nutrient_means=stats.means if stats is not None else None, **options)
+    return {'matches': len(df_filtered),
+            'plans': [_plan_record(meal_plan, total_cal, total_prot)
+                      for meal_plan, _, total_cal, total_prot in plans if meal_plan]}
+
+
+def _plan_record(meal_plan: Dict, total_calories: int, total_protein: int) -> Dict:
+    names = _state['names']
+    meals = []
+    for meal, recipe in meal_plan.items():
+        recipe_id = int(recipe['RecipeId'])
+        entry = {'meal': meal, 'recipe_id': recipe_id,
+                 'calories': round(float(recipe['Calories']), 1),
+                 'protein': round(float(recipe['ProteinContent']), 1)}
+        if 'Servings' in recipe.index:
+            entry['servings'] = float(recipe['Servings'])
+        if names is not None:
+            name = names.get(recipe_id)
+            entry['name'] = name if isinstance(name, str) else None
+        meals.append(entry)
+    return {'meals': meals, 'total_calories': total_calories, 'total_protein': total_protein}
+
+
+def bounded_map(executor, func: Callable, items: Iterable, max_in_flight: int) -> Iterator:
+    """``executor.map`` that consumes ``items`` lazily, keeping at most ``max_in_flight`` submitted.
+
+    Results come back in input order; a slow item holds back later results but
+    never lets more than ``max_in_flight`` of them (or their inputs) pile up.
+    """
+    in_flight = deque()
+    for item in items:
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().result()
+        in_flight.append(executor.submit(func, item))
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def _plan_with_seed(args: Tuple) -> Dict:
+    item, seed = args
+    return plan_profile(item, seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('input', nargs='?', default='-', help="Profiles JSONL file ('-' or omitted: stdin)")
+    parser.add_argument('--workers', type=int, default=4, help='Planner workers')
+    parser.add_argument('--executor', choices=['thread', 'process'], default='thread',
+                        help='Threads share one table; processes each load it (cheap with the load cache)')
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help='Profiles submitted but not yet written (default: 4 x workers)')
+    parser.add_argument('--names', action='store_true', help='Include recipe names (loads the detail columns)')
+    parser.add_argument('--data-dir', default=None, help='Dataset directory (defaults to settings.DATA_DIR)')
+    parser.add_argument('--seed', type=int, default=0, help='Base seed for profiles without their own')
+    parser.add_argument('--quiet', action='store_true', help='No progress summary on stderr')
+    args = parser.parse_args()
+
+    max_in_flight = args.max_in_flight or 4 * args.workers
+    if args.executor == 'thread':
+        init_worker(args.data_dir, args.names)
+        executor = ThreadPoolExecutor(max_workers=args.workers)
+    else:
+        executor = ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker,
+                                       initargs=(args.data_dir, args.names))
+
+    source = sys.stdin if args.input == '-' else open(args.input)
+    start = time.perf_counter()
+    planned = failed = 0
+    try:
+        with executor:
+            items = ((item, args.seed) for item in read_profiles(source))
+            for result in bounded_map(executor, _plan_with_seed, items, max_in_flight):
+                sys.stdout.write(json.dumps(result) + '\n')
+                if 'error' in result:
+                    failed += 1
+                else:
+                    planned += 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        sys.stdout.flush()
+
+    if not args.quiet:
+        elapsed = time.perf_counter() - start
+        rate = (planned + failed) / elapsed if elapsed > 0 else 0.0
+        print(f"Planned {planned:,} profiles, {failed:,} failed, in {elapsed:.1f}s ({rate:,.0f}/s)",
+              file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
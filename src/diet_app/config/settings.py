@@ -0,0 +1,72 @@
+"""Application configuration settings."""
+
+import os
+from pathlib import Path
+from typing import List
+
+
+class Settings:
+    """Application settings, overridable through environment variables."""
+
+    PROJECT_NAME: str = "Diet Recommendation App"
+
+    # Data paths
+    DATA_DIR: Path = Path(os.environ.get("DIET_APP_DATA_DIR", "data"))
+
+    # Dataset settings
+    MVP_DATASET_FILE: str = "mvp_recipes_clean.csv"
+    METADATA_FILE: str = "mvp_metadata.json"
+
+    # Loader settings
+    LOAD_CHUNK_ROWS: int = int(os.environ.get("DIET_APP_LOAD_CHUNK_ROWS", 50_000))
+    # Parsed columns and validation results are cached here, keyed by the dataset's content hash
+    LOAD_CACHE_ENABLED: bool = os.environ.get("DIET_APP_LOAD_CACHE", "1").lower() in ("1", "true", "yes")
+    LOAD_CACHE_DIR: Path = Path(os.environ.get("DIET_APP_LOAD_CACHE_DIR", DATA_DIR / ".load_cache"))
+    # Restrict this process to a slice of the catalogue, e.g. DIET_APP_SCOPE_MEALCATS=Breakfast
+    # and DIET_APP_SCOPE_FLAGS=Vegan; only the matching partitions are read
+    SCOPE_MEAL_CATEGORIES: List[str] = [c.strip() for c in os.environ.get("DIET_APP_SCOPE_MEALCATS", "").split(",")
+                                        if c.strip()]
+    SCOPE_FLAGS: List[str] = [f.strip() for f in os.environ.get("DIET_APP_SCOPE_FLAGS", "").split(",") if f.strip()]
+
+    # Export: near-duplicate recipes (MinHash estimate of ingredient + name Jaccard at least
+    # DEDUP_THRESHOLD) collapse to one row; rows not reached within the time budget are kept
+    DEDUP_ENABLED: bool = os.environ.get("DIET_APP_DEDUP", "1").lower() in ("1", "true", "yes")
+    DEDUP_THRESHOLD: float = float(os.environ.get("DIET_APP_DEDUP_THRESHOLD", 0.8))
+    DEDUP_TIME_BUDGET_S: float = float(os.environ.get("DIET_APP_DEDUP_TIME_BUDGET_S", 120))
+
+    # Planner settings: how many best-ranked in-tolerance recipes each slot picks from
+    PLAN_TOP_K: int = int(os.environ.get("DIET_APP_PLAN_TOP_K", 5))
+    # With multi-nutrient targets, this many times PLAN_TOP_K best-ranked recipes are scored by distance
+    PLAN_SCORE_POOL: int = int(os.environ.get("DIET_APP_PLAN_SCORE_POOL", 4))
+
+    # Online preference learning: SGD step size, and how many of the most frequent keywords are features
+    PREFERENCE_LEARNING_RATE: float = float(os.environ.get("DIET_APP_PREFERENCE_LEARNING_RATE", 0.1))
+    PREFERENCE_KEYWORDS: int = int(os.environ.get("DIET_APP_PREFERENCE_KEYWORDS", 256))
+
+    # Startup warm-up: table, indexes and caches are built on a background thread, and the filters of
+    # this many of the most common saved preference sets are run once, before /ready reports ready
+    WARMUP_ENABLED: bool = os.environ.get("DIET_APP_WARMUP", "1").lower() in ("1", "true", "yes")
+    WARMUP_PROFILES: int = int(os.environ.get("DIET_APP_WARMUP_PROFILES", 8))
+
+    # Prepared recipe cards kept in memory across sessions (LRU, evicted by size)
+    RENDER_CACHE_MB: int = int(os.environ.get("DIET_APP_RENDER_CACHE_MB", 32))
+
+    # Plan history store (SQLite): writes are queued and committed in batches
+    STORE_PATH: Path = Path(os.environ.get("DIET_APP_STORE_PATH", DATA_DIR / "diet_app.db"))
+    STORE_BATCH_SIZE: int = int(os.environ.get("DIET_APP_STORE_BATCH_SIZE", 500))
+    STORE_FLUSH_INTERVAL: float = float(os.environ.get("DIET_APP_STORE_FLUSH_INTERVAL", 0.5))
+    # Recipes served to a user within this many days are not planned again
+    NO_REPEAT_DAYS: int = int(os.environ.get("DIET_APP_NO_REPEAT_DAYS", 7))
+
+    # Instrumentation (off by default; near-zero overhead when disabled)
+    METRICS_PORT: int = int(os.environ.get("DIET_APP_METRICS_PORT", 0))
+    METRICS_ENABLED: bool = (
+        os.environ.get("DIET_APP_METRICS", "0").lower() in ("1", "true", "yes") or bool(METRICS_PORT)
+    )
+    # Memory profiling (tracemalloc, slow): per-stage report, optional peak-RSS budget in MB (0 = none)
+    PROFILE_MEMORY: bool = os.environ.get("DIET_APP_PROFILE_MEMORY", "0").lower() in ("1", "true", "yes")
+    MEMORY_BUDGET_MB: float = float(os.environ.get("DIET_APP_MEMORY_BUDGET_MB", 0))
+    MEMORY_REPORT_FILE: str = os.environ.get("DIET_APP_MEMORY_REPORT", "memory_profile.txt")
+
+
+settings = Settings()
@@ -0,0 +1,240 @@
+"""Ingredient-level dietary classification with one multi-pattern automaton.
+
+Every term list (meat, fish, shellfish, dairy, egg, honey, gelatin, gluten
+grains, nuts) is compiled into a single Aho-Corasick automaton over word
+tokens, so one left-to-right scan of an ingredient finds every term of every
+category at once. Matching whole words keeps "ham" out of "graham" and "egg"
+out of "eggplant"; plural forms are added to the patterns.
+
+Two kinds of phrase refine the raw matches:
+
+* ``OVERRIDES`` are longer phrases whose own categories replace those of the
+  terms inside them ("peanut butter" is nuts, not dairy; "coconut milk" is
+  nothing, "egg substitute" is no egg). A match contained in a longer match
+  is dropped.
+* ``CLEARS`` remove categories from the whole ingredient ("gluten free
+  flour", "vegan cheese", "non-dairy creamer").
+
+Ingredients repeat heavily across recipes, so ``classify_recipes`` scans each
+distinct ingredient string once (the ingredient vocabulary) and ORs the
+results into per-recipe category masks with one sparse product over the
+recipe x ingredient matrix. Dataset flags then follow from ``FLAG_EXCLUDES``;
+recipes without any parsed ingredient get no diet flags.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .keywords import KeywordIndex, build_keyword_index
+
+TERM_LISTS: Dict[str, List[str]] = {
+    'meat': [
+        'beef', 'steak', 'veal', 'pork', 'ham', 'ham hock', 'hamhock', 'hamburger', 'bacon', 'pancetta',
+        'prosciutto', 'salami', 'pepperoni', 'chorizo', 'sausage', 'hot dog', 'bratwurst', 'kielbasa', 'lamb',
+        'mutton', 'goat', 'venison', 'chicken', 'turkey', 'duck', 'goose', 'hen', 'quail', 'meat', 'meatball',
+        'ground round', 'lard', 'suet', 'tallow', 'bone marrow', 'liver', 'oxtail', 'rabbit', 'bison', 'spam',
+    ],
+    'fish': [
+        'fish', 'salmon', 'tuna', 'cod', 'halibut', 'tilapia', 'trout', 'sardine', 'anchovy', 'mackerel',
+        'haddock', 'snapper', 'catfish', 'swordfish', 'mahi mahi', 'sole', 'bass', 'flounder', 'herring',
+        'caviar', 'roe', 'worcestershire sauce', 'bonito', 'surimi',
+    ],
+    'shellfish': [
+        'shrimp', 'prawn', 'crab', 'lobster', 'clam', 'mussel', 'oyster', 'scallop', 'crawfish', 'crayfish',
+        'squid', 'calamari', 'octopus', 'langoustine',
+    ],
+    'dairy': [
+        'milk', 'cheese', 'butter', 'cream', 'yogurt', 'yoghurt', 'ghee', 'whey', 'buttermilk', 'half and half',
+        'mozzarella', 'parmesan', 'cheddar', 'ricotta', 'feta', 'brie', 'mascarpone', 'gouda', 'gruyere',
+        'provolone', 'creme fraiche', 'custard', 'casein', 'kefir', 'paneer', 'velveeta',
+    ],
+    'egg': ['egg', 'egg white', 'egg yolk', 'yolk', 'mayonnaise', 'mayo', 'meringue', 'eggnog'],
+    'honey': ['honey'],
+    'gelatin': ['gelatin', 'gelatine', 'jello', 'jell o', 'marshmallow'],
+    'gluten': [
+        'wheat', 'flour', 'barley', 'rye', 'spelt', 'semolina', 'durum', 'bulgur', 'farro', 'couscous', 'seitan',
+        'malt', 'beer', 'bread', 'breadcrumb', 'panko', 'crouton', 'cracker', 'pastry', 'pie crust', 'biscuit',
+        'bisquick', 'pita', 'bagel', 'pretzel', 'cookie', 'cake mix', 'brownie mix', 'noodle', 'pasta',
+        'spaghetti', 'macaroni', 'lasagna', 'fettuccine', 'linguine', 'penne', 'ravioli', 'tortellini', 'orzo',
+        'gnocchi', 'dumpling', 'wonton wrapper', 'soy sauce', 'teriyaki sauce',
+    ],
+    'nuts': [
+        'nut', 'almond', 'walnut', 'pecan', 'cashew', 'pistachio', 'hazelnut', 'macadamia', 'peanut',
+        'pine nut', 'brazil nut', 'nutella', 'praline', 'marzipan',
+    ],
+}
+
+# Phrases containing a term that mean something else: their categories replace the inner terms'
+OVERRIDES: Dict[str, List[str]] = {
+    'peanut butter': ['nuts'], 'almond butter': ['nuts'], 'cashew butter': ['nuts'],
+    'almond milk': ['nuts'], 'cashew milk': ['nuts'], 'almond flour': ['nuts'], 'almond meal': ['nuts'],
+    'coconut milk': [], 'coconut cream': [], 'cream of coconut': [], 'coconut butter': [],
+    'cocoa butter': [], 'cream of tartar': [], 'butter bean': [], 'soy milk': [], 'rice milk': [],
+    'oat milk': [], 'soy yogurt': [], 'coconut yogurt': [], 'nutritional yeast': [],
+    'rice flour': [], 'corn flour': [], 'potato flour': [], 'chickpea flour': [], 'coconut flour': [],
+    'tapioca flour': [], 'buckwheat flour': [], 'rice noodle': [], 'rice pasta': [], 'corn pasta': [],
+    'rice bread': [], 'rice cracker': [], 'tamari soy sauce': [], 'gluten free soy sauce': [],
+    'goat cheese': ['dairy'], 'goat milk': ['dairy'], 'egg noodle': ['egg', 'gluten'],
+    'egg substitute': [], 'egg replacer': [], 'crab meat': ['shellfish'], 'imitation crab': ['fish'],
+    'imitation crab meat': ['fish'], 'coconut meat': [],
+}
+
+# Phrases that clear categories for the whole ingredient they appear in
+CLEARS: Dict[str, List[str]] = {
+    'gluten free': ['gluten'], 'wheat free': ['gluten'],
+    'dairy free': ['dairy'], 'non dairy': ['dairy'], 'nondairy': ['dairy'], 'lactose free': ['dairy'],
+    'vegan': ['meat', 'fish', 'shellfish', 'dairy', 'egg', 'honey', 'gelatin'],
+    'meatless': ['meat'],
+}
+
+CATEGORIES = list(TERM_LISTS)
+
+# Dataset flag -> ingredient categories that rule it out
+FLAG_EXCLUDES: Dict[str, List[str]] = {
+    'Vegetarian': ['meat', 'fish', 'shellfish', 'gelatin'],
+    'Pescatarian': ['meat', 'gelatin'],
+    'Vegan': ['meat', 'fish', 'shellfish', 'gelatin', 'dairy', 'egg', 'honey'],
+    'DairyFree': ['dairy'],
+    'GlutenFree': ['gluten'],
+}
+
+_WORD = re.compile(r'[a-z]+')
+
+
+def _tokens(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def _plurals(phrase: str) -> List[str]:
+    """``phrase`` plus the plural forms of its last word."""
+    head, _, last = phrase.rpartition(' ')
+    forms = {last, last + 's'}
+    if last.endswith('y') and last[-2:-1] not in 'aeiou':
+        forms.add(last[:-1] + 'ies')
+    if last.endswith(('s', 'sh', 'ch', 'x', 'o')):
+        forms.add(last + 'es')
+    return [f'{head} {form}'.strip() for form in forms]
+
+
+class DietaryClassifier:
+    """Word-level Aho-Corasick automaton over every term list."""
+
+    def __init__(self, term_lists: Dict[str, List[str]] = None, overrides: Dict[str, List[str]] = None,
+                 clears: Dict[str, List[str]] = None):
+        term_lists = TERM_LISTS if term_lists is None else term_lists
+        overrides = OVERRIDES if overrides is None else overrides
+        clears = CLEARS if clears is None else clears
+        self.categories = list(dict.fromkeys(list(term_lists) + [c for cs in overrides.values() for c in cs]
+                                             + [c for cs in clears.values() for c in cs]))
+        self._bits = {category: 1 << i for i, category in enumerate(self.categories)}
+
+        # Per token sequence: (categories it adds, categories it clears)
+        patterns: Dict[Tuple[str, ...], Tuple[int, int]] = {}
+        for category, terms in term_lists.items():
+            for term in terms:
+                for form in _plurals(term):
+                    key = tuple(_tokens(form))
+                    add, clear = patterns.get(key, (0, 0))
+                    patterns[key] = (add | self._bits[category], clear)
+        for phrase, categories in overrides.items():
+            for form in _plurals(phrase):
+                patterns[tuple(_tokens(form))] = (self.mask(categories), 0)
+        for phrase, categories in clears.items():
+            key = tuple(_tokens(phrase))
+            add, clear = patterns.get(key, (0, 0))
+            patterns[key] = (add, clear | self.mask(categories))
+        self._build(patterns)
+
+    def mask(self, categories: Iterable[str]) -> int:
+        mask = 0
+        for category in categories:
+            mask |= self._bits[category]
+        return mask
+
+    def _build(self, patterns: Dict[Tuple[str, ...], Tuple[int, int]]) -> None:
+        # Trie
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[List[Tuple[int, int, int]]] = [[]]
+        for tokens, (add, clear) in patterns.items():
+            state = 0
+            for token in tokens:
+                if token not in self._goto[state]:
+                    self._goto.append({})
+                    self._output.append([])
+                    self._goto[state][token] = len(self._goto) - 1
+                state = self._goto[state][token]
+            self._output[state].append((len(tokens), add, clear))
+
+        # Failure links, breadth first; outputs inherit those of their failure state
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        while queue:
+            next_queue = []
+            for state in queue:
+                for token, child in self._goto[state].items():
+                    if state:
+                        fallback = self._fail[state]
+                        while fallback and token not in self._goto[fallback]:
+                            fallback = self._fail[fallback]
+                        self._fail[child] = self._goto[fallback].get(token, 0)
+                    self._output[child] = self._output[child] + self._output[self._fail[child]]
+                    next_queue.append(child)
+            queue = next_queue
+
+    def scan(self, text: str) -> int:
+        """Category mask of one ingredient, from a single pass over its tokens."""
+        matches = []
+        clear = 0
+        state = 0
+        for position, token in enumerate(_tokens(text)):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for length, adds, clears in self._output[state]:
+                matches.append((position - length + 1, position, adds))
+                clear |= clears
+        mask = 0
+        for start, end, adds in matches:
+            # Terms inside a longer matched phrase take that phrase's meaning
+            if not any(s <= start and end <= e and (s, e) != (start, end) for s, e, _ in matches):
+                mask |= adds
+        return mask & ~clear
+
+    def categories_of(self, text: str) -> List[str]:
+        mask = self.scan(text)
+        return [category for category in self.categories if mask & self._bits[category]]
+
+    def vocabulary_masks(self, vocabulary: Sequence[str]) -> np.ndarray:
+        """(vocabulary x categories) boolean matrix, one scan per distinct ingredient."""
+        masks = np.fromiter((self.scan(term) for term in vocabulary), dtype=np.int64, count=len(vocabulary))
+        bits = np.array([self._bits[category] for category in self.categories], dtype=np.int64)
+        return (masks[:, np.newaxis] & bits) != 0
+
+    def recipe_categories(self, index: KeywordIndex) -> pd.DataFrame:
+        """Per recipe, whether any of its ingredients falls in each category."""
+        hits = index.matrix.astype(np.int32) @ self.vocabulary_masks(index.vocabulary).astype(np.int32)
+        return pd.DataFrame(np.asarray(hits) > 0, columns=self.categories)
+
+    def flags(self, index: KeywordIndex, flag_excludes: Dict[str, List[str]] = None) -> pd.DataFrame:
+        """0/1 diet flags per recipe (index rows); recipes without ingredients get none."""
+        flag_excludes = FLAG_EXCLUDES if flag_excludes is None else flag_excludes
+        categories = self.recipe_categories(index)
+        has_ingredients = np.diff(index.matrix.indptr) > 0
+        return pd.DataFrame({
+            flag: (has_ingredients & ~categories[excluded].to_numpy().any(axis=1)).astype(np.int8)
+            for flag, excluded in flag_excludes.items()
+        })
+
+
+def classify_recipes(ingredient_parts: pd.Series, recipe_ids: Optional[pd.Series] = None,
+                     classifier: Optional[DietaryClassifier] = None) -> Tuple[pd.DataFrame, KeywordIndex]:
+    """Diet flags for a ``RecipeIngredientParts`` column, plus the ingredient index built on the way.
+
+    The flags frame has one row per input row (same order, fresh RangeIndex).
+    """
+    index = build_keyword_index(ingredient_parts, recipe_ids)
+    classifier = classifier if classifier is not None else DietaryClassifier()
+    return classifier.flags(index), index
@@ -0,0 +1,168 @@
+"""Precomputed count / sum / sum-of-squares cube per (flag combination x MealCat).
+
+The export stores one row per flag combination and meal category that
+actually occurs. Loading expands it into a dense array over all ``2**15``
+combinations and applies a superset-sum transform, so that cell ``mask``
+holds the totals of every recipe having *at least* the flags in ``mask``.
+Counts, means and standard deviations for any set of required flags are then
+a single array lookup instead of a pass over the recipe table.
+"""
+
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CUBE_FILE = 'mvp_cube.npz'
+
+
+@dataclass
+class CubeStats:
+    """Aggregates for one cube cell."""
+
+    count: int
+    means: Dict[str, float]
+    stds: Dict[str, float]
+
+    def mean(self, nutrient: str) -> float:
+        return self.means[nutrient]
+
+
+class AggregateCube:
+    """Per-group nutrient aggregates, queryable by required flags and meal category."""
+
+    def __init__(self, flags: List[str], categories: List[str], nutrients: List[str],
+                 keys: np.ndarray, category_codes: np.ndarray, counts: np.ndarray,
+                 valid: np.ndarray, sums: np.ndarray, sumsq: np.ndarray):
+        self.flags = list(flags)
+        self.categories = list(categories)
+        self.nutrients = list(nutrients)
+        self.keys = keys
+        self.category_codes = category_codes
+        self.counts = counts
+        self.valid = valid
+        self.sums = sums
+        self.sumsq = sumsq
+        self._cells: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, flags: Iterable[str], nutrients: Iterable[str]) -> 'AggregateCube':
+        """Aggregate a recipe table into one group per flag combination and meal category."""
+        flags = [flag for flag in flags if flag in df.columns]
+        nutrients = [col for col in nutrients if col in df.columns]
+        keys = np.zeros(len(df), dtype=np.int64)
+        for bit, flag in enumerate(flags):
+            keys |= (df[flag].to_numpy() == 1).astype(np.int64) << bit
+        categories = df['MealCat'].astype('category')
+        values = df[nutrients].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ~np.isnan(values)
+        values = np.where(valid, values, 0.0)
+
+        frame = pd.DataFrame({'key': keys, 'cat': categories.cat.codes.to_numpy()})
+        for i, col in enumerate(nutrients):
+            frame[f'n{i}'] = valid[:, i]
+            frame[f's{i}'] = values[:, i]
+            frame[f'q{i}'] = values[:, i] ** 2
+        grouped = frame.groupby(['key', 'cat'], sort=True)
+        totals = grouped.sum()
+        index = totals.index
+        columns = lambda prefix: totals[[f'{prefix}{i}' for i in range(len(nutrients))]].to_numpy(dtype=np.float64)
+        return cls(
+            flags, [str(c) for c in categories.cat.categories], nutrients,
+            index.get_level_values('key').to_numpy(np.int64),
+            index.get_level_values('cat').to_numpy(np.int64),
+            grouped.size().to_numpy(np.int64),
+            columns('n'), columns('s'), columns('q')
+        )
+
+    # -- persistence ----------------------------------------------------------
+
+    def save(self, data_dir: Path) -> None:
+        np.savez_compressed(
+            Path(data_dir) / CUBE_FILE,
+            flags=np.asarray(self.flags), categories=np.asarray(self.categories),
+            nutrients=np.asarray(self.nutrients), keys=self.keys, category_codes=self.category_codes,
+            counts=self.counts, valid=self.valid, sums=self.sums, sumsq=self.sumsq
+        )
+
+    @classmethod
+    def load(cls, data_dir: Path) -> Optional['AggregateCube']:
+        """Load the exported cube, or ``None`` when the dataset was exported without one."""
+        path = Path(data_dir) / CUBE_FILE
+        if not path.exists():
+            logger.warning("Aggregate cube not found")
+            return None
+        with np.load(path) as arrays:
+            return cls(
+                arrays['flags'].tolist(), arrays['categories'].tolist(), arrays['nutrients'].tolist(),
+                arrays['keys'], arrays['category_codes'], arrays['counts'],
+                arrays['valid'], arrays['sums'], arrays['sumsq']
+            )
+
+    # -- queries ----------------------------------------------------------------
+
+    @property
+    def n_groups(self) -> int:
+        return len(self.keys)
+
+    def mask(self, required_flags: Iterable[str]) -> Optional[int]:
+        """Bit mask of ``required_flags``, or ``None`` if any flag is not part of the cube."""
+        mask = 0
+        for flag in required_flags:
+            if flag not in self.flags:
+                return None
+            mask |= 1 << self.flags.index(flag)
+        return mask
+
+    def stats(self, required_flags: Iterable[str] = (), category: Optional[str] = None) -> Optional[CubeStats]:
+        """Aggregates over recipes having every flag in ``required_flags`` (optionally one category).
+
+        Returns ``None`` when a flag or category is unknown to the cube.
+        """
+        mask = self.mask(required_flags)
+        if mask is None:
+            return None
+        cells = self._superset_cells()[mask]
+        if category is not None:
+            if category not in self.categories:
+                return None
+            cell = cells[self.categories.index(category)]
+        else:
+            cell = cells.sum(axis=0)
+
+        n_nutrients = len(self.nutrients)
+        valid = cell[1:1 + n_nutrients]
+        sums = cell[1 + n_nutrients:1 + 2 * n_nutrients]
+        sumsq = cell[1 + 2 * n_nutrients:]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / valid
+            stds = np.sqrt(np.maximum(sumsq / valid - means ** 2, 0.0))
+        return CubeStats(
+            count=int(round(cell[0])),
+            means=dict(zip(self.nutrients, means.tolist())),
+            stds=dict(zip(self.nutrients, stds.tolist()))
+        )
+
+    def count(self, required_flags: Iterable[str] = (), category: Optional[str] = None) -> Optional[int]:
+        stats = self.stats(required_flags, category)
+        return stats.count if stats is not None else None
+
+    def _superset_cells(self) -> np.ndarray:
+        """Dense ``(2**flags, categories, 1 + 3 * nutrients)`` array of superset totals, built once."""
+        if self._cells is None:
+            n_flags = len(self.flags)
+            cells = np.zeros((1 << n_flags, len(self.categories), 1 + 3 * len(self.nutrients)))
+            np.add.at(cells, (self.keys, self.category_codes),
+                      np.column_stack([self.counts, self.valid, self.sums, self.sumsq]))
+            # Superset-sum transform: fold every combination with bit b set into
+            # the same combination without it, one bit at a time
+            for bit in range(n_flags):
+                view = cells.reshape(-1, 2, 1 << bit, *cells.shape[1:])
+                view[:, 0] += view[:, 1]
+            self._cells = cells
+        return self._cells
@@ -0,0 +1,282 @@
+"""Near-duplicate recipe detection with MinHash signatures and LSH banding.
+
+Food.com holds many variants of the same dish ("Easy Banana Bread", "Best
+Banana Bread", ...). Each recipe is reduced to a set of features, its
+normalised ingredients plus the significant words of its name, and the
+Jaccard similarity of two sets is estimated by how many of ``num_perm``
+MinHash values agree. Signatures are cut into ``bands`` bands; recipes whose
+band matches land in the same bucket, and each bucket member whose estimated
+similarity to the bucket's first member reaches ``threshold`` is linked to it.
+Linked recipes form clusters (connected components), and only recipes of the
+same block (the meal category at export) are ever compared. Links chain (A
+like B and B like C joins A and C however far apart they are), so once a
+cluster's canonical recipe is chosen every member is checked against it, and
+members below ``threshold`` are split off as recipes of their own.
+
+Everything runs on arrays: the feature matrix is the ingredient index
+stacked with a name-token index, signatures come from one ``minimum.reduceat``
+per chunk of rows, and bucketing is a sort per band. A time budget bounds the
+stage; rows not reached in time are kept as singletons.
+
+The export keeps each cluster's best-ranked recipe, tagged with the cluster's
+``ClusterId`` (that recipe's ``RecipeId``) and ``ClusterSize``, and writes the
+IDs of the collapsed recipes to ``DUPLICATES_FILE``.
+"""
+
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from .keywords import KeywordIndex, build_keyword_index
+
+logger = logging.getLogger(__name__)
+
+CLUSTER_COLUMN = 'ClusterId'
+CLUSTER_SIZE_COLUMN = 'ClusterSize'
+# RecipeId -> ClusterId of every collapsed (removed) recipe
+DUPLICATES_FILE = 'mvp_duplicates.csv'
+
+# Hashes are (a * x + b) mod a 31-bit prime: exact in uint64 and stored as uint32
+_PRIME = np.uint64((1 << 31) - 1)
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+_CHUNK_ROWS = 20_000
+
+# Name words that distinguish titles but not dishes
+NAME_STOPWORDS = {
+    'a', 'an', 'and', 'the', 'of', 'with', 'in', 'on', 'for', 'my', 'our', 'your', 's',
+    'easy', 'best', 'quick', 'simple', 'super', 'perfect', 'ultimate', 'favorite', 'favourite',
+    'famous', 'classic', 'homemade', 'delicious', 'yummy', 'tasty', 'awesome', 'great', 'good',
+    'really', 'very', 'world', 'ever', 'recipe', 'style', 'old', 'fashioned', 'grandma', 'mom',
+    'moms', 'mommy', 'aunt', 'nana', 'i', 'ii', 'iii', 'iv', 'v', 'no',
+}
+
+_WORD = re.compile(r'[a-z]+')
+
+
+def name_tokens(name) -> List[str]:
+    """Significant lowercase words of a recipe name."""
+    if not isinstance(name, str):
+        return []
+    return [word for word in _WORD.findall(name.lower()) if word not in NAME_STOPWORDS]
+
+
+def feature_matrix(ingredient_index: KeywordIndex, names: pd.Series) -> sparse.csr_matrix:
+    """Recipe x (ingredient + name word) incidence matrix, rows in ``ingredient_index`` order."""
+    name_index = build_keyword_index(names.map(name_tokens))
+    matrix = sparse.hstack([ingredient_index.matrix, name_index.matrix], format='csr')
+    matrix.sort_indices()
+    return matrix
+
+
+@dataclass
+class DedupResult:
+    """Cluster assignment of every row and how the search went."""
+
+    labels: np.ndarray  # cluster number per row
+    canonical: np.ndarray  # position of each row's canonical row
+    n_rows: int
+    n_clusters: int
+    rows_signed: int
+    bands_used: int
+    seconds: float
+    complete: bool
+    cluster_sizes: np.ndarray = field(repr=False, default=None)
+    detached: int = 0  # rows split off because they were too far from their canonical row
+
+    @property
+    def keep(self) -> np.ndarray:
+        """Mask of the canonical rows."""
+        return self.canonical == np.arange(self.n_rows)
+
+    @property
+    def removed(self) -> int:
+        return self.n_rows - self.n_clusters
+
+
+class MinHashDeduplicator:
+    """MinHash / LSH near-duplicate search over a sparse feature matrix."""
+
+    def __init__(self, num_perm: int = 64, bands: int = 8, threshold: float = 0.8,
+                 time_budget: Optional[float] = None, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.threshold = threshold
+        self.time_budget = time_budget
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+
+    def _feature_hashes(self, n_features: int) -> np.ndarray:
+        """(features x num_perm) uint32 hash of every feature under every permutation."""
+        features = np.arange(1, n_features + 1, dtype=np.uint64)[:, np.newaxis]
+        return ((features * self._a + self._b) % _PRIME).astype(np.uint32)
+
+    def signatures(self, features: sparse.csr_matrix, deadline: Optional[float] = None) -> Tuple[np.ndarray, int]:
+        """MinHash signature per row, and how many leading rows were signed before ``deadline``.
+
+        Rows without features (and rows not reached) keep the all-max signature.
+        """
+        n_rows = features.shape[0]
+        hashes = self._feature_hashes(features.shape[1])
+        result = np.full((n_rows, self.num_perm), _MAX_HASH, dtype=np.uint32)
+        indptr, indices = features.indptr, features.indices
+        signed = 0
+        for start in range(0, n_rows, _CHUNK_ROWS):
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            stop = min(start + _CHUNK_ROWS, n_rows)
+            lo, hi = indptr[start], indptr[stop]
+            if hi > lo:
+                starts = indptr[start:stop] - lo
+                nonempty = starts < np.append(starts[1:], hi - lo)
+                reduced = np.minimum.reduceat(hashes[indices[lo:hi]], starts[nonempty], axis=0)
+                result[start:stop][nonempty] = reduced
+            signed = stop
+        return result, signed
+
+    def _band_keys(self, signatures: np.ndarray, band: int, blocks: np.ndarray) -> np.ndarray:
+        columns = signatures[:, band * self.rows_per_band:(band + 1) * self.rows_per_band].astype(np.uint64)
+        keys = blocks.astype(np.uint64)
+        for column in columns.T:
+            keys = keys * np.uint64(1_000_003) + column
+        return keys
+
+    def find(self, features: sparse.csr_matrix, blocks: Optional[np.ndarray] = None,
+             priority: Optional[np.ndarray] = None) -> DedupResult:
+        """Cluster the rows of ``features``; the highest-``priority`` row of a cluster is canonical.
+
+        Ties go to the earlier row, so a table presorted best-first needs no priority.
+        """
+        started = time.perf_counter()
+        deadline = started + self.time_budget if self.time_budget else None
+        n_rows = features.shape[0]
+        blocks = np.zeros(n_rows, dtype=np.int64) if blocks is None else np.asarray(blocks, dtype=np.int64)
+
+        signatures, signed = self.signatures(features, deadline)
+        candidates = np.flatnonzero(np.diff(features.indptr[:signed + 1]) > 0)
+        sources, targets = [], []
+        bands_used = 0
+        for band in range(self.bands):
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            bands_used += 1
+            if len(candidates) < 2:
+                continue
+            keys = self._band_keys(signatures[candidates], band, blocks[candidates])
+            order = np.argsort(keys, kind='stable')
+            sorted_keys = keys[order]
+            group_start = np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1]))
+            leaders = order[np.flatnonzero(group_start)[np.cumsum(group_start) - 1]]
+            members = order[leaders != order]
+            if not len(members):
+                continue
+            leaders = leaders[leaders != order]
+            rows, heads = candidates[members], candidates[leaders]
+            agreement = (signatures[rows] == signatures[heads]).mean(axis=1)
+            similar = agreement >= self.threshold
+            sources.append(rows[similar])
+            targets.append(heads[similar])
+
+        if sources:
+            sources, targets = np.concatenate(sources), np.concatenate(targets)
+        else:
+            sources = targets = np.empty(0, dtype=np.int64)
+        graph = sparse.coo_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)),
+                                  shape=(n_rows, n_rows))
+        n_clusters, labels = connected_components(graph, directed=False)
+
+        # Canonical row: best priority within the cluster, then earliest position
+        positions = np.arange(n_rows)
+        priority = np.zeros(n_rows) if priority is None else np.asarray(priority, dtype=np.float64)
+        order = np.lexsort((positions, -priority, labels))
+        first = np.concatenate(([True], labels[order][1:] != labels[order][:-1])) if n_rows else order.astype(bool)
+        canonical_of_label = np.empty(n_clusters, dtype=np.int64)
+        canonical_of_label[labels[order][first]] = order[first]
+        canonical = canonical_of_label[labels]
+
+        # Only keep members that are themselves similar to the row they collapse into
+        linked = np.flatnonzero(canonical != positions)
+        agreement = (signatures[linked] == signatures[canonical[linked]]).mean(axis=1)
+        detached = linked[agreement < self.threshold]
+        labels[detached] = n_clusters + np.arange(len(detached))
+        canonical[detached] = detached
+        n_clusters += len(detached)
+
+        seconds = time.perf_counter() - started
+        complete = signed == n_rows and bands_used == self.bands
+        if not complete:
+            logger.warning("Deduplication hit its %.0fs budget: %d of %d rows signed, %d of %d bands",
+                           self.time_budget, signed, n_rows, bands_used, self.bands)
+        return DedupResult(labels=labels, canonical=canonical, n_rows=n_rows,
+                           n_clusters=int(n_clusters), rows_signed=int(signed), bands_used=bands_used,
+                           seconds=seconds, complete=complete,
+                           cluster_sizes=np.bincount(labels, minlength=n_clusters), detached=len(detached))
+
+
+def collapse_near_duplicates(df: pd.DataFrame, ingredient_index: KeywordIndex,
+                             deduplicator: Optional[MinHashDeduplicator] = None,
+                             block_column: str = 'MealCat', priority_column: Optional[str] = 'RankScore',
+                             top_clusters: int = 10) -> Tuple[pd.DataFrame, pd.DataFrame, Dict]:
+    """Keep one canonical row per near-duplicate cluster, tagged with its ``ClusterId`` and ``ClusterSize``.
+
+    ``ClusterId`` is the canonical row's ``RecipeId``. Returns the collapsed
+    frame (row order preserved), the ``RecipeId`` -> ``ClusterId`` map of the
+    removed rows, and a report of how much the table shrank.
+    """
+    deduplicator = deduplicator if deduplicator is not None else MinHashDeduplicator()
+    index = ingredient_index.aligned_to(df['RecipeId'].to_numpy())
+    features = feature_matrix(index, df['Name'])
+    blocks = pd.factorize(df[block_column])[0] if block_column in df.columns else None
+    priority = df[priority_column].to_numpy() if priority_column in df.columns else None
+    result = deduplicator.find(features, blocks, priority)
+
+    recipe_ids = df['RecipeId'].to_numpy()
+    cluster_ids = recipe_ids[result.canonical]
+    sizes = result.cluster_sizes
+    keep = result.keep
+    collapsed = df[keep].copy()
+    collapsed[CLUSTER_COLUMN] = cluster_ids[keep]
+    collapsed[CLUSTER_SIZE_COLUMN] = sizes[result.labels[keep]].astype(np.int32)
+    collapsed = collapsed.reset_index(drop=True)
+    duplicates = pd.DataFrame({'RecipeId': recipe_ids[~keep], CLUSTER_COLUMN: cluster_ids[~keep]})
+
+    largest = np.argsort(-sizes, kind='stable')[:top_clusters]
+    canonical_of_label = np.empty(result.n_clusters, dtype=np.int64)
+    canonical_of_label[result.labels] = result.canonical
+    memory_before = df.memory_usage(deep=True).sum() / 1024**2
+    memory_after = collapsed.memory_usage(deep=True).sum() / 1024**2
+    report = {
+        'method': 'minhash_lsh',
+        'features': ['RecipeIngredientParts', 'Name'],
+        'blocked_by': block_column if blocks is not None else None,
+        'num_perm': deduplicator.num_perm,
+        'bands': deduplicator.bands,
+        'threshold': deduplicator.threshold,
+        'rows_before': result.n_rows,
+        'rows_after': len(collapsed),
+        'rows_removed': result.removed,
+        'shrink_pct': round(100 * result.removed / result.n_rows, 2) if result.n_rows else 0.0,
+        'memory_mb_before': round(memory_before, 1),
+        'memory_mb_after': round(memory_after, 1),
+        'clusters_with_duplicates': int((sizes > 1).sum()),
+        'rows_detached': result.detached,
+        'largest_clusters': [
+            {'cluster_id': int(recipe_ids[canonical_of_label[label]]),
+             'name': str(df['Name'].iat[canonical_of_label[label]]), 'size': int(sizes[label])}
+            for label in largest if sizes[label] > 1
+        ],
+        'seconds': round(result.seconds, 2),
+        'time_budget_s': deduplicator.time_budget,
+        'complete': result.complete,
+    }
+    return collapsed, duplicates, report
@@ -0,0 +1,236 @@
+"""Normalized ingredient quantity table and vectorized shopping-list aggregation.
+
+``RecipeIngredientQuantities`` holds free-text amounts ("1 1/2", "2 -3",
+"8 oz") positionally aligned with ``RecipeIngredientParts``. The export
+parses them once into numeric amounts with normalized units (grams,
+millilitres or plain counts) and stores one columnar entry per
+(recipe, ingredient), grouped by recipe in ``RecipeId`` order. A shopping list
+for any set of recipes is then an index gather plus a group-by, with no string
+parsing at request time.
+"""
+
+import logging
+import re
+from fractions import Fraction
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+QUANTITY_TABLE_FILE = 'mvp_ingredient_quantities.npz'
+
+# Normalized units; amounts in other units are converted into these. Counted
+# items keep their noun ("2 cloves" and "1 head" of garlic are not added up);
+# a bare number is a count of the ingredient itself ('')
+COUNT_UNITS = ['clove', 'can', 'package', 'head', 'slice', 'stick', 'bunch', 'pinch', 'dash', 'sprig', 'jar',
+               'bottle', 'envelope', 'packet', 'box', 'bag', 'container', 'piece', 'stalk', 'leaf', 'loaf', 'drop']
+UNITS = ['', 'g', 'ml'] + COUNT_UNITS
+_IRREGULAR_PLURALS = {'leaves': 'leaf', 'loaves': 'loaf'}
+
+_UNIT_FACTORS = {
+    'g': ('g', 1.0), 'gram': ('g', 1.0), 'kg': ('g', 1000.0), 'kilogram': ('g', 1000.0),
+    'oz': ('g', 28.3495), 'ounce': ('g', 28.3495), 'lb': ('g', 453.592), 'pound': ('g', 453.592),
+    'ml': ('ml', 1.0), 'milliliter': ('ml', 1.0), 'l': ('ml', 1000.0), 'liter': ('ml', 1000.0),
+    'tsp': ('ml', 4.92892), 'teaspoon': ('ml', 4.92892), 'tbsp': ('ml', 14.7868), 'tablespoon': ('ml', 14.7868),
+    'cup': ('ml', 236.588), 'pint': ('ml', 473.176), 'quart': ('ml', 946.353), 'gallon': ('ml', 3785.41),
+    'fl oz': ('ml', 29.5735),
+}
+
+_UNICODE_FRACTIONS = {'½': ' 1/2', '⅓': ' 1/3', '⅔': ' 2/3', '¼': ' 1/4', '¾': ' 3/4', '⅛': ' 1/8'}
+# "1-1/2": a whole number joined to a proper fraction by a hyphen is a mixed number, not a range
+_MIXED_NUMBER = re.compile(r'(?<![\d/.])(\d+)\s*-\s*(\d+)/(\d+)')
+_NUMBER = re.compile(r'\d+\s+\d+/\d+|\d+/\d+|\d*\.\d+|\d+')
+_R_VECTOR_ITEM = re.compile(r'"([^"]*)"|\bNA\b')
+
+
+def split_r_vector(value) -> List[str]:
+    """Items of a ``c("a", NA, "b")`` cell, keeping positions (``NA`` becomes '')."""
+    if not isinstance(value, str) or value == '':
+        return []
+    items = _R_VECTOR_ITEM.findall(value)
+    if not items and not value.startswith('c('):
+        items = [value]
+    return [item.strip() for item in items]
+
+
+def _to_number(text: str) -> float:
+    parts = text.split()
+    return float(sum(Fraction(part) for part in parts))
+
+
+def _mixed_number(match: re.Match) -> str:
+    whole, numerator, denominator = match.groups()
+    if int(numerator) < int(denominator):
+        return f'{whole} {numerator}/{denominator}'
+    return match.group(0)
+
+
+def parse_quantity(text: str) -> Tuple[float, str]:
+    """Parse a free-text amount into ``(amount, normalized unit)``.
+
+    Ranges ("2 -3") take the upper bound, which is what a shopping list needs;
+    "1-1/2" is the mixed number 1.5. Unparseable or empty amounts give ``nan``.
+    """
+    if not isinstance(text, str):
+        return np.nan, ''
+    for symbol, replacement in _UNICODE_FRACTIONS.items():
+        text = text.replace(symbol, replacement)
+    text = _MIXED_NUMBER.sub(_mixed_number, text.strip().lower())
+    numbers = _NUMBER.findall(text)
+    if not numbers:
+        return np.nan, ''
+    try:
+        amount = _to_number(numbers[-1] if re.search(r'\d\s*-\s*\d', text) else numbers[0])
+    except (ValueError, ZeroDivisionError):
+        return np.nan, ''
+
+    rest = _NUMBER.sub(' ', text).replace('-', ' ').replace('.', ' ')
+    words = rest.split()
+    for size in (2, 1):
+        for i in range(len(words) - size + 1):
+            word = ' '.join(words[i:i + size]).rstrip('s') if size == 1 else ' '.join(words[i:i + size])
+            if word in _UNIT_FACTORS:
+                unit, factor = _UNIT_FACTORS[word]
+                return amount * factor, unit
+    for word in words:
+        word = _IRREGULAR_PLURALS.get(word, word)
+        nouns = (word, word[:-1], word[:-2]) if word.endswith('s') else (word,)
+        for noun in nouns:
+            if noun in COUNT_UNITS:
+                return amount, noun
+    return amount, ''
+
+
+class IngredientQuantityTable:
+    """Columnar (recipe, ingredient, amount, unit) entries grouped by recipe.
+
+    Entries of the recipe ``recipe_ids[i]`` are ``indptr[i]:indptr[i + 1]``;
+    ``recipe_ids`` is sorted so lookups are a ``searchsorted``.
+    """
+
+    def __init__(self, vocabulary: List[str], recipe_ids: np.ndarray, indptr: np.ndarray,
+                 ingredient_ids: np.ndarray, amounts: np.ndarray, unit_codes: np.ndarray):
+        self.vocabulary = list(vocabulary)
+        self.recipe_ids = recipe_ids
+        self.indptr = indptr
+        self.ingredient_ids = ingredient_ids
+        self.amounts = amounts
+        self.unit_codes = unit_codes
+
+    @property
+    def n_entries(self) -> int:
+        return len(self.ingredient_ids)
+
+    def save(self, data_dir: Path) -> None:
+        np.savez_compressed(
+            Path(data_dir) / QUANTITY_TABLE_FILE,
+            vocabulary=np.asarray(self.vocabulary), recipe_ids=self.recipe_ids, indptr=self.indptr,
+            ingredient_ids=self.ingredient_ids, amounts=self.amounts, unit_codes=self.unit_codes
+        )
+
+    @classmethod
+    def load(cls, data_dir: Path) -> Optional['IngredientQuantityTable']:
+        """Load the exported table, or ``None`` when the dataset was exported without one."""
+        path = Path(data_dir) / QUANTITY_TABLE_FILE
+        if not path.exists():
+            logger.warning("Ingredient quantity table not found, shopping lists are unavailable")
+            return None
+        with np.load(path) as arrays:
+            return cls(arrays['vocabulary'].tolist(), arrays['recipe_ids'], arrays['indptr'],
+                       arrays['ingredient_ids'], arrays['amounts'], arrays['unit_codes'])
+
+    def entries_for(self, recipe_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Entry positions for ``recipe_ids`` plus, per entry, the index of the recipe it came from."""
+        recipe_ids = np.asarray(list(recipe_ids), dtype=self.recipe_ids.dtype)
+        positions = np.searchsorted(self.recipe_ids, recipe_ids)
+        positions = np.minimum(positions, len(self.recipe_ids) - 1)
+        found = self.recipe_ids[positions] == recipe_ids
+        starts = np.where(found, self.indptr[positions], 0)
+        lengths = np.where(found, self.indptr[positions + 1] - self.indptr[positions], 0)
+        owners = np.repeat(np.arange(len(recipe_ids)), lengths)
+        # Concatenated ranges without a Python loop: start of each range plus offset within it
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return np.repeat(starts, lengths) + offsets, owners
+
+    def shopping_lists(self, assignments: pd.DataFrame, group_column: str = 'Group') -> pd.DataFrame:
+        """Aggregate ingredients for many recipe sets at once.
+
+        ``assignments`` has one row per planned recipe with ``group_column``
+        (a plan, a day, a user...), ``RecipeId`` and an optional ``Multiplier``
+        (portions). Returns one row per (group, ingredient, unit) with the summed
+        amount and the number of recipes using it: amounts are only added up
+        for the same ingredient in the same unit. Amounts that could not be
+        parsed are counted but not summed.
+        """
+        entries, owners = self.entries_for(assignments['RecipeId'].to_numpy())
+        multipliers = (assignments['Multiplier'].to_numpy(dtype=np.float64)
+                       if 'Multiplier' in assignments.columns else np.ones(len(assignments)))
+        frame = pd.DataFrame({
+            group_column: assignments[group_column].to_numpy()[owners],
+            'IngredientId': self.ingredient_ids[entries],
+            'UnitCode': self.unit_codes[entries],
+            'Amount': self.amounts[entries].astype(np.float64) * multipliers[owners],
+        })
+        grouped = frame.groupby([group_column, 'IngredientId', 'UnitCode'], sort=False)
+        totals = grouped['Amount'].sum(min_count=1).to_frame()
+        totals['Recipes'] = grouped.size()
+        totals = totals.reset_index()
+        vocabulary = np.asarray(self.vocabulary, dtype=object)
+        units = np.asarray(UNITS, dtype=object)
+        totals.insert(1, 'Ingredient', vocabulary[totals['IngredientId'].to_numpy()])
+        totals.insert(3, 'Unit', units[totals['UnitCode'].to_numpy()])
+        totals = totals.drop(columns=['IngredientId', 'UnitCode'])
+        return totals.sort_values([group_column, 'Recipes', 'Ingredient'],
+                                  ascending=[True, False, True]).reset_index(drop=True)
+
+    def shopping_list(self, recipe_ids: Iterable[int], multipliers: Optional[Iterable[float]] = None) -> pd.DataFrame:
+        """Shopping list for one set of recipes (``Ingredient``, ``Amount``, ``Unit``, ``Recipes``)."""
+        recipe_ids = list(recipe_ids)
+        assignments = pd.DataFrame({'Group': 0, 'RecipeId': recipe_ids})
+        if multipliers is not None:
+            assignments['Multiplier'] = list(multipliers)
+        return self.shopping_lists(assignments).drop(columns=['Group'])
+
+
+def build_quantity_table(parts: pd.Series, quantities: pd.Series, recipe_ids: pd.Series,
+                         vocabulary: Optional[List[str]] = None) -> IngredientQuantityTable:
+    """Parse ingredient names and amounts into an ``IngredientQuantityTable``.
+
+    Only the distinct quantity strings are parsed (a few thousand for the
+    whole catalogue). Recipes whose quantity list does not line up with their
+    ingredient list keep their ingredients with unknown amounts.
+    """
+    order = np.argsort(recipe_ids.to_numpy(), kind='stable')
+    part_lists = parts.iloc[order].map(split_r_vector).tolist()
+    quantity_lists = quantities.iloc[order].map(split_r_vector).tolist()
+    quantity_lists = [q if len(q) == len(p) else [''] * len(p) for p, q in zip(part_lists, quantity_lists)]
+
+    lengths = np.fromiter((len(p) for p in part_lists), dtype=np.int64, count=len(part_lists))
+    names = pd.Series([name.lower() for items in part_lists for name in items], dtype=object)
+    amounts_text = pd.Series([q for items in quantity_lists for q in items], dtype=object)
+
+    if vocabulary is None:
+        vocabulary = names.value_counts().index.tolist()
+    ingredient_ids = pd.Index(vocabulary).get_indexer(names)
+    if (ingredient_ids < 0).any():
+        # Names missing from a supplied vocabulary are appended to it
+        missing = pd.unique(names[ingredient_ids < 0])
+        vocabulary = list(vocabulary) + list(missing)
+        ingredient_ids = pd.Index(vocabulary).get_indexer(names)
+
+    codes, uniques = pd.factorize(amounts_text)
+    parsed = [parse_quantity(text) for text in uniques]
+    unique_amounts = np.array([amount for amount, _ in parsed], dtype=np.float32)
+    unique_units = np.array([UNITS.index(unit) for _, unit in parsed], dtype=np.int8)
+
+    return IngredientQuantityTable(
+        vocabulary,
+        recipe_ids.to_numpy()[order],
+        np.concatenate(([0], np.cumsum(lengths))),
+        ingredient_ids.astype(np.int32),
+        unique_amounts[codes] if len(codes) else np.empty(0, dtype=np.float32),
+        unique_units[codes] if len(codes) else np.empty(0, dtype=np.int8),
+    )
@@ -0,0 +1,198 @@
+"""Dictionary-encoded keyword vocabulary and sparse recipe x keyword matrix.
+
+Keywords are encoded once at export time into integer IDs (most frequent
+first) and stored as a CSR matrix whose rows follow the dataset's row order.
+Keyword filters and new flags are then answered at query time from the
+matrix's columns instead of re-parsing the stringified keyword lists. The
+same encoding is used for ingredient names.
+"""
+
+import ast
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+KEYWORD_VOCAB_FILE = 'mvp_keyword_vocab.json'
+KEYWORD_MATRIX_FILE = 'mvp_keyword_matrix.npz'
+INGREDIENT_VOCAB_FILE = 'mvp_ingredient_vocab.json'
+INGREDIENT_MATRIX_FILE = 'mvp_ingredient_matrix.npz'
+
+_QUOTED = re.compile(r'"([^"]*)"')
+
+
+def parse_keywords(value) -> List[str]:
+    """Normalise a keyword cell (list, ``c("a", "b")`` or ``['a', 'b']``) to lowercase strings."""
+    if isinstance(value, (list, tuple, np.ndarray)):
+        items = value
+    elif not isinstance(value, str) or value == '':
+        return []
+    elif value.startswith('['):
+        try:
+            items = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            items = value.strip('[]').split(',')
+    else:
+        items = _QUOTED.findall(value) or value.strip('c()').split(',')
+    return [str(item).strip().strip('"\'').lower() for item in items if str(item).strip()]
+
+
+class KeywordIndex:
+    """Keyword vocabulary plus a recipe x keyword incidence matrix."""
+
+    def __init__(self, vocabulary: Sequence[str], matrix: sparse.csr_matrix,
+                 recipe_ids: Optional[np.ndarray] = None):
+        self.vocabulary = list(vocabulary)
+        self.ids: Dict[str, int] = {keyword: i for i, keyword in enumerate(self.vocabulary)}
+        self.matrix = matrix.tocsr()
+        self.recipe_ids = recipe_ids
+        self._by_keyword: Optional[sparse.csc_matrix] = None
+
+    @property
+    def n_recipes(self) -> int:
+        return self.matrix.shape[0]
+
+    @property
+    def by_keyword(self) -> sparse.csc_matrix:
+        """Column-major copy of the matrix, built on first use, for cheap per-keyword row lookups."""
+        if self._by_keyword is None:
+            self._by_keyword = self.matrix.tocsc()
+        return self._by_keyword
+
+    def keyword_counts(self) -> np.ndarray:
+        """Number of recipes tagged with each keyword, by keyword ID."""
+        return np.diff(self.by_keyword.indptr)
+
+    def keyword_ids(self, keywords: Iterable[str]) -> np.ndarray:
+        """IDs of the given keywords; unknown keywords raise ``KeyError``."""
+        ids = []
+        for keyword in keywords:
+            normalised = keyword.strip().lower()
+            if normalised not in self.ids:
+                raise KeyError(f"Unknown keyword '{keyword}'")
+            ids.append(self.ids[normalised])
+        return np.asarray(ids, dtype=np.int64)
+
+    def rows_with(self, keyword: str) -> np.ndarray:
+        """Sorted row positions of recipes tagged with ``keyword``."""
+        keyword_id = self.keyword_ids([keyword])[0]
+        columns = self.by_keyword
+        return columns.indices[columns.indptr[keyword_id]:columns.indptr[keyword_id + 1]]
+
+    def rows_matching(self, term: str) -> np.ndarray:
+        """Sorted row positions of recipes with any keyword containing ``term`` (e.g. 'peanut')."""
+        term = term.strip().lower()
+        columns = self.by_keyword
+        slices = [columns.indices[columns.indptr[i]:columns.indptr[i + 1]]
+                  for i, keyword in enumerate(self.vocabulary) if term in keyword]
+        if not slices:
+            return np.empty(0, dtype=columns.indices.dtype)
+        return slices[0] if len(slices) == 1 else np.unique(np.concatenate(slices))
+
+    def rows_with_any(self, keywords: Iterable[str]) -> np.ndarray:
+        """Boolean row mask: recipe has at least one of ``keywords``."""
+        mask = np.zeros(self.n_recipes, dtype=bool)
+        for keyword in keywords:
+            mask[self.rows_with(keyword)] = True
+        return mask
+
+    def rows_with_all(self, keywords: Iterable[str]) -> np.ndarray:
+        """Boolean row mask: recipe has every one of ``keywords``."""
+        keywords = list(keywords)
+        if not keywords:
+            return np.ones(self.n_recipes, dtype=bool)
+        counts = np.asarray(self.by_keyword[:, self.keyword_ids(keywords)].sum(axis=1)).ravel()
+        return counts == len(keywords)
+
+    def define_flag(self, any_of: Iterable[str] = (), all_of: Iterable[str] = (),
+                    none_of: Iterable[str] = ()) -> np.ndarray:
+        """Build a 0/1 flag column at runtime from keyword rules (unknown keywords match nothing)."""
+        known = lambda keywords: [k for k in keywords if k.strip().lower() in self.ids]
+        any_of, all_of, none_of = list(any_of), list(all_of), list(none_of)
+        mask = np.ones(self.n_recipes, dtype=bool)
+        if any_of:
+            mask &= self.rows_with_any(known(any_of))
+        if all_of:
+            mask &= self.rows_with_all(all_of) if len(known(all_of)) == len(all_of) else False
+        if none_of:
+            mask &= ~self.rows_with_any(known(none_of))
+        return mask.astype(np.int8)
+
+    def aligned_to(self, recipe_ids: np.ndarray) -> 'KeywordIndex':
+        """Index whose rows follow ``recipe_ids`` (a no-op when the order already matches)."""
+        recipe_ids = np.asarray(recipe_ids)
+        if self.recipe_ids is None or np.array_equal(self.recipe_ids, recipe_ids):
+            return self
+        positions = pd.Index(self.recipe_ids).get_indexer(recipe_ids)
+        if (positions < 0).any():
+            raise ValueError("Keyword matrix does not cover every recipe in the table")
+        return KeywordIndex(self.vocabulary, self.matrix[positions], recipe_ids)
+
+    def save(self, data_dir: Path, vocab_file: str = KEYWORD_VOCAB_FILE,
+             matrix_file: str = KEYWORD_MATRIX_FILE) -> None:
+        data_dir = Path(data_dir)
+        with open(data_dir / vocab_file, 'w') as f:
+            json.dump({'keywords': self.vocabulary, 'counts': self.keyword_counts().tolist()}, f)
+        np.savez_compressed(
+            data_dir / matrix_file,
+            indptr=self.matrix.indptr, indices=self.matrix.indices,
+            shape=np.asarray(self.matrix.shape),
+            recipe_ids=self.recipe_ids if self.recipe_ids is not None else np.empty(0, dtype=np.int64)
+        )
+
+    @classmethod
+    def load(cls, data_dir: Path, vocab_file: str = KEYWORD_VOCAB_FILE,
+             matrix_file: str = KEYWORD_MATRIX_FILE) -> Optional['KeywordIndex']:
+        """Load a saved index, or ``None`` when the dataset was exported without one."""
+        data_dir = Path(data_dir)
+        vocab_path = data_dir / vocab_file
+        matrix_path = data_dir / matrix_file
+        if not vocab_path.exists() or not matrix_path.exists():
+            logger.warning(f"{matrix_file} not found, filters on it are unavailable")
+            return None
+        with open(vocab_path) as f:
+            vocabulary = json.load(f)['keywords']
+        with np.load(matrix_path) as arrays:
+            indices = arrays['indices']
+            matrix = sparse.csr_matrix(
+                (np.ones(len(indices), dtype=np.int8), indices, arrays['indptr']),
+                shape=tuple(arrays['shape'])
+            )
+            recipe_ids = arrays['recipe_ids'] if len(arrays['recipe_ids']) else None
+        return cls(vocabulary, matrix, recipe_ids)
+
+
+def build_keyword_index(keywords: pd.Series, recipe_ids: Optional[pd.Series] = None) -> KeywordIndex:
+    """Encode a keyword column into a vocabulary (most frequent first) and a CSR matrix."""
+    keyword_lists = keywords.map(parse_keywords)
+    lengths = keyword_lists.map(len).to_numpy()
+    rows = np.repeat(np.arange(len(keyword_lists)), lengths)
+    flat = pd.Series([keyword for items in keyword_lists for keyword in items], dtype=object)
+
+    codes, uniques = pd.factorize(flat)
+    # Drop repeated keywords within a recipe
+    pairs = np.unique(np.stack([rows, codes], axis=1), axis=0) if len(codes) else np.empty((0, 2), dtype=np.int64)
+    rows, codes = pairs[:, 0], pairs[:, 1]
+
+    # Re-number so the most common keywords get the smallest IDs
+    frequency = np.bincount(codes, minlength=len(uniques))
+    by_frequency = np.argsort(-frequency, kind='stable')
+    new_ids = np.empty_like(by_frequency)
+    new_ids[by_frequency] = np.arange(len(by_frequency))
+    codes = new_ids[codes]
+    vocabulary = [uniques[i] for i in by_frequency]
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(codes), dtype=np.int8), (rows, codes)),
+        shape=(len(keyword_lists), len(vocabulary))
+    )
+    matrix.sort_indices()
+    ids = recipe_ids.to_numpy() if recipe_ids is not None else None
+    return KeywordIndex(vocabulary, matrix, ids)
@@ -0,0 +1,173 @@
+"""Parsed-column cache keyed by the dataset's content hash and schema version.
+
+Parsing and validating ``mvp_recipes_clean.csv`` dominates a cold start, yet
+the file only changes when it is re-exported. The first load of a column group
+therefore saves the parsed columns as one ``.npy`` file each, together with the
+validation report, under::
+
+    <LOAD_CACHE_DIR>/<content hash>-v<SCHEMA_VERSION>/<entry key>/
+
+Later starts map numeric and categorical columns straight from those files
+(``np.load(mmap_mode='r')``: read-only, paged in on demand); text columns are
+unpickled, which still skips CSV tokenising and type inference.
+
+Hashing the whole file on every start would defeat the point, so the hash is
+recorded in ``dataset.stamp.json`` next to the file's size and mtime and only
+recomputed when those change. A re-export produces a new hash, and the entries
+of older hashes are deleted when the first new entry is written. Partition
+files come from the same export as the main file and share its hash. Bump
+``SCHEMA_VERSION`` whenever the column groups, their dtypes or the validation
+rules change.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..config.settings import settings
+from ..utils.metrics import metrics
+from .validation import ValidationReport
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+STAMP_FILE = 'dataset.stamp.json'
+COLUMNS_FILE = 'columns.json'
+VALIDATION_FILE = 'validation.json'
+
+_HASH_CHUNK = 1 << 20
+
+
+def file_digest(path: Path) -> str:
+    """BLAKE2b digest of a file's contents, read in 1 MB blocks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class LoadCache:
+    """Cache of parsed column groups for one data directory."""
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else settings.LOAD_CACHE_DIR
+
+    # -- keys -----------------------------------------------------------------
+
+    def dataset_hash(self, dataset_path: Path) -> str:
+        """Content hash of ``dataset_path``, recomputed only when its size or mtime changed."""
+        stat = dataset_path.stat()
+        stamp_path = self.cache_dir / STAMP_FILE
+        try:
+            stamp = json.loads(stamp_path.read_text())
+            if (stamp['file'] == str(dataset_path.resolve()) and stamp['size'] == stat.st_size
+                    and stamp['mtime_ns'] == stat.st_mtime_ns):
+                return stamp['hash']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        content_hash = file_digest(dataset_path)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        stamp = {'file': str(dataset_path.resolve()), 'size': stat.st_size,
+                 'mtime_ns': stat.st_mtime_ns, 'hash': content_hash}
+        _write_atomic(stamp_path, json.dumps(stamp))
+        return content_hash
+
+    def entry_dir(self, dataset_path: Path, key: Dict) -> Path:
+        key_hash = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        return self.cache_dir / f'{self.dataset_hash(dataset_path)}-v{SCHEMA_VERSION}' / key_hash
+
+    # -- entries ------------------------------------------------------------------
+
+    def load(self, dataset_path: Path, key: Dict) -> Optional[Tuple[pd.DataFrame, ValidationReport]]:
+        """The cached frame and validation report for ``key``, or ``None`` on a miss."""
+        entry = self.entry_dir(dataset_path, key)
+        if not (entry / COLUMNS_FILE).exists():
+            metrics.increment('load_cache', result='miss')
+            return None
+        try:
+            layout = json.loads((entry / COLUMNS_FILE).read_text())
+            columns = {spec['name']: _read_column(entry, position, spec)
+                       for position, spec in enumerate(layout['columns'])}
+            report = ValidationReport.from_dict(json.loads((entry / VALIDATION_FILE).read_text()))
+        except (OSError, ValueError, KeyError, TypeError, EOFError, pickle.UnpicklingError) as e:
+            # Text columns are pickled, so a torn write surfaces as an unpickling error
+            logger.warning(f"Discarding unreadable load cache entry {entry}: {e}")
+            shutil.rmtree(entry, ignore_errors=True)
+            metrics.increment('load_cache', result='corrupt')
+            return None
+        metrics.increment('load_cache', result='hit')
+        return pd.DataFrame(columns, index=pd.RangeIndex(layout['rows']), copy=False), report
+
+    def store(self, dataset_path: Path, key: Dict, df: pd.DataFrame, report: ValidationReport) -> None:
+        """Save ``df`` and its report under ``key``; failures only log (the cache is optional)."""
+        entry = self.entry_dir(dataset_path, key)
+        staging = entry.with_name(f'{entry.name}.tmp{os.getpid()}')
+        try:
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.mkdir(parents=True)
+            layout = {'rows': len(df), 'key': key,
+                      'columns': [_write_column(staging, position, name, df[name])
+                                  for position, name in enumerate(df.columns)]}
+            (staging / VALIDATION_FILE).write_text(json.dumps(report.to_dict()))
+            (staging / COLUMNS_FILE).write_text(json.dumps(layout, default=str))
+            try:
+                staging.rename(entry)
+            except OSError:
+                # Another process finished the same entry first
+                shutil.rmtree(staging, ignore_errors=True)
+        except OSError as e:
+            logger.warning(f"Could not write load cache entry {entry}: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+        self._prune(keep=entry.parent)
+
+    def clear(self) -> None:
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _prune(self, keep: Path) -> None:
+        """Delete entries of other dataset versions or schema versions."""
+        for directory in self.cache_dir.iterdir():
+            if directory.is_dir() and directory != keep:
+                shutil.rmtree(directory, ignore_errors=True)
+                logger.info(f"Removed stale load cache {directory}")
+
+
+def _write_column(directory: Path, position: int, name: str, series: pd.Series) -> Dict:
+    path = directory / f'{position:03d}.npy'
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        np.save(path, series.cat.codes.to_numpy())
+        return {'name': name, 'kind': 'category', 'categories': series.cat.categories.tolist(),
+                'ordered': bool(series.cat.ordered)}
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufcmM':
+        np.save(path, series.to_numpy())
+        return {'name': name, 'kind': 'array'}
+    # Text and other extension types: a pickled object array, restored to the original dtype
+    np.save(path, series.to_numpy(dtype=object), allow_pickle=True)
+    return {'name': name, 'kind': 'object', 'dtype': str(series.dtype)}
+
+
+def _read_column(directory: Path, position: int, spec: Dict):
+    path = directory / f'{position:03d}.npy'
+    if spec['kind'] == 'object':
+        return pd.array(np.load(path, allow_pickle=True), dtype=spec['dtype'])
+    # A plain ndarray view over the mapping, so the memmap subclass does not leak into results
+    values = np.load(path, mmap_mode='r').view(np.ndarray)
+    if spec['kind'] == 'category':
+        return pd.Categorical.from_codes(values, categories=spec['categories'], ordered=spec['ordered'])
+    return values
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    staging = path.with_name(f'{path.name}.tmp{os.getpid()}')
+    staging.write_text(text)
+    os.replace(staging, path)
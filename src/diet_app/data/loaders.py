@@ -0,0 +1,322 @@
+"""Data loading utilities for the diet recommendation app."""
+
+import json
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..config.settings import settings
+from .cube import AggregateCube
+from .ingredients import IngredientQuantityTable
+from .keywords import INGREDIENT_MATRIX_FILE, INGREDIENT_VOCAB_FILE, KeywordIndex
+from .load_cache import LoadCache
+from .partitions import PartitionManifest
+from .validation import ValidationReport, validate_table
+from ..models.ranking import RANK_SCORE_COLUMN, add_rank_score, sort_by_rank
+from ..utils.metrics import metrics
+from ..utils.profiling import profiler
+
+logger = logging.getLogger(__name__)
+
+FLAG_COLUMNS = [
+    'Easy', 'Vegan', 'Vegetarian', 'Pescatarian',
+    'Quick', 'StandardPrepTime', 'LongPrepTime',
+    'LowCalorie', 'ModerateCalorie', 'HighCalorie',
+    'LowProtein', 'ModerateProtein', 'HighProtein',
+    'GlutenFree', 'DairyFree'
+]
+
+NUTRITION_COLUMNS = [
+    'Calories', 'ProteinContent', 'FatContent', 'SaturatedFatContent',
+    'CarbohydrateContent', 'SodiumContent', 'FiberContent', 'SugarContent'
+]
+
+# Everything the planner filters, balances and ranks on. Loaded first so the
+# UI can become interactive before the (much larger) text columns arrive.
+FILTER_COLUMNS = (['RecipeId', 'MealCat', 'AggregatedRating', 'ReviewCount', RANK_SCORE_COLUMN]
+                  + NUTRITION_COLUMNS + FLAG_COLUMNS)
+
+# Display-only columns, only needed once recipes are shown to the user
+DETAIL_COLUMNS = [
+    'RecipeId', 'Name', 'Description', 'RecipeCategory',
+    'CookTime', 'PrepTime', 'TotalTime', 'RecipeYield',
+    'RecipeInstructions', 'RecipeIngredientQuantities',
+    'Keywords', 'RecipeIngredientParts'
+]
+
+
+@dataclass
+class LoadProgress:
+    """Snapshot of a loading stage, handed to progress callbacks after every chunk."""
+
+    stage: str
+    bytes_read: int
+    total_bytes: int
+    rows_read: int
+    elapsed: float
+    done: bool = False
+
+    @property
+    def fraction(self) -> float:
+        """Share of the file consumed so far, in [0, 1]."""
+        if self.done or self.total_bytes <= 0:
+            return 1.0
+        return min(self.bytes_read / self.total_bytes, 1.0)
+
+
+ProgressCallback = Callable[[LoadProgress], None]
+
+
+class RecipeDataLoader:
+    """Load and manage recipe datasets."""
+
+    def __init__(self, data_dir: Optional[Path] = None, chunk_rows: Optional[int] = None,
+                 cache: Optional[LoadCache] = None, use_cache: Optional[bool] = None):
+        self.data_dir = Path(data_dir) if data_dir is not None else settings.DATA_DIR
+        self.chunk_rows = chunk_rows or settings.LOAD_CHUNK_ROWS
+        use_cache = settings.LOAD_CACHE_ENABLED if use_cache is None else use_cache
+        if cache is None and use_cache:
+            cache = LoadCache(settings.LOAD_CACHE_DIR if data_dir is None else self.data_dir / '.load_cache')
+        self.cache = cache if use_cache else None
+        # Validation report of every column group loaded so far, by stage name
+        self.validation: Dict[str, ValidationReport] = {}
+
+    @property
+    def dataset_path(self) -> Path:
+        return self.data_dir / settings.MVP_DATASET_FILE
+
+    def load_filter_columns(self, progress: Optional[ProgressCallback] = None,
+                            meal_categories: Optional[Iterable[str]] = None,
+                            required_flags: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Load the columns needed for filtering and planning.
+
+        ``meal_categories`` and ``required_flags`` restrict the table to that
+        scope (default: ``settings.SCOPE_*``); see ``_read_scope``.
+        """
+        available = set(self.dataset_columns())
+        columns = [col for col in FILTER_COLUMNS if col in available]
+        df = self._read_scope(columns, 'filter columns', progress, self._filter_dtypes(), meal_categories,
+                              required_flags)
+        return self._filter_frame(df)
+
+    def load_detail_columns(self, progress: Optional[ProgressCallback] = None,
+                            meal_categories: Optional[Iterable[str]] = None,
+                            required_flags: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Load the display-only text columns (of the scope), indexed by RecipeId."""
+        df = self._read_scope(DETAIL_COLUMNS, 'recipe details', progress, None, meal_categories, required_flags)
+        return self._detail_frame(df)
+
+    @staticmethod
+    def _filter_dtypes() -> Dict[str, str]:
+        dtypes = {flag: 'int8' for flag in FLAG_COLUMNS}
+        dtypes.update({col: 'float32' for col in NUTRITION_COLUMNS + ['AggregatedRating', 'ReviewCount', RANK_SCORE_COLUMN]})
+        return dtypes
+
+    @staticmethod
+    def _filter_frame(df: pd.DataFrame) -> pd.DataFrame:
+        df = df.copy(deep=False)
+        df['MealCat'] = df['MealCat'].astype('category')
+        if RANK_SCORE_COLUMN not in df.columns:
+            # Dataset exported before ranking existed: score and presort it here
+            logger.warning("Dataset has no ranking score, computing it at load time")
+            add_rank_score(df)
+            df = sort_by_rank(df)
+            df['MealCat'] = df['MealCat'].astype('category')
+        return df
+
+    @staticmethod
+    def _detail_frame(df: pd.DataFrame) -> pd.DataFrame:
+        # Lookups by RecipeId must return one row, so repeated ids keep their first row
+        duplicated = df['RecipeId'].duplicated()
+        if duplicated.any():
+            logger.warning(f"Dropping {int(duplicated.sum()):,} recipe details with a repeated RecipeId")
+            df = df[~duplicated.to_numpy()]
+        return df.set_index('RecipeId')
+
+    def load_mvp_dataset(self, progress: Optional[ProgressCallback] = None,
+                         meal_categories: Optional[Iterable[str]] = None,
+                         required_flags: Optional[Iterable[str]] = None) -> pd.DataFrame:
+        """Load the MVP dataset (filter and detail columns, of the scope) in one pass."""
+        return self._read_scope(None, 'full dataset', progress, None, meal_categories, required_flags)
+
+    def load_keyword_index(self) -> Optional[KeywordIndex]:
+        """Load the keyword vocabulary and CSR matrix, or ``None`` if they were not exported."""
+        start = time.perf_counter()
+        index = KeywordIndex.load(self.data_dir)
+        if index is not None:
+            metrics.observe('load', time.perf_counter() - start, group='keyword index')
+        return index
+
+    def load_ingredient_index(self) -> Optional[KeywordIndex]:
+        """Load the ingredient vocabulary and CSR matrix, or ``None`` if they were not exported."""
+        start = time.perf_counter()
+        index = KeywordIndex.load(self.data_dir, INGREDIENT_VOCAB_FILE, INGREDIENT_MATRIX_FILE)
+        if index is not None:
+            metrics.observe('load', time.perf_counter() - start, group='ingredient index')
+        return index
+
+    def load_quantity_table(self) -> Optional[IngredientQuantityTable]:
+        """Load the parsed (recipe, ingredient, amount, unit) table used for shopping lists."""
+        start = time.perf_counter()
+        table = IngredientQuantityTable.load(self.data_dir)
+        if table is not None:
+            metrics.observe('load', time.perf_counter() - start, group='ingredient quantities')
+        return table
+
+    def load_cube(self, df: Optional[pd.DataFrame] = None) -> Optional[AggregateCube]:
+        """Load the exported aggregate cube; without one, build it from ``df`` when given.
+
+        A cube exported for a different table than ``df`` (e.g. the whole
+        catalogue while this process is scoped) is rebuilt from ``df`` as well.
+        """
+        cube = AggregateCube.load(self.data_dir)
+        if df is not None and (cube is None or int(cube.counts.sum()) != len(df)):
+            cube = AggregateCube.from_frame(df, FLAG_COLUMNS, NUTRITION_COLUMNS)
+        return cube
+
+    def dataset_version(self) -> str:
+        """Identifier that changes whenever the dataset file is re-exported (size and mtime)."""
+        stat = self.dataset_path.stat()
+        return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+    def dataset_columns(self) -> List[str]:
+        """Column names of the dataset file, read from its header only."""
+        return list(pd.read_csv(self.dataset_path, nrows=0).columns)
+
+    def load_metadata(self) -> Dict:
+        """Load feature metadata."""
+        metadata_path = self.data_dir / settings.METADATA_FILE
+
+        if not metadata_path.exists():
+            logger.warning("Metadata file not found, returning defaults")
+            return {'features': FLAG_COLUMNS, 'nutritional_columns': NUTRITION_COLUMNS}
+
+        with open(metadata_path) as f:
+            return json.load(f)
+
+    def _read_scope(self, columns: Optional[List[str]], stage: str, progress: Optional[ProgressCallback],
+                    dtypes: Optional[Dict[str, str]], meal_categories: Optional[Iterable[str]],
+                    required_flags: Optional[Iterable[str]]) -> pd.DataFrame:
+        """Read and validate a column group of the scope, from the load cache while the dataset is unchanged.
+
+        The validation report is kept in ``self.validation[stage]`` and its
+        problems are logged as warnings.
+        """
+        if meal_categories is None and settings.SCOPE_MEAL_CATEGORIES:
+            meal_categories = settings.SCOPE_MEAL_CATEGORIES
+        meal_categories = list(meal_categories) if meal_categories is not None else None
+        required_flags = list(required_flags if required_flags is not None else settings.SCOPE_FLAGS)
+        unknown = set(required_flags) - set(FLAG_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown scope flags: {', '.join(sorted(unknown))}")
+
+        key = {'columns': columns, 'dtypes': dtypes, 'meal_categories': meal_categories,
+               'required_flags': required_flags}
+        start = time.perf_counter()
+        cached = self.cache.load(self.dataset_path, key) if self.cache is not None else None
+        if cached is not None:
+            df, report = cached
+            elapsed = time.perf_counter() - start
+            metrics.observe('load', elapsed, group=stage)
+            logger.info(f"Loaded {stage}: {len(df):,} rows from the load cache in {elapsed:.2f}s")
+            if progress is not None:
+                total_bytes = self.dataset_path.stat().st_size
+                progress(LoadProgress(stage, total_bytes, total_bytes, len(df), elapsed, done=True))
+        else:
+            df = self._parse_scope(columns, stage, progress, dtypes, meal_categories, required_flags)
+            scoped = meal_categories is not None or bool(required_flags)
+            report = validate_table(df, FLAG_COLUMNS, self.load_metadata(), full_table=not scoped)
+            if self.cache is not None:
+                self.cache.store(self.dataset_path, key, df, report)
+        report.log(f"{self.dataset_path.name} ({stage})")
+        self.validation[stage] = report
+        return df
+
+    def _parse_scope(self, columns: Optional[List[str]], stage: str, progress: Optional[ProgressCallback],
+                     dtypes: Optional[Dict[str, str]], meal_categories: Optional[List[str]],
+                     required_flags: List[str]) -> pd.DataFrame:
+        """Parse the rows of ``meal_categories`` having every flag in ``required_flags``.
+
+        With no scope (the default settings) this is a plain read of the whole
+        file. Otherwise only the partitions listed in the manifest that can hold
+        matching rows are read, then filtered to the exact scope and put back in
+        ``sort_by_rank`` order; unpartitioned datasets are read whole and filtered.
+        """
+        if meal_categories is None and not required_flags:
+            return self._read_columns(columns, stage, progress, dtypes)
+
+        manifest = PartitionManifest.load(self.data_dir)
+        paths = None
+        if manifest is None:
+            logger.warning("Dataset is not partitioned, reading the whole file to select the scope")
+            read_columns = columns
+        else:
+            partitions = manifest.select(meal_categories, required_flags)
+            metrics.increment('partitions_read', len(partitions))
+            metrics.increment('partitions_pruned', len(manifest.partitions) - len(partitions))
+            logger.info(f"Reading {len(partitions)} of {len(manifest.partitions)} partitions for {stage}")
+            paths = [manifest.path(partition) for partition in partitions]
+            read_columns = columns or manifest.columns
+        if read_columns is not None:
+            available = set(manifest.columns if manifest is not None else self.dataset_columns())
+            read_columns = [col for col in dict.fromkeys(read_columns + ['MealCat', RANK_SCORE_COLUMN] + required_flags)
+                            if col in available]
+        df = self._read_columns(read_columns, stage, progress, dtypes, paths)
+
+        mask = np.ones(len(df), dtype=bool)
+        if meal_categories is not None:
+            mask &= df['MealCat'].isin(meal_categories).to_numpy()
+        for flag in required_flags:
+            mask &= df[flag].to_numpy() == 1
+        df = df[mask]
+        if paths is not None and RANK_SCORE_COLUMN in df.columns:
+            df = sort_by_rank(df)
+        if columns is not None:
+            # File order, like an unscoped read with ``usecols``
+            df = df[[col for col in df.columns if col in columns]]
+        return df.reset_index(drop=True)
+
+    def _read_columns(self, columns: Optional[List[str]], stage: str,
+                      progress: Optional[ProgressCallback] = None,
+                      dtypes: Optional[Dict[str, str]] = None,
+                      paths: Optional[List[Path]] = None) -> pd.DataFrame:
+        """Read a column group in chunks, reporting bytes/rows read after each chunk.
+
+        Reads the dataset file, or the given partition files one after another.
+        """
+        paths = [self.dataset_path] if paths is None else paths
+        total_bytes = sum(path.stat().st_size for path in paths)
+        start = time.perf_counter()
+        chunks = []
+        rows_read = 0
+        bytes_done = 0
+
+        with profiler.stage(f'load {stage}'):
+            for path in paths:
+                with open(path, 'rb') as handle:
+                    reader = pd.read_csv(handle, usecols=columns, dtype=dtypes, chunksize=self.chunk_rows)
+                    for chunk in reader:
+                        chunks.append(chunk)
+                        rows_read += len(chunk)
+                        if progress is not None:
+                            progress(LoadProgress(stage, bytes_done + handle.tell(), total_bytes, rows_read,
+                                                  time.perf_counter() - start))
+                bytes_done += path.stat().st_size
+            if chunks:
+                df = pd.concat(chunks, ignore_index=True)
+            else:
+                df = pd.DataFrame(columns=columns)
+                df = df.astype({col: dtype for col, dtype in (dtypes or {}).items() if col in df.columns})
+
+        elapsed = time.perf_counter() - start
+        metrics.observe('load', elapsed, group=stage)
+        source = paths[0] if len(paths) == 1 else f"{len(paths)} partitions"
+        logger.info(f"Loaded {stage}: {rows_read:,} rows from {source} in {elapsed:.2f}s")
+        if progress is not None:
+            progress(LoadProgress(stage, total_bytes, total_bytes, rows_read, elapsed, done=True))
+        return df
@@ -0,0 +1,142 @@
+"""Partitioned dataset layout (MealCat x diet class) with a manifest for pruning.
+
+The export writes one CSV per (``MealCat``, diet class) under
+``data/partitions/`` plus ``manifest.json`` describing every file: its
+category, diet class, row count, size and how many of its recipes carry each
+flag. A loader asked for, say, vegan breakfasts reads only the partitions whose
+category matches and whose ``Vegan`` count is non-zero, i.e. one file.
+
+Diet classes nest (every vegan recipe is vegetarian, every vegetarian recipe
+pescatarian), so each recipe gets the most restrictive class it satisfies;
+flag counts then prune any diet flag exactly, and any other flag whenever a
+partition happens to have none of it.
+"""
+
+import json
+import logging
+import re
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PARTITION_DIR = 'partitions'
+MANIFEST_FILE = 'manifest.json'
+
+# Most restrictive first: a recipe belongs to the first class whose flag it has
+DIET_CLASSES = ['vegan', 'vegetarian', 'pescatarian', 'omnivore']
+_DIET_FLAGS = ['Vegan', 'Vegetarian', 'Pescatarian']
+
+
+def diet_classes(df: pd.DataFrame) -> np.ndarray:
+    """Diet class label of every row."""
+    conditions = [df[flag].to_numpy() == 1 if flag in df.columns else np.zeros(len(df), dtype=bool)
+                  for flag in _DIET_FLAGS]
+    return np.select(conditions, DIET_CLASSES[:-1], default=DIET_CLASSES[-1])
+
+
+def _slug(value: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', str(value).lower()).strip('-')
+
+
+@dataclass
+class Partition:
+    """One partition file and the statistics used to prune it."""
+
+    file: str
+    meal_category: str
+    diet: str
+    rows: int
+    bytes: int
+    flag_counts: Dict[str, int] = field(default_factory=dict)
+
+    def may_contain(self, meal_categories: Optional[Iterable[str]] = None,
+                    required_flags: Iterable[str] = ()) -> bool:
+        """False when no row of this partition can satisfy the scope."""
+        if meal_categories is not None and self.meal_category not in meal_categories:
+            return False
+        return all(self.flag_counts.get(flag, 1) > 0 for flag in required_flags)
+
+
+class PartitionManifest:
+    """The partitions of an exported dataset."""
+
+    def __init__(self, data_dir: Path, partitions: List[Partition], columns: List[str]):
+        self.data_dir = Path(data_dir)
+        self.partitions = partitions
+        self.columns = columns
+
+    @property
+    def total_rows(self) -> int:
+        return sum(partition.rows for partition in self.partitions)
+
+    def path(self, partition: Partition) -> Path:
+        return self.data_dir / PARTITION_DIR / partition.file
+
+    def select(self, meal_categories: Optional[Iterable[str]] = None,
+               required_flags: Iterable[str] = ()) -> List[Partition]:
+        """Partitions that may hold rows of the given categories having all ``required_flags``."""
+        meal_categories = set(meal_categories) if meal_categories is not None else None
+        required_flags = list(required_flags)
+        return [partition for partition in self.partitions
+                if partition.may_contain(meal_categories, required_flags)]
+
+    def save(self) -> Path:
+        path = self.data_dir / PARTITION_DIR / MANIFEST_FILE
+        payload = {
+            'partition_by': ['MealCat', 'diet'],
+            'diet_classes': DIET_CLASSES,
+            'columns': self.columns,
+            'total_rows': self.total_rows,
+            'created_date': datetime.now().isoformat(),
+            'partitions': [asdict(partition) for partition in self.partitions],
+        }
+        with open(path, 'w') as f:
+            json.dump(payload, f, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, data_dir: Path) -> Optional['PartitionManifest']:
+        """Load the manifest, or ``None`` when the dataset was exported unpartitioned."""
+        path = Path(data_dir) / PARTITION_DIR / MANIFEST_FILE
+        if not path.exists():
+            return None
+        with open(path) as f:
+            payload = json.load(f)
+        return cls(data_dir, [Partition(**entry) for entry in payload['partitions']], payload['columns'])
+
+
+def write_partitions(df: pd.DataFrame, data_dir: Path, flags: Iterable[str]) -> PartitionManifest:
+    """Write ``df`` as one CSV per (MealCat, diet class) and save the manifest.
+
+    Rows keep their order within each partition, so a table presorted by
+    ``sort_by_rank`` stays sorted inside every file.
+    """
+    directory = Path(data_dir) / PARTITION_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob('*.csv'):
+        stale.unlink()
+
+    flags = [flag for flag in flags if flag in df.columns]
+    diets = pd.Categorical(diet_classes(df), categories=DIET_CLASSES)
+    partitions = []
+    for (meal_category, diet), positions in df.groupby([df['MealCat'].astype(str), diets],
+                                                       sort=True, observed=True).indices.items():
+        part = df.take(positions)
+        file = f'{_slug(meal_category)}__{diet}.csv'
+        part.to_csv(directory / file, index=False)
+        partitions.append(Partition(
+            file=file, meal_category=meal_category, diet=diet, rows=len(part),
+            bytes=(directory / file).stat().st_size,
+            flag_counts={flag: int(part[flag].sum()) for flag in flags},
+        ))
+
+    manifest = PartitionManifest(data_dir, partitions, list(df.columns))
+    manifest.save()
+    logger.info(f"Wrote {len(partitions)} partitions ({len(df):,} rows) to {directory}")
+    return manifest
@@ -0,0 +1,316 @@
+"""Persistent user profiles, preference sets and plan history (SQLite, WAL mode).
+
+Reads go through a small pool of shared connections; WAL lets them run while
+the writer commits. Writes are queued and committed by one background thread
+in batches (one transaction per flush), so recording a plan never blocks a
+Streamlit rerun on disk I/O. A failed batch is retried; rows still failing
+are counted in ``write_errors`` and make ``flush`` return ``False``. Reads
+see committed rows only: callers that need their own just-queued writes keep
+them at hand rather than waiting for the writer.
+
+Each user's online preference model is kept as one serialized row (replaced
+on every update) next to an append-only log of the accept/swap events that
+trained it. ``plan_recipes`` carries a covering index on
+``(user_id, served_at, recipe_id)`` for "recipes served to this user in the
+last N days", which the planner turns into an exclusion set.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..config.settings import settings
+from ..utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    profile TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS preference_sets (
+    preference_set_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    preferences TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS plans (
+    plan_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    preference_set_id TEXT,
+    total_calories REAL,
+    total_protein REAL
+);
+CREATE TABLE IF NOT EXISTS plan_recipes (
+    plan_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    served_at REAL NOT NULL,
+    meal TEXT NOT NULL,
+    recipe_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS preference_models (
+    user_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    model BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS feedback_events (
+    user_id TEXT NOT NULL,
+    at REAL NOT NULL,
+    event TEXT NOT NULL,
+    recipe_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_plans_user_time ON plans (user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_plan_recipes_user_time ON plan_recipes (user_id, served_at, recipe_id);
+CREATE INDEX IF NOT EXISTS idx_preference_sets_user ON preference_sets (user_id, created_at);
+"""
+
+_UPSERT_PROFILE = """
+INSERT INTO users (user_id, created_at, updated_at, profile) VALUES (?, ?, ?, ?)
+ON CONFLICT (user_id) DO UPDATE SET updated_at = excluded.updated_at, profile = excluded.profile
+"""
+_INSERT_PREFERENCES = "INSERT INTO preference_sets VALUES (?, ?, ?, ?)"
+_INSERT_PLAN = "INSERT INTO plans VALUES (?, ?, ?, ?, ?, ?)"
+_INSERT_PLAN_RECIPE = "INSERT INTO plan_recipes VALUES (?, ?, ?, ?, ?)"
+_UPSERT_MODEL = """
+INSERT INTO preference_models (user_id, updated_at, model) VALUES (?, ?, ?)
+ON CONFLICT (user_id) DO UPDATE SET updated_at = excluded.updated_at, model = excluded.model
+"""
+_INSERT_FEEDBACK = "INSERT INTO feedback_events VALUES (?, ?, ?, ?)"
+
+_DAY = 86400.0
+# A failed batch is retried this many times (with doubling back-off) before its rows are dropped
+_COMMIT_RETRIES = 3
+_RETRY_BACKOFF = 0.1
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared across threads."""
+
+    def __init__(self, path: Path, size: int = 4):
+        self.path = path
+        self._idle: queue.LifoQueue = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._idle.put(self._open())
+
+    def _open(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        return connection
+
+    @contextmanager
+    def connection(self):
+        connection = self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def close(self) -> None:
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+class PlanStore:
+    """User profiles, preference sets and served plans, with asynchronous batched writes."""
+
+    def __init__(self, path: Optional[Path] = None, pool_size: int = 4,
+                 batch_size: Optional[int] = None, flush_interval: Optional[float] = None):
+        self.path = Path(path) if path is not None else settings.STORE_PATH
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size or settings.STORE_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.STORE_FLUSH_INTERVAL
+
+        self._writer_connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._writer_connection.execute('PRAGMA journal_mode=WAL')
+        self._writer_connection.execute('PRAGMA synchronous=NORMAL')
+        self._writer_connection.executescript(SCHEMA)
+        self.pool = ConnectionPool(self.path, pool_size)
+
+        self._pending: queue.Queue = queue.Queue()
+        self._closed = False
+        # Rows dropped after every retry of their batch failed, and the last error
+        self.write_errors = 0
+        self.last_error: Optional[Exception] = None
+        self._writer = threading.Thread(target=self._write_loop, name='plan-store-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # -- writes (queued) --------------------------------------------------------
+
+    def save_profile(self, user_id: str, profile: Dict) -> None:
+        now = time.time()
+        self._enqueue(_UPSERT_PROFILE, (user_id, now, now, json.dumps(profile)))
+
+    def save_preferences(self, user_id: str, preferences: Dict) -> str:
+        preference_set_id = uuid.uuid4().hex
+        self._enqueue(_INSERT_PREFERENCES,
+                      (preference_set_id, user_id, time.time(), json.dumps(preferences, sort_keys=True)))
+        return preference_set_id
+
+    def record_plan(self, user_id: str, meal_plan: Dict, total_calories: float = None,
+                    total_protein: float = None, preference_set_id: Optional[str] = None,
+                    served_at: Optional[float] = None) -> str:
+        """Queue a served plan (``{meal: recipe}``, recipes carrying ``RecipeId``) and return its ID."""
+        plan_id = uuid.uuid4().hex
+        served_at = served_at if served_at is not None else time.time()
+        self._enqueue(_INSERT_PLAN, (plan_id, user_id, served_at, preference_set_id, total_calories, total_protein))
+        for meal, recipe in meal_plan.items():
+            self._enqueue(_INSERT_PLAN_RECIPE, (plan_id, user_id, served_at, meal, int(recipe['RecipeId'])))
+        return plan_id
+
+    def save_preference_model(self, user_id: str, model: bytes) -> None:
+        """Queue the latest state of a user's preference model (see ``models.learning``)."""
+        self._enqueue(_UPSERT_MODEL, (user_id, time.time(), sqlite3.Binary(model)))
+
+    def record_feedback(self, user_id: str, event: str, recipe_ids) -> None:
+        """Queue accept/swap events; they are kept for auditing, models never replay them."""
+        now = time.time()
+        for recipe_id in np.atleast_1d(recipe_ids):
+            self._enqueue(_INSERT_FEEDBACK, (user_id, now, event, int(recipe_id)))
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """Block until everything queued so far is written.
+
+        Returns ``False`` on timeout, or when a batch holding some of those rows
+        could not be committed even after retrying (see ``write_errors``).
+        """
+        if self._closed:
+            return True
+        errors_before = self.write_errors
+        done = threading.Event()
+        self._pending.put(done)
+        return done.wait(timeout) and self.write_errors == errors_before
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._pending.put(None)
+        self._writer.join(timeout=10)
+        self._writer_connection.close()
+        self.pool.close()
+
+    def _enqueue(self, statement: str, params: Tuple) -> None:
+        if self._closed:
+            raise RuntimeError("PlanStore is closed")
+        self._pending.put((statement, params))
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            batch, waiters = [], []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break  # flush requested: commit what we have now
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._pending.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._pending.put(None)
+                    break
+            self._commit(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _commit(self, batch: List[Tuple[str, Tuple]]) -> None:
+        if not batch:
+            return
+        grouped: Dict[str, List[Tuple]] = {}
+        for statement, params in batch:
+            grouped.setdefault(statement, []).append(params)
+        for attempt in range(_COMMIT_RETRIES + 1):
+            try:
+                with metrics.span('store_flush'):
+                    with self._writer_connection:
+                        # Parents before children so readers never see orphaned plan rows
+                        for statement in (_UPSERT_PROFILE, _INSERT_PREFERENCES, _INSERT_PLAN, _INSERT_PLAN_RECIPE,
+                                          _UPSERT_MODEL, _INSERT_FEEDBACK):
+                            if statement in grouped:
+                                self._writer_connection.executemany(statement, grouped[statement])
+                metrics.increment('store_writes', len(batch))
+                return
+            except sqlite3.Error as e:
+                # The transaction rolled back as a whole, so retrying cannot duplicate rows
+                self.last_error = e
+                if attempt < _COMMIT_RETRIES:
+                    logger.warning(f"Writing {len(batch)} queued rows to {self.path} failed ({e}), retrying")
+                    metrics.increment('store_retries')
+                    time.sleep(_RETRY_BACKOFF * 2 ** attempt)
+        logger.error(f"Dropped {len(batch)} queued rows after {_COMMIT_RETRIES} retries: {self.last_error}")
+        self.write_errors += len(batch)
+        metrics.increment('store_write_errors', len(batch))
+
+    # -- reads --------------------------------------------------------------------
+
+    def get_profile(self, user_id: str) -> Optional[Dict]:
+        with self.pool.connection() as connection:
+            row = connection.execute('SELECT profile FROM users WHERE user_id = ?', (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_preference_model(self, user_id: str) -> Optional[bytes]:
+        with self.pool.connection() as connection:
+            row = connection.execute('SELECT model FROM preference_models WHERE user_id = ?', (user_id,)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def common_preferences(self, limit: int = 8) -> List[Dict]:
+        """The ``limit`` preference sets saved most often, across all users."""
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                'SELECT preferences FROM preference_sets GROUP BY preferences ORDER BY COUNT(*) DESC LIMIT ?',
+                (limit,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def recent_recipe_ids(self, user_id: str, days: float, flush: bool = False) -> np.ndarray:
+        """Sorted unique RecipeIds served to ``user_id`` in the last ``days`` days (index-only scan).
+
+        Plans still queued are only included with ``flush``, which waits for every session's writes.
+        """
+        if flush:
+            self.flush()
+        since = time.time() - days * _DAY
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                'SELECT DISTINCT recipe_id FROM plan_recipes WHERE user_id = ? AND served_at >= ?',
+                (user_id, since)
+            ).fetchall()
+        return np.unique(np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)))
+
+    def plan_history(self, user_id: str, limit: int = 20) -> pd.DataFrame:
+        """Most recent plans of a user, one row per served recipe."""
+        with self.pool.connection() as connection:
+            return pd.read_sql_query(
+                '''
+                SELECT p.plan_id, p.created_at, p.total_calories, p.total_protein, r.meal, r.recipe_id
+                FROM (SELECT * FROM plans WHERE user_id = ? ORDER BY created_at DESC LIMIT ?) AS p
+                JOIN plan_recipes AS r ON r.plan_id = p.plan_id
+                ORDER BY p.created_at DESC
+                ''',
+                connection, params=(user_id, limit)
+            )
+
@@ -0,0 +1,85 @@
+"""Read-only recipe table shared by every session of a process.
+
+``st.cache_data`` pickles the cached frame and hands each caller a fresh
+unpickled copy, so every rerun of every session paid a full copy of the table
+and concurrent sessions multiplied its memory. A ``RecipeTable`` is built once
+per process (``st.cache_resource``) instead, and callers only ever get
+``frame()``: a shallow copy-on-write view that shares every column buffer with
+the table and costs O(columns), not O(rows).
+
+Two guards keep one session from changing what the others see:
+
+* every numpy buffer behind the table (values and categorical codes) is
+  flagged read-only, so in-place writes through the shared buffers raise
+  ``ValueError: assignment destination is read-only``; text columns are
+  Arrow-backed and immutable already;
+* the shared ``DataFrame`` object itself never leaves the table, so adding,
+  replacing or dropping columns, or sorting in place, only changes the
+  caller's view (pandas copy-on-write copies a column before the first write).
+
+Copy-on-write is always on from pandas 3.0. On pandas 2.x it is opt-in, and
+without it a write through a view (``view.loc[mask, 'a'] = 0``) lands on the
+frozen shared buffer and raises. It is a process-wide option, so entry points
+(the app, the batch planner) call ``enable_copy_on_write()`` once at startup,
+and building a table without it raises instead of switching it on behind the
+caller's back.
+"""
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+_COPY_ON_WRITE_OPTIONAL = int(pd.__version__.split('.')[0]) < 3
+
+
+def enable_copy_on_write() -> None:
+    """Turn on pandas copy-on-write for the process where it is still optional (pandas < 3.0)."""
+    if _COPY_ON_WRITE_OPTIONAL:
+        pd.set_option('mode.copy_on_write', True)
+
+
+def copy_on_write_enabled() -> bool:
+    return not _COPY_ON_WRITE_OPTIONAL or pd.get_option('mode.copy_on_write') is True
+
+
+def _freeze_buffer(values: np.ndarray) -> None:
+    """Flag the array owning ``values``' memory (and so every view of it) read-only."""
+    while isinstance(values.base, np.ndarray):
+        values = values.base
+    values.flags.writeable = False
+
+
+def freeze_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Make every numpy buffer of ``df`` read-only, in place and without copying; returns ``df``."""
+    for name in df.columns:
+        series = df[name]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            _freeze_buffer(series.cat.codes.to_numpy())
+        elif isinstance(series.dtype, np.dtype):
+            _freeze_buffer(series.to_numpy())
+        elif isinstance(series.dtype, pd.StringDtype) and series.dtype.storage == 'python':
+            _freeze_buffer(np.asarray(series.array))
+    return df
+
+
+class RecipeTable:
+    """Immutable recipe table; ``frame()`` hands out cheap views of it."""
+
+    def __init__(self, df: pd.DataFrame):
+        # Takes ownership: the caller must not keep writing to ``df``
+        if not copy_on_write_enabled():
+            raise RuntimeError("RecipeTable needs pandas copy-on-write; call enable_copy_on_write() at startup")
+        self._frame = freeze_frame(df)
+
+    def __len__(self) -> int:
+        return len(self._frame)
+
+    @property
+    def columns(self) -> List[str]:
+        return self._frame.columns.tolist()
+
+    def frame(self) -> pd.DataFrame:
+        """A view sharing the table's buffers; changes to it stay local to the caller."""
+        return self._frame.copy(deep=False)
@@ -0,0 +1,101 @@
+"""Sanity checks run on a freshly parsed recipe table.
+
+The checks are cheap column scans: missing values per column, nutrients below
+zero or ratings outside 0-5, flag columns holding anything but 0/1, and flag
+totals that disagree with the ``feature_counts`` written to
+``mvp_metadata.json`` at export time (only comparable when the whole catalogue
+was loaded). The result is a plain dataclass so it can be stored next to the
+parsed columns by ``data.load_cache`` and reused while the dataset is unchanged.
+"""
+
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Inclusive valid range per column; columns not listed are only checked for NaNs
+VALUE_RANGES = {
+    'AggregatedRating': (0.0, 5.0),
+    'ReviewCount': (0.0, np.inf),
+    'Calories': (0.0, np.inf),
+    'ProteinContent': (0.0, np.inf),
+    'FatContent': (0.0, np.inf),
+    'SaturatedFatContent': (0.0, np.inf),
+    'CarbohydrateContent': (0.0, np.inf),
+    'SodiumContent': (0.0, np.inf),
+    'FiberContent': (0.0, np.inf),
+    'SugarContent': (0.0, np.inf),
+}
+
+
+@dataclass
+class ValidationReport:
+    """Findings of ``validate_table``; empty dicts mean the check passed."""
+
+    rows: int
+    nan_counts: Dict[str, int] = field(default_factory=dict)
+    out_of_range: Dict[str, int] = field(default_factory=dict)
+    bad_flags: Dict[str, int] = field(default_factory=dict)
+    flag_count_mismatches: Dict[str, List[int]] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not (self.out_of_range or self.bad_flags or self.flag_count_mismatches)
+
+    def problems(self) -> List[str]:
+        lines = [f"{column}: {count:,} values out of range" for column, count in self.out_of_range.items()]
+        lines += [f"{flag}: {count:,} values other than 0/1" for flag, count in self.bad_flags.items()]
+        lines += [f"{flag}: {found:,} set, metadata says {expected:,}"
+                  for flag, (found, expected) in self.flag_count_mismatches.items()]
+        return lines
+
+    def log(self, source: str) -> None:
+        for problem in self.problems():
+            logger.warning(f"{source}: {problem}")
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, payload: Dict) -> 'ValidationReport':
+        return cls(**payload)
+
+
+def _expected_flag_counts(metadata: Optional[Dict]) -> Dict[str, int]:
+    counts = (metadata or {}).get('feature_counts') or {}
+    return {flag: int(count) for flag, count in counts.items()}
+
+
+def validate_table(df: pd.DataFrame, flags: List[str], metadata: Optional[Dict] = None,
+                   full_table: bool = True) -> ValidationReport:
+    """Check ``df``; flag totals are compared with ``metadata`` only when ``full_table``."""
+    report = ValidationReport(rows=len(df))
+    for column in df.columns:
+        missing = int(df[column].isna().sum())
+        if missing:
+            report.nan_counts[column] = missing
+
+    for column, (low, high) in VALUE_RANGES.items():
+        if column not in df.columns:
+            continue
+        values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        outside = int(np.count_nonzero((values < low) | (values > high)))
+        if outside:
+            report.out_of_range[column] = outside
+
+    expected = _expected_flag_counts(metadata) if full_table else {}
+    for flag in flags:
+        if flag not in df.columns:
+            continue
+        values = df[flag].to_numpy()
+        bad = int(np.count_nonzero((values != 0) & (values != 1)))
+        if bad:
+            report.bad_flags[flag] = bad
+        found = int(np.count_nonzero(values == 1))
+        if flag in expected and found != expected[flag]:
+            report.flag_count_mismatches[flag] = [found, expected[flag]]
+    return report
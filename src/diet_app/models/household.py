@@ -0,0 +1,186 @@
+"""Household planning: one set of shared meals, a portion size per member.
+
+Every member's restrictions are merged into one filter expression, so the
+table is queried once for the whole household. Each meal slot then scores a
+best-ranked candidate pool against all members at once: for every (member,
+recipe) pair the portion multiplier that best meets that member's share of
+their daily calories and protein has a closed form (a weighted least-squares
+fit), computed for the whole (members x candidates) grid with array arithmetic.
+The slot takes a recipe whose portions fit the household best.
+
+Nutrition values are per serving, so a multiplier of 1.5 means one and a half
+servings. ``RecipeYield`` (the servings a recipe makes) turns the household's
+total servings into how many batches to cook, which also scales shopping lists.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..config.settings import settings
+from ..utils.metrics import metrics
+from .portions import MAX_PORTION, MIN_PORTION, portion_error, solve_portions
+from .query import QueryEngine
+from .ranking import RANK_SCORE_COLUMN, best_first, best_first_across, category_rank_orders
+from .recommender import (MEAL_CATEGORY_MAP, PLAN_NUTRIENTS, PREFERENCE_FLAGS, PREFERENCE_LEVELS, nutrient_matrix,
+                          number_of_meals, optimal_weights_per_meal, preferences_expression)
+
+# Servings assumed when RecipeYield is missing or has no number in it
+DEFAULT_SERVINGS = 4
+
+_YIELD_NUMBER = r'(\d+(?:\.\d+)?)'
+_CALORIES = PLAN_NUTRIENTS.index('Calories')
+_PROTEIN = PLAN_NUTRIENTS.index('ProteinContent')
+
+
+@dataclass
+class HouseholdMember:
+    """One person's daily goals and preference answers (same keys as ``collect_preferences``)."""
+
+    name: str
+    target_calories: float = 2500
+    target_protein: float = 120
+    preferences: Dict = field(default_factory=dict)
+
+
+@dataclass
+class HouseholdPlan:
+    """Shared meals plus each member's portions (servings) and resulting daily totals."""
+
+    members: List[str]
+    meal_plan: Dict[str, pd.Series]
+    portions: pd.DataFrame
+    totals: pd.DataFrame
+
+    @property
+    def servings(self) -> pd.Series:
+        """Total servings of every meal across the household."""
+        return self.portions.sum(axis=0)
+
+    def batch_multipliers(self) -> pd.Series:
+        """How many times to make each meal's recipe, from ``RecipeYield`` (when details are attached)."""
+        yields = recipe_servings(pd.Series([recipe.get('RecipeYield') for recipe in self.meal_plan.values()],
+                                           index=list(self.meal_plan), dtype=object))
+        return self.servings / yields
+
+    def shopping_list(self, quantity_table) -> pd.DataFrame:
+        """Household shopping list with every recipe's ingredients scaled by its batch multiplier."""
+        return quantity_table.shopping_list([recipe['RecipeId'] for recipe in self.meal_plan.values()],
+                                            self.batch_multipliers().to_numpy())
+
+
+def recipe_servings(recipe_yield: pd.Series, default: float = DEFAULT_SERVINGS) -> pd.Series:
+    """Servings made by each recipe: the first number in ``RecipeYield`` ("4 servings", "6-8", "1 (9 inch) pie")."""
+    servings = pd.to_numeric(recipe_yield.astype(str).str.extract(_YIELD_NUMBER, expand=False), errors='coerce')
+    return servings.where(servings > 0, default)
+
+
+def household_preferences(members: Iterable[HouseholdMember]) -> Dict:
+    """Merge everyone's answers into the restrictions a shared meal must meet.
+
+    Dietary flags, tags and expressions add up (a meal must suit everybody).
+    Calorie and protein levels only apply when all members agree, since portion
+    sizes already adapt to each member's goals; prep time likewise.
+    """
+    members = list(members)
+    merged = {key: 'y' for key in PREFERENCE_FLAGS
+              if any(member.preferences.get(key) == 'y' for member in members)}
+    for key in PREFERENCE_LEVELS:
+        levels = {member.preferences.get(key) for member in members}
+        if len(levels) == 1:
+            level = levels.pop()
+            if level is not None:
+                merged[key] = level
+    merged['keywords'] = sorted({keyword for member in members
+                                 for keyword in member.preferences.get('keywords') or []})
+    expressions = [member.preferences['expression'] for member in members if member.preferences.get('expression')]
+    merged['expression'] = ' AND '.join(f'({expression})' for expression in dict.fromkeys(expressions))
+    return merged
+
+
+@metrics.timed('generate_household_plan')
+def generate_household_plan(df, members: List[HouseholdMember], engine: Optional[QueryEngine] = None,
+                            keyword_index=None, max_meals=6, top_k=None, rng=None, min_portion=MIN_PORTION,
+                            max_portion=MAX_PORTION, portion_step=0.25, nutrient_means=None,
+                            exclude_recipe_ids=None) -> Optional[HouseholdPlan]:
+    """Plan one day of shared meals for ``members``; ``None`` when no recipe suits everyone.
+
+    For each slot, the ``top_k * PLAN_SCORE_POOL`` best-ranked recipes of the
+    slot's category are scored by the household's total portion error and one
+    of the ``top_k`` best fits is picked at random, so repeated plans vary.
+    """
+    if not members:
+        raise ValueError("A household plan needs at least one member")
+    engine = engine if engine is not None else QueryEngine(df, keyword_index=keyword_index)
+    df_filtered = engine.filter(preferences_expression(household_preferences(members)))
+    if df_filtered.empty:
+        return None
+
+    rng = rng if rng is not None else np.random.default_rng()
+    top_k = top_k or settings.PLAN_TOP_K
+    pool_size = top_k * settings.PLAN_SCORE_POOL
+
+    # (members x nutrients) daily targets; only calories and protein are planned for
+    daily_targets = np.zeros((len(members), len(PLAN_NUTRIENTS)), dtype=np.float32)
+    daily_targets[:, _CALORIES] = [member.target_calories for member in members]
+    daily_targets[:, _PROTEIN] = [member.target_protein for member in members]
+    meal_slots = number_of_meals(df_filtered, float(daily_targets[:, _CALORIES].mean()),
+                                 float(daily_targets[:, _PROTEIN].mean()), max_meals, nutrient_means)
+    weights = optimal_weights_per_meal(len(meal_slots))
+
+    nutrients = nutrient_matrix(df_filtered)
+    scores = df_filtered[RANK_SCORE_COLUMN].to_numpy()
+    rank_orders = category_rank_orders(df_filtered)
+    used = np.zeros(len(df_filtered), dtype=bool)
+    if exclude_recipe_ids is not None and len(exclude_recipe_ids):
+        used = np.isin(df_filtered['RecipeId'].to_numpy(), exclude_recipe_ids)
+        metrics.increment('excluded_recipes', int(used.sum()))
+    has_energy = nutrients[:, _CALORIES] > 0
+
+    def available(rows):
+        return ~used[rows] & has_energy[rows]
+
+    chosen_rows = []
+    slot_portions = []
+    for meal in meal_slots:
+        slot_targets = daily_targets * weights[meal]
+        with metrics.span('slot_search', slot=meal):
+            category = MEAL_CATEGORY_MAP.get(meal)
+            if category is not None:
+                candidates = best_first(rank_orders.get(category, np.empty(0, dtype=np.int64)), available, pool_size)
+                if len(candidates) == 0:
+                    # Fallback: try without meal category restriction
+                    metrics.increment('fallback', reason='any_category')
+            if category is None or len(candidates) == 0:
+                candidates = best_first_across(rank_orders, scores, available, pool_size)
+            if len(candidates) == 0:
+                # Every suitable recipe is already used today: allow repeats
+                metrics.increment('fallback', reason='any_recipe')
+                candidates = best_first_across(rank_orders, scores, lambda rows: has_energy[rows], pool_size)
+            if len(candidates) == 0:
+                return None
+
+        with metrics.span('selection', slot=meal):
+            pool = nutrients[candidates]
+            portions = solve_portions(pool, slot_targets, min_portion=min_portion, max_portion=max_portion,
+                                      step=portion_step)
+            household_error = portion_error(portions, pool, slot_targets).sum(axis=0)
+            closest = np.argsort(household_error, kind='stable')[:top_k]
+            choice = int(rng.choice(closest))
+        selected_row = candidates[choice]
+        used[selected_row] = True
+        chosen_rows.append(selected_row)
+        slot_portions.append(portions[:, choice])
+        metrics.increment('slots_planned')
+
+    names = [member.name for member in members]
+    portions = np.column_stack(slot_portions)
+    totals = portions @ np.nan_to_num(nutrients[chosen_rows])
+    return HouseholdPlan(
+        members=names,
+        meal_plan={meal: df_filtered.iloc[row] for meal, row in zip(meal_slots, chosen_rows)},
+        portions=pd.DataFrame(portions, index=names, columns=meal_slots),
+        totals=pd.DataFrame(totals, index=names, columns=PLAN_NUTRIENTS),
+    )
@@ -0,0 +1,201 @@
+"""Per-user preference model learned online from accept/swap feedback.
+
+Every recipe is encoded once per table as a sparse feature row: its dietary
+flags, one-hot nutrient bands (fixed edges, so the encoding is stable across
+processes and scopes), its meal category and its IDs among the most frequent
+keywords. A user's model is a logistic regression over those features, trained
+with ``SGDClassifier.partial_fit`` one event at a time: accepting a meal is a
+positive example, swapping it out a negative one. An update costs one SGD step
+over the event's non-zero features; the history is never replayed.
+
+The planner asks the model for ``score(recipe_ids)`` - one sparse
+matrix-vector product over the candidate pool - and samples candidates in
+proportion to ``exp(score)``, so an untrained model changes nothing and a
+trained one tilts each slot towards what the user keeps.
+
+Saved models are plain JSON (weights, intercept, step count and the feature
+signature), never pickles: a blob read back from the store cannot run code,
+and one that does not parse yields a fresh model instead of an error.
+"""
+
+import hashlib
+import json
+import logging
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.linear_model import SGDClassifier
+
+from ..config.settings import settings
+from ..data.loaders import FLAG_COLUMNS
+from ..utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Band edges per nutrient (per serving); each nutrient gets len(edges) + 1 one-hot bands
+NUTRIENT_BANDS = {
+    'Calories': [200, 400, 600],
+    'ProteinContent': [10, 20, 35],
+    'FatContent': [10, 20, 35],
+    'CarbohydrateContent': [20, 45, 70],
+    'SugarContent': [5, 15, 30],
+    'SodiumContent': [300, 700, 1200],
+}
+MEAL_CATEGORIES = ['Breakfast', 'Lunch/Dinner', 'Snacks']
+
+ACCEPT = 'accept'
+SWAP = 'swap'
+_LABELS = {ACCEPT: 1, SWAP: 0}
+_CLASSES = np.array([0, 1])
+
+
+class RecipeFeatures:
+    """Sparse (recipes x features) encoding of a recipe table, looked up by RecipeId."""
+
+    def __init__(self, recipe_ids: np.ndarray, matrix: sparse.csr_matrix, names: Sequence[str]):
+        self.recipe_ids = np.asarray(recipe_ids)
+        self.matrix = matrix.tocsr()
+        self.names = list(names)
+        self._order = np.argsort(self.recipe_ids, kind='stable')
+        self._sorted_ids = self.recipe_ids[self._order]
+
+    @property
+    def n_features(self) -> int:
+        return self.matrix.shape[1]
+
+    @property
+    def signature(self) -> str:
+        """Hash of the feature names; a saved model only fits features with the same signature."""
+        return hashlib.sha1('\n'.join(self.names).encode()).hexdigest()[:16]
+
+    def rows(self, recipe_ids) -> np.ndarray:
+        """Row positions of ``recipe_ids`` (-1 for recipes not in the table)."""
+        recipe_ids = np.asarray(recipe_ids)
+        if len(self._sorted_ids) == 0:
+            return np.full(len(recipe_ids), -1, dtype=np.int64)
+        positions = np.searchsorted(self._sorted_ids, recipe_ids)
+        positions = np.minimum(positions, len(self._sorted_ids) - 1)
+        found = self._sorted_ids[positions] == recipe_ids
+        return np.where(found, self._order[positions], -1)
+
+    def for_recipes(self, recipe_ids) -> sparse.csr_matrix:
+        """Feature rows of ``recipe_ids``; unknown recipes get an empty row."""
+        rows = self.rows(recipe_ids)
+        block = self.matrix[np.maximum(rows, 0)]
+        if (rows < 0).any():
+            block = sparse.diags((rows >= 0).astype(np.float32)) @ block
+        return block.tocsr()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, keyword_index=None,
+                   n_keywords: Optional[int] = None) -> 'RecipeFeatures':
+        """Encode ``df``; keyword features come from ``keyword_index`` when given."""
+        n_keywords = settings.PREFERENCE_KEYWORDS if n_keywords is None else n_keywords
+        blocks: List[sparse.spmatrix] = []
+        names: List[str] = []
+
+        flags = [flag for flag in FLAG_COLUMNS if flag in df.columns]
+        blocks.append(sparse.csr_matrix(df[flags].to_numpy(dtype=np.float32)))
+        names += flags
+
+        for column, edges in NUTRIENT_BANDS.items():
+            values = df[column].to_numpy(dtype=np.float32) if column in df.columns else np.full(len(df), np.nan)
+            bands = np.digitize(values, edges)
+            known = ~np.isnan(values)
+            blocks.append(_one_hot(bands[known], np.flatnonzero(known), len(df), len(edges) + 1))
+            names += [f'{column}[{band}]' for band in range(len(edges) + 1)]
+
+        categories = pd.Categorical(df['MealCat'], categories=MEAL_CATEGORIES).codes
+        known = categories >= 0
+        blocks.append(_one_hot(categories[known], np.flatnonzero(known), len(df), len(MEAL_CATEGORIES)))
+        names += [f'MealCat={category}' for category in MEAL_CATEGORIES]
+
+        if keyword_index is not None and n_keywords:
+            # The vocabulary is most-frequent-first, so the first IDs cover most tags
+            keywords = keyword_index.aligned_to(df['RecipeId'].to_numpy()).matrix
+            n_keywords = min(n_keywords, keywords.shape[1])
+            blocks.append(keywords[:, :n_keywords].astype(np.float32))
+            names += [f'keyword={keyword}' for keyword in keyword_index.vocabulary[:n_keywords]]
+
+        return cls(df['RecipeId'].to_numpy(), sparse.hstack(blocks, format='csr', dtype=np.float32), names)
+
+
+def _one_hot(codes: np.ndarray, rows: np.ndarray, n_rows: int, n_columns: int) -> sparse.csr_matrix:
+    data = np.ones(len(rows), dtype=np.float32)
+    return sparse.csr_matrix((data, (rows, codes)), shape=(n_rows, n_columns))
+
+
+class PreferenceModel:
+    """One user's online logistic model over ``RecipeFeatures``."""
+
+    def __init__(self, features: RecipeFeatures, classifier: Optional[SGDClassifier] = None,
+                 n_updates: int = 0):
+        self.features = features
+        self.classifier = classifier if classifier is not None else _new_classifier()
+        self.n_updates = n_updates
+
+    @property
+    def trained(self) -> bool:
+        return self.n_updates > 0
+
+    def update(self, recipe_ids, event: str) -> None:
+        """One SGD step on ``event`` (``'accept'`` or ``'swap'``) for each of ``recipe_ids``."""
+        if event not in _LABELS:
+            raise ValueError(f"Unknown feedback event '{event}'; expected one of {sorted(_LABELS)}")
+        recipe_ids = np.atleast_1d(np.asarray(recipe_ids))
+        recipe_ids = recipe_ids[self.features.rows(recipe_ids) >= 0]
+        if len(recipe_ids) == 0:
+            return
+        labels = np.full(len(recipe_ids), _LABELS[event])
+        with metrics.span('preference_update'):
+            self.classifier.partial_fit(self.features.for_recipes(recipe_ids), labels, classes=_CLASSES)
+        self.n_updates += len(recipe_ids)
+        metrics.increment('preference_updates', len(recipe_ids), event=event)
+
+    def score(self, recipe_ids) -> np.ndarray:
+        """Log-odds that the user keeps each recipe; zeros until the first update."""
+        if not self.trained:
+            return np.zeros(len(recipe_ids), dtype=np.float32)
+        coef = self.classifier.coef_[0].astype(np.float32)
+        return self.features.for_recipes(recipe_ids) @ coef + np.float32(self.classifier.intercept_[0])
+
+    def to_bytes(self) -> bytes:
+        """JSON-encoded weights plus the feature signature they were trained against."""
+        state = {'signature': self.features.signature, 'n_updates': self.n_updates}
+        if self.trained:
+            state.update(coef=self.classifier.coef_[0].tolist(), intercept=float(self.classifier.intercept_[0]),
+                         t=float(self.classifier.t_))
+        return json.dumps(state).encode()
+
+    @classmethod
+    def from_bytes(cls, features: RecipeFeatures, blob: Optional[bytes]) -> 'PreferenceModel':
+        """Restore a saved model; a fresh one when there is none, it is unreadable or the features changed since."""
+        if not blob:
+            return cls(features)
+        try:
+            state = json.loads(bytes(blob))
+            if state.get('signature') != features.signature:
+                return cls(features)
+            n_updates = int(state['n_updates'])
+            if n_updates == 0:
+                return cls(features)
+            coef = np.asarray(state['coef'], dtype=features.matrix.dtype)
+            if coef.shape != (features.n_features,):
+                raise ValueError(f"{coef.shape[0] if coef.ndim else 0} weights for {features.n_features} features")
+            classifier = _new_classifier()
+            classifier.coef_ = coef[np.newaxis, :]
+            classifier.intercept_ = np.array([state['intercept']], dtype=features.matrix.dtype)
+            classifier.t_ = float(state['t'])
+            classifier.classes_ = _CLASSES.copy()
+            classifier.n_features_in_ = features.n_features
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning("Discarding unreadable saved preference model: %s", e)
+            metrics.increment('preference_model_errors')
+            return cls(features)
+        return cls(features, classifier, n_updates)
+
+
+def _new_classifier() -> SGDClassifier:
+    return SGDClassifier(loss='log_loss', alpha=1e-4, learning_rate='constant', eta0=settings.PREFERENCE_LEARNING_RATE)
@@ -0,0 +1,104 @@
+"""Portion-size solvers: serving multipliers that make recipes meet nutrient targets.
+
+Nutrition values are per serving, so scaling a recipe by ``m`` scales all of
+its nutrients by ``m``. Two problems are solved here:
+
+* ``solve_portions``: the best multiplier of every (person, recipe) pair for
+  one meal, in closed form. After scaling, a recipe's fit only depends on its
+  macro *ratios*, which is what household slots and portioned plans score
+  candidates by (``portion_error``).
+* ``solve_day_portions``: the multipliers of a whole day's chosen meals at
+  once, a bounded linear least-squares problem, so the day's totals meet the
+  targets even where single meals could not.
+"""
+
+from typing import Optional
+
+import numpy as np
+from scipy.optimize import lsq_linear
+
+# Serving multipliers every planner stays within (daily plans, household plans, day re-solve)
+MIN_PORTION = 0.5
+MAX_PORTION = 2.0
+
+# Pull of each meal towards its own slot's best portion in ``solve_day_portions``;
+# keeps one meal from absorbing the whole day's correction
+DAY_PORTION_REGULARIZATION = 0.05
+
+
+def solve_portions(nutrients: np.ndarray, targets: np.ndarray, weights: Optional[np.ndarray] = None,
+                   min_portion: float = MIN_PORTION, max_portion: float = MAX_PORTION,
+                   step: Optional[float] = None) -> np.ndarray:
+    """Portion multipliers for every (member, recipe) pair.
+
+    ``nutrients`` is (recipes x nutrients) per serving and ``targets``
+    (members x nutrients). The multiplier ``m`` minimising
+    ``sum_k w_k * ((m * n_k - t_k) / t_k) ** 2`` is
+    ``sum_k w_k a_k / sum_k w_k a_k ** 2`` with ``a_k = n_k / t_k``; it is then
+    rounded to ``step`` servings (if given) and clipped to
+    ``[min_portion, max_portion]``. Nutrients with no target or no value do
+    not count. Returns a (members x recipes) array.
+    """
+    ratios = _target_ratios(nutrients, targets)
+    weights = np.ones(ratios.shape[-1], dtype=np.float32) if weights is None else weights
+    numerator = ratios @ weights
+    denominator = (ratios * ratios) @ weights
+    portions = np.divide(numerator, denominator, out=np.ones_like(numerator), where=denominator > 0)
+    if step:
+        portions = np.round(portions / step) * step
+    return np.clip(portions, min_portion, max_portion)
+
+
+def portion_error(portions: np.ndarray, nutrients: np.ndarray, targets: np.ndarray,
+                  weights: Optional[np.ndarray] = None) -> np.ndarray:
+    """Weighted squared relative miss of each (member, recipe) portion against the member's targets."""
+    ratios = _target_ratios(nutrients, targets)
+    weights = np.ones(ratios.shape[-1], dtype=np.float32) if weights is None else weights
+    has_target = (targets > 0)[:, np.newaxis, :]
+    miss = np.where(has_target, portions[:, :, np.newaxis] * ratios - 1, 0)
+    return (miss * miss) @ weights
+
+
+def _target_ratios(nutrients: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """(members x recipes x nutrients) ``nutrient / target``, zero where either is missing."""
+    scale = np.where(targets > 0, targets, np.inf).astype(np.float32)
+    return np.nan_to_num(nutrients[np.newaxis, :, :] / scale[:, np.newaxis, :])
+
+
+def solve_day_portions(nutrients: np.ndarray, daily_targets: np.ndarray, initial: np.ndarray,
+                       weights: Optional[np.ndarray] = None, min_portion: float = MIN_PORTION,
+                       max_portion: float = MAX_PORTION,
+                       daily_limits: Optional[np.ndarray] = None,
+                       regularization: float = DAY_PORTION_REGULARIZATION) -> np.ndarray:
+    """Multipliers of a day's meals so that their summed nutrients meet ``daily_targets``.
+
+    ``nutrients`` is (meals x nutrients) per serving and ``initial`` each
+    meal's own best portion. Minimises
+    ``sum_k w_k * ((sum_j m_j n_jk - T_k) / T_k) ** 2 + regularization * sum_j (m_j - initial_j) ** 2``
+    over ``min_portion <= m_j <= max_portion`` (``scipy.optimize.lsq_linear``).
+    Nutrients without a target do not count. If the totals then break one of
+    ``daily_limits``, every portion shrinks by the same factor, as far as
+    ``min_portion`` allows.
+    """
+    initial = np.clip(initial, min_portion, max_portion).astype(np.float64)
+    if len(initial) == 0:
+        return initial
+    weights = np.ones(nutrients.shape[1]) if weights is None else np.asarray(weights, dtype=np.float64)
+    nutrients = np.nan_to_num(nutrients.astype(np.float64))
+    targeted = (np.nan_to_num(daily_targets) > 0) & (weights > 0)
+    scale = np.sqrt(weights[targeted])
+    system = np.vstack([(nutrients[:, targeted] / daily_targets[targeted]).T * scale[:, np.newaxis],
+                        np.sqrt(regularization) * np.eye(len(initial))])
+    goal = np.concatenate([scale, np.sqrt(regularization) * initial])
+    if min_portion < max_portion:
+        portions = lsq_linear(system, goal, bounds=(min_portion, max_portion)).x
+    else:
+        portions = np.full(len(initial), min_portion, dtype=np.float64)
+
+    if daily_limits is not None:
+        totals = portions @ nutrients
+        with np.errstate(divide='ignore', invalid='ignore'):
+            over = np.where(np.isfinite(daily_limits) & (totals > daily_limits), daily_limits / totals, 1.0)
+        if over.min() < 1.0:
+            portions = np.maximum(portions * over.min(), min_portion)
+    return portions
@@ -0,0 +1,544 @@
+"""Declarative recipe filter expressions compiled into selectivity-ordered plans.
+
+Grammar (``AND``/``OR``/``NOT`` are case-insensitive)::
+
+    expr      := conj (OR conj)*
+    conj      := factor (AND factor)*
+    factor    := NOT factor | '(' expr ')' | predicate
+    predicate := Flag | Column op number | ingredient:term | keyword:"multi word" | category:Name
+
+for example ``Vegan AND HighProtein AND Calories < 500 AND NOT ingredient:peanut``.
+
+Row sets are sorted arrays of row positions, so results keep the table's
+``(MealCat, RankScore)`` presort. A conjunction evaluates its most selective
+predicate first through an index (flag bitmaps, sorted range indexes on
+numeric columns, the keyword/ingredient CSR matrices), tests the remaining
+predicates only on the surviving rows, and stops as soon as none survive.
+
+``QueryEngine.page`` serves the same expressions one page at a time for
+browsing, with keyset pagination: a page ends in a ``PageCursor`` (sort value
+and RecipeId of its last row), and the next page starts right after that key
+in a sort index built once per column. Finding the cursor is a binary search,
+so deep pages cost the same as the first, and cursors stay valid across
+reloads of the same data.
+"""
+
+import logging
+import operator
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..data.keywords import KeywordIndex
+from ..utils.cache import LRUCache
+from ..utils.metrics import metrics
+from .ranking import RANK_SCORE_COLUMN, best_first
+
+logger = logging.getLogger(__name__)
+
+_COMPARISONS = {
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+    '=': operator.eq, '==': operator.eq, '!=': operator.ne,
+}
+
+_TOKEN = re.compile(r'''
+    \s*(?:
+        (?P<lparen>\() | (?P<rparen>\)) |
+        (?P<op><=|>=|!=|==|=|<|>) |
+        (?P<number>-?\d+(?:\.\d+)?) |
+        (?P<field>[A-Za-z_]+):(?:"(?P<quoted>[^"]*)"|(?P<bare>[^\s()"]+)) |
+        (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    )''', re.VERBOSE)
+
+# Match masks of recently paged expressions, so follow-up pages skip evaluation
+PAGE_MASK_ENTRIES = 16
+PAGE_MASK_CACHE_MB = 64
+
+
+class QuerySyntaxError(ValueError):
+    """Raised for expressions that cannot be parsed or reference unknown columns."""
+
+
+# ---------------------------------------------------------------------------
+# Expression tree
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Flag:
+    column: str
+
+    def __str__(self):
+        return self.column
+
+
+@dataclass(frozen=True)
+class Compare:
+    column: str
+    op: str
+    value: float
+
+    def __str__(self):
+        return f'{self.column} {self.op} {self.value:g}'
+
+
+@dataclass(frozen=True)
+class Category:
+    name: str
+
+    def __str__(self):
+        return f'category:"{self.name}"'
+
+
+@dataclass(frozen=True)
+class Tag:
+    field: str  # 'keyword' or 'ingredient'
+    term: str
+
+    def __str__(self):
+        return f'{self.field}:"{self.term}"'
+
+
+@dataclass(frozen=True)
+class Not:
+    child: object
+
+    def __str__(self):
+        return f'NOT {self.child}'
+
+
+@dataclass(frozen=True)
+class And:
+    children: Tuple
+
+    def __str__(self):
+        return '(' + ' AND '.join(map(str, self.children)) + ')'
+
+
+@dataclass(frozen=True)
+class Or:
+    children: Tuple
+
+    def __str__(self):
+        return '(' + ' OR '.join(map(str, self.children)) + ')'
+
+
+def tokenize(expression: str) -> List[Tuple[str, str]]:
+    """Split an expression into ``(kind, text)`` tokens."""
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = _TOKEN.match(expression, position)
+        if match is None or match.end() == position:
+            raise QuerySyntaxError(f"Unexpected input at position {position}: '{expression[position:position + 20]}'")
+        kind = match.lastgroup
+        if kind in ('quoted', 'bare'):
+            tokens.append(('field', f"{match.group('field').lower()}:{match.group(kind)}"))
+        elif kind == 'word' and match.group(kind).upper() in ('AND', 'OR', 'NOT'):
+            tokens.append((match.group(kind).upper(), match.group(kind)))
+        else:
+            tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser producing the expression tree."""
+
+    def __init__(self, tokens: List[Tuple[str, str]], columns: Dict[str, str], flags: set, numeric: set):
+        self.tokens = tokens
+        self.position = 0
+        self.columns = columns
+        self.flags = flags
+        self.numeric = numeric
+
+    def parse(self):
+        node = self._expr()
+        if self.position != len(self.tokens):
+            raise QuerySyntaxError(f"Unexpected '{self.tokens[self.position][1]}'")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def _take(self, kind=None):
+        if self.position >= len(self.tokens):
+            raise QuerySyntaxError("Unexpected end of expression")
+        token = self.tokens[self.position]
+        if kind is not None and token[0] != kind:
+            raise QuerySyntaxError(f"Expected {kind}, found '{token[1]}'")
+        self.position += 1
+        return token
+
+    def _expr(self):
+        children = [self._conj()]
+        while self._peek() == 'OR':
+            self._take()
+            children.append(self._conj())
+        return children[0] if len(children) == 1 else Or(tuple(children))
+
+    def _conj(self):
+        children = [self._factor()]
+        while self._peek() == 'AND':
+            self._take()
+            children.append(self._factor())
+        return children[0] if len(children) == 1 else And(tuple(children))
+
+    def _factor(self):
+        kind = self._peek()
+        if kind == 'NOT':
+            self._take()
+            return Not(self._factor())
+        if kind == 'lparen':
+            self._take()
+            node = self._expr()
+            self._take('rparen')
+            return node
+        if kind == 'field':
+            return self._field(self._take()[1])
+        if kind == 'word':
+            return self._column_predicate(self._take()[1])
+        raise QuerySyntaxError(f"Expected a predicate, found '{self.tokens[self.position][1] if kind else 'end'}'")
+
+    def _field(self, text):
+        field, term = text.split(':', 1)
+        if field in ('keyword', 'ingredient'):
+            return Tag(field, term.strip().lower())
+        if field == 'category':
+            return Category(term.strip())
+        raise QuerySyntaxError(f"Unknown field '{field}:' (use keyword:, ingredient: or category:)")
+
+    def _column_predicate(self, word):
+        column = self.columns.get(word.lower())
+        if column is None:
+            raise QuerySyntaxError(f"Unknown column '{word}'")
+        if self._peek() == 'op':
+            op = self._take()[1]
+            if column not in self.numeric:
+                raise QuerySyntaxError(f"'{column}' is not numeric and cannot be compared with '{op}'"
+                                       f"{' (use category:Name)' if column == 'MealCat' else ''}")
+            value = float(self._take('number')[1])
+            return Compare(column, op, value)
+        if column not in self.flags:
+            raise QuerySyntaxError(f"'{column}' is not a flag, compare it with a number (e.g. {column} < 500)")
+        return Flag(column)
+
+
+# ---------------------------------------------------------------------------
+# Execution
+# ---------------------------------------------------------------------------
+
+class _RangeIndex:
+    """Row positions of a numeric column sorted by value (NaNs last)."""
+
+    def __init__(self, values: np.ndarray):
+        self.order = np.argsort(values, kind='stable')
+        self.sorted_values = values[self.order]
+        self.n_valid = int(np.count_nonzero(~np.isnan(self.sorted_values)))
+
+    def bounds(self, op: str, value: float) -> Tuple[int, int]:
+        """``[start, stop)`` slice of ``order`` satisfying ``column op value`` (not used for ``!=``)."""
+        valid = self.sorted_values[:self.n_valid]
+        if op == '<':
+            return 0, int(np.searchsorted(valid, value, 'left'))
+        if op == '<=':
+            return 0, int(np.searchsorted(valid, value, 'right'))
+        if op == '>':
+            return int(np.searchsorted(valid, value, 'right')), self.n_valid
+        if op == '>=':
+            return int(np.searchsorted(valid, value, 'left')), self.n_valid
+        return int(np.searchsorted(valid, value, 'left')), int(np.searchsorted(valid, value, 'right'))
+
+    def count(self, op: str, value: float) -> int:
+        if op == '!=':
+            start, stop = self.bounds('==', value)
+            return self.n_valid - (stop - start)
+        start, stop = self.bounds(op, value)
+        return stop - start
+
+    def rows(self, op: str, value: float) -> np.ndarray:
+        if op == '!=':
+            start, stop = self.bounds('==', value)
+            rows = np.concatenate((self.order[:start], self.order[stop:self.n_valid]))
+        else:
+            start, stop = self.bounds(op, value)
+            rows = self.order[start:stop]
+        return np.sort(rows)
+
+
+class _SortIndex:
+    """Row positions ordered by a numeric column (NaNs last), ties broken by RecipeId."""
+
+    def __init__(self, values: np.ndarray, recipe_ids: np.ndarray, descending: bool):
+        self.descending = descending
+        keys = self.key(values)
+        self.order = np.lexsort((recipe_ids, keys))
+        self.sorted_keys = keys[self.order]
+        self.sorted_ids = recipe_ids[self.order]
+
+    def key(self, values):
+        """Ascending sort key of ``values``."""
+        values = np.asarray(values, dtype=np.float64)
+        return np.where(np.isnan(values), np.inf, -values if self.descending else values)
+
+    def start_after(self, cursor: 'PageCursor') -> int:
+        """Position in ``order`` of the first row after ``cursor``."""
+        key = self.key(cursor.value)
+        low = int(np.searchsorted(self.sorted_keys, key, 'left'))
+        high = int(np.searchsorted(self.sorted_keys, key, 'right'))
+        return low + int(np.searchsorted(self.sorted_ids[low:high], cursor.recipe_id, 'right'))
+
+
+@dataclass(frozen=True)
+class PageCursor:
+    """Keyset position: sort value and RecipeId of the last row of a page."""
+    value: float
+    recipe_id: int
+
+
+@dataclass
+class Page:
+    """One page of ``QueryEngine.page``: row positions in page order, the cursor
+    of the next page (``None`` on the last one) and the number of matching rows."""
+    rows: np.ndarray
+    next_cursor: Optional[PageCursor]
+    total: int
+
+
+class QueryEngine:
+    """Compiles and runs filter expressions against one recipe table.
+
+    Indexes are built lazily on first use and kept for the engine's lifetime,
+    so one engine should be shared per loaded table. ``statistics`` is the
+    export metadata; its ``feature_counts`` seed flag selectivities when they
+    describe this table.
+    """
+
+    def __init__(self, df: pd.DataFrame, keyword_index: Optional[KeywordIndex] = None,
+                 ingredient_index: Optional[KeywordIndex] = None,
+                 statistics: Optional[Dict] = None):
+        self.df = df
+        self.n_rows = len(df)
+        self.tag_indexes = {'keyword': keyword_index, 'ingredient': ingredient_index}
+        self.columns = {col.lower(): col for col in df.columns}
+        self.flags = {col for col in df.columns
+                      if pd.api.types.is_bool_dtype(df[col]) or df[col].dtype == np.int8}
+        self.numeric = {col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])}
+        self._lock = threading.Lock()
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._bitmaps: Dict[object, np.ndarray] = {}
+        self._range_indexes: Dict[str, _RangeIndex] = {}
+        self._sort_indexes: Dict[Tuple[str, bool], _SortIndex] = {}
+        self._page_masks = LRUCache(PAGE_MASK_CACHE_MB * 1024**2, name='page_masks', max_entries=PAGE_MASK_ENTRIES)
+        self._flag_counts: Dict[str, int] = {}
+        if statistics and statistics.get('total_recipes') == self.n_rows:
+            self._flag_counts.update(statistics.get('feature_counts', {}))
+
+    # -- public API ---------------------------------------------------------
+
+    def compile(self, expression: str):
+        """Parse ``expression`` into an expression tree (raises ``QuerySyntaxError``)."""
+        return _Parser(tokenize(expression), self.columns, self.flags, self.numeric).parse()
+
+    def query(self, expression: Optional[str]) -> np.ndarray:
+        """Sorted row positions matching ``expression`` (every row when it is empty)."""
+        if not expression or not expression.strip():
+            return np.arange(self.n_rows)
+        with metrics.span('query'):
+            return self._evaluate(self.compile(expression), None)
+
+    def filter(self, expression: Optional[str]) -> pd.DataFrame:
+        """Matching rows as a new frame, in table order, with a fresh index."""
+        return self.df.take(self.query(expression)).reset_index(drop=True)
+
+    def page(self, expression: Optional[str], sort_by: str = RANK_SCORE_COLUMN, descending: bool = True,
+             after: Optional[PageCursor] = None, limit: int = 50) -> Page:
+        """Up to ``limit`` matching rows in ``sort_by`` order, starting after the keyset ``after``.
+
+        Only the sort order from the cursor on is walked, until the page is
+        full, so the cost depends on the page size and the match density, not
+        on how deep the page is.
+        """
+        if sort_by not in self.numeric:
+            raise QuerySyntaxError(f"Cannot sort by '{sort_by}': not a numeric column")
+        with metrics.span('query_page'):
+            mask, total = self._match_mask(expression)
+            index = self._sort_index(sort_by, descending)
+            start = index.start_after(after) if after is not None else 0
+            rows = best_first(index.order[start:], lambda block: mask[block], limit + 1)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = PageCursor(float(self._array(sort_by)[rows[-1]]), int(self._array('RecipeId')[rows[-1]]))
+        return Page(rows, next_cursor, total)
+
+    def define_flag(self, name: str, any_of=(), all_of=(), none_of=()) -> int:
+        """Add a 0/1 flag ``name`` from keyword rules (see ``KeywordIndex.define_flag``); returns its count.
+
+        The flag is usable in expressions from then on, like an exported one;
+        the shared table itself is not changed.
+        """
+        index = self.tag_indexes['keyword']
+        if index is None:
+            raise QuerySyntaxError(f"No keyword index is available to define '{name}'")
+        if name.lower() in self.columns:
+            raise ValueError(f"'{name}' is already a column of the table")
+        values = index.define_flag(any_of, all_of, none_of)
+        with self._lock:
+            self._arrays[name] = values
+            self.flags.add(name)
+            self.numeric.add(name)
+            self.columns[name.lower()] = name
+        return self._flag_count(name)
+
+    def explain(self, expression: str) -> List[str]:
+        """Execution plan as indented lines with estimated row counts."""
+        lines = []
+
+        def walk(node, depth):
+            estimate = self.estimate(node)
+            if isinstance(node, (And, Or)):
+                label = 'AND' if isinstance(node, And) else 'OR'
+                lines.append(f"{'  ' * depth}{label} (~{estimate:,.0f} rows)")
+                for child in self._ordered(node):
+                    walk(child, depth + 1)
+            else:
+                lines.append(f"{'  ' * depth}{node} (~{estimate:,.0f} rows)")
+
+        walk(self.compile(expression), 0)
+        return lines
+
+    def estimate(self, node) -> float:
+        """Estimated number of matching rows (exact for single predicates)."""
+        n = max(self.n_rows, 1)
+        if isinstance(node, Flag):
+            return self._flag_count(node.column)
+        if isinstance(node, Compare):
+            return self._range_index(node.column).count(node.op, node.value)
+        if isinstance(node, (Category, Tag)):
+            return len(self._lookup(node))
+        if isinstance(node, Not):
+            return self.n_rows - self.estimate(node.child)
+        # Composite estimates assume independent predicates
+        shares = [self.estimate(child) / n for child in node.children]
+        if isinstance(node, And):
+            return n * float(np.prod(shares))
+        return n * (1.0 - float(np.prod([1.0 - share for share in shares])))
+
+    # -- evaluation -----------------------------------------------------------
+
+    def _ordered(self, node):
+        # AND: most selective first so later predicates see the fewest rows.
+        # OR: broadest first so later branches only test what is still unmatched.
+        return sorted(node.children, key=self.estimate, reverse=isinstance(node, Or))
+
+    def _evaluate(self, node, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Rows (from ``rows``, or the whole table when ``None``) matching ``node``."""
+        if isinstance(node, And):
+            for child in self._ordered(node):
+                rows = self._evaluate(child, rows)
+                if len(rows) == 0:
+                    metrics.increment('query_short_circuits')
+                    break
+            return rows
+        if isinstance(node, Or):
+            remaining = rows
+            hits = []
+            for child in self._ordered(node):
+                hit = self._evaluate(child, remaining)
+                hits.append(hit)
+                remaining = np.setdiff1d(remaining if remaining is not None else np.arange(self.n_rows),
+                                         hit, assume_unique=True)
+                if len(remaining) == 0:
+                    break
+            return np.unique(np.concatenate(hits)) if hits else np.empty(0, dtype=np.int64)
+        if isinstance(node, Not):
+            hit = self._evaluate(node.child, rows)
+            if rows is None:
+                keep = np.ones(self.n_rows, dtype=bool)
+                keep[hit] = False
+                return np.flatnonzero(keep)
+            return rows[~np.isin(rows, hit, assume_unique=True)]
+
+        if rows is None:
+            return self._lookup(node)
+        return self._refine(node, rows)
+
+    def _lookup(self, node) -> np.ndarray:
+        """Whole-table answer for a predicate, straight from its index."""
+        if isinstance(node, Compare):
+            return self._range_index(node.column).rows(node.op, node.value)
+        if isinstance(node, Tag):
+            index = self.tag_indexes.get(node.field)
+            if index is None:
+                raise QuerySyntaxError(f"No {node.field} index is available for '{node}'")
+            if node not in self._bitmaps:
+                if node.field == 'ingredient':
+                    # Substring match over the vocabulary: 'peanut' covers 'peanut butter'
+                    rows = index.rows_matching(node.term)
+                elif node.term in index.ids:
+                    rows = index.rows_with(node.term)
+                else:
+                    rows = np.empty(0, dtype=np.int64)
+                self._bitmaps[node] = rows
+            return self._bitmaps[node]
+        if isinstance(node, Category):
+            if node not in self._bitmaps:
+                categories = self.df['MealCat'].astype(str).to_numpy()
+                self._bitmaps[node] = np.flatnonzero(categories == node.name)
+            return self._bitmaps[node]
+        # Flag bitmap
+        if node.column not in self._bitmaps:
+            self._bitmaps[node.column] = np.flatnonzero(self._array(node.column) == 1)
+            self._flag_counts[node.column] = len(self._bitmaps[node.column])
+        return self._bitmaps[node.column]
+
+    def _refine(self, node, rows: np.ndarray) -> np.ndarray:
+        """Subset of ``rows`` matching a predicate, testing only those rows."""
+        if isinstance(node, Flag):
+            return rows[self._array(node.column)[rows] == 1]
+        if isinstance(node, Compare):
+            values = self._array(node.column)[rows]
+            # NaN never matches, consistent with the range index
+            return rows[_COMPARISONS[node.op](values, node.value) & ~pd.isna(values)]
+        return rows[np.isin(rows, self._lookup(node), assume_unique=True)]
+
+    # -- lazily built statistics and indexes --------------------------------------
+
+    def _array(self, column: str) -> np.ndarray:
+        if column not in self._arrays:
+            self._arrays[column] = self.df[column].to_numpy()
+        return self._arrays[column]
+
+    def _match_mask(self, expression: Optional[str]) -> Tuple[np.ndarray, int]:
+        def build():
+            rows = self.query(expression)
+            mask = np.zeros(self.n_rows, dtype=bool)
+            mask[rows] = True
+            return mask, len(rows)
+        return self._page_masks.get_or_build((expression or '').strip(), build)
+
+    def _sort_index(self, column: str, descending: bool) -> _SortIndex:
+        key = (column, descending)
+        if key not in self._sort_indexes:
+            with self._lock:
+                if key not in self._sort_indexes:
+                    self._sort_indexes[key] = _SortIndex(self._array(column), self._array('RecipeId'), descending)
+        return self._sort_indexes[key]
+
+    def _flag_count(self, column: str) -> int:
+        if column not in self._flag_counts:
+            self._lookup(Flag(column))
+        return self._flag_counts[column]
+
+    def _range_index(self, column: str) -> _RangeIndex:
+        if column not in self._range_indexes:
+            with self._lock:
+                if column not in self._range_indexes:
+                    values = self._array(column).astype(np.float64, copy=False)
+                    self._range_indexes[column] = _RangeIndex(values)
+        return self._range_indexes[column]
@@ -0,0 +1,132 @@
+"""Recipe ranking score and per-category best-first row orders.
+
+The score is a Bayesian average of ``AggregatedRating`` shrunk towards the
+catalogue mean by ``prior_reviews`` virtual reviews, so a 5.0 from a single
+review no longer outranks a 4.9 from thousands. The export writes the table
+sorted by ``(MealCat, RankScore desc)``; any boolean-mask subset of it keeps
+that order, which lets the planner walk candidates best-first and stop early
+instead of sorting or taking a ``max`` per slot.
+"""
+
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+RANK_SCORE_COLUMN = 'RankScore'
+CATEGORY_COLUMN = 'MealCat'
+
+# Rows examined per step while walking a best-first order
+CANDIDATE_BLOCK = 2048
+
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+
+def bayesian_rank_score(ratings: pd.Series, review_counts: pd.Series,
+                        prior_reviews: Optional[float] = None,
+                        prior_mean: Optional[float] = None) -> Tuple[np.ndarray, float, float]:
+    """Vectorised Bayesian average rating.
+
+    Unrated recipes score exactly ``prior_mean``. Returns the float32 scores and
+    the prior actually used, so the export can record it in the metadata.
+    """
+    r = ratings.to_numpy(dtype=np.float64, na_value=np.nan)
+    v = review_counts.to_numpy(dtype=np.float64, na_value=np.nan)
+    rated = ~np.isnan(r)
+    v = np.where(rated, np.fmax(v, 1.0), 0.0)
+    r = np.where(rated, r, 0.0)
+
+    if prior_mean is None:
+        prior_mean = float((r * v).sum() / v.sum()) if v.sum() > 0 else 0.0
+    if prior_reviews is None:
+        # Upper-quartile review count: a recipe needs a typical amount of
+        # evidence before its own average dominates the prior
+        prior_reviews = float(np.percentile(v[rated], 75)) if rated.any() else 1.0
+
+    scores = (r * v + prior_reviews * prior_mean) / (v + prior_reviews)
+    return scores.astype(np.float32), float(prior_mean), float(prior_reviews)
+
+
+def add_rank_score(df: pd.DataFrame, prior_reviews: Optional[float] = None) -> Dict[str, float]:
+    """Add the ``RankScore`` column in place and return the prior parameters."""
+    scores, prior_mean, prior_reviews = bayesian_rank_score(
+        df['AggregatedRating'], df['ReviewCount'], prior_reviews=prior_reviews
+    )
+    df[RANK_SCORE_COLUMN] = scores
+    return {'method': 'bayesian_average', 'prior_mean': prior_mean, 'prior_reviews': prior_reviews}
+
+
+def sort_by_rank(df: pd.DataFrame) -> pd.DataFrame:
+    """Order rows by meal category, best score first within each category, ties by RecipeId.
+
+    The order is total, so a table re-assembled from partitions sorts exactly like the export.
+    """
+    ties = df['RecipeId'].to_numpy() if 'RecipeId' in df.columns else np.arange(len(df))
+    order = np.lexsort((ties, -df[RANK_SCORE_COLUMN].to_numpy(), df[CATEGORY_COLUMN].astype(str).to_numpy()))
+    return df.take(order).reset_index(drop=True)
+
+
+def category_ranges(df: pd.DataFrame) -> Dict[str, Tuple[int, int]]:
+    """``[start, stop)`` row range of every category in a table sorted by ``sort_by_rank``."""
+    categories = df[CATEGORY_COLUMN].astype(str).to_numpy()
+    if len(categories) == 0:
+        return {}
+    boundaries = np.flatnonzero(categories[1:] != categories[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    stops = np.concatenate((boundaries, [len(categories)]))
+    return {str(categories[start]): (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+
+def category_rank_orders(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Row positions of every category, best score first.
+
+    For presorted tables (and any mask-filtered subset of one) this is a linear
+    grouping pass; only tables in arbitrary order fall back to a real sort.
+    """
+    if df.empty:
+        return {}
+    categories = df[CATEGORY_COLUMN].astype('category')
+    codes = categories.cat.codes.to_numpy()
+    scores = df[RANK_SCORE_COLUMN].to_numpy()
+
+    grouping = np.argsort(codes, kind='stable')
+    grouped_codes = codes[grouping]
+    grouped_scores = scores[grouping]
+    same_group = grouped_codes[1:] == grouped_codes[:-1]
+    if not np.all(grouped_scores[1:][same_group] <= grouped_scores[:-1][same_group]):
+        grouping = np.lexsort((-scores, codes))
+        grouped_codes = codes[grouping]
+
+    boundaries = np.flatnonzero(grouped_codes[1:] != grouped_codes[:-1]) + 1
+    orders = {}
+    for block in np.split(grouping, boundaries):
+        code = codes[block[0]]
+        if code >= 0:
+            orders[categories.cat.categories[code]] = block
+    return orders
+
+
+def best_first(order: np.ndarray, accept: Callable[[np.ndarray], np.ndarray], k: int,
+               block_size: int = CANDIDATE_BLOCK) -> np.ndarray:
+    """First ``k`` positions of ``order`` passing ``accept``, scanning block by block."""
+    hits = []
+    found = 0
+    for start in range(0, len(order), block_size):
+        block = order[start:start + block_size]
+        block_hits = block[accept(block)]
+        if len(block_hits):
+            hits.append(block_hits)
+            found += len(block_hits)
+            if found >= k:
+                break
+    return np.concatenate(hits)[:k] if hits else _NO_ROWS
+
+
+def best_first_across(orders: Dict[str, np.ndarray], scores: np.ndarray,
+                      accept: Callable[[np.ndarray], np.ndarray], k: int) -> np.ndarray:
+    """Top ``k`` accepted positions over all categories, best score first."""
+    candidates = [best_first(order, accept, k) for order in orders.values()]
+    candidates = np.concatenate(candidates) if candidates else _NO_ROWS
+    if len(candidates) <= 1:
+        return candidates
+    return candidates[np.argsort(-scores[candidates], kind='stable')][:k]
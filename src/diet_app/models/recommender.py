@@ -0,0 +1,496 @@
+"""Meal-plan recommendation logic shared by the Streamlit app and scripts."""
+
+import numpy as np
+import pandas as pd
+
+from ..config.settings import settings
+from ..data.loaders import NUTRITION_COLUMNS
+from ..utils.metrics import metrics
+from ..utils.profiling import profiler
+from .portions import MAX_PORTION, MIN_PORTION, portion_error, solve_day_portions, solve_portions
+from .query import QueryEngine
+from .ranking import RANK_SCORE_COLUMN, best_first, best_first_across, category_rank_orders
+
+# Meal category mapping for better recipe selection
+MEAL_CATEGORY_MAP = {
+    "Lunch": "Lunch/Dinner",
+    "Dinner": "Lunch/Dinner",
+    "Snack": "Snacks",
+    "Mid-Morning": "Snacks",
+    "Afternoon Snack": "Snacks",
+    "Evening Snack": "Snacks",
+    "Breakfast": "Breakfast"
+}
+
+# Column order of the planner's nutrient matrix (Calories and ProteinContent first)
+PLAN_NUTRIENTS = NUTRITION_COLUMNS
+_CALORIES = PLAN_NUTRIENTS.index('Calories')
+_PROTEIN = PLAN_NUTRIENTS.index('ProteinContent')
+
+
+def nutrient_matrix(df):
+    """Float32 (recipes x PLAN_NUTRIENTS) matrix used for vectorised candidate checks and scoring"""
+    return np.ascontiguousarray(df[PLAN_NUTRIENTS].to_numpy(dtype=np.float32, na_value=np.nan))
+
+
+def nutrient_vector(values, default=np.nan):
+    """Turn a {column: value} mapping into a vector aligned with PLAN_NUTRIENTS"""
+    vector = np.full(len(PLAN_NUTRIENTS), default, dtype=np.float32)
+    for column, value in (values or {}).items():
+        if column not in PLAN_NUTRIENTS:
+            raise ValueError(f"Unknown nutrient '{column}'. Expected one of: {', '.join(PLAN_NUTRIENTS)}")
+        if value is not None:
+            vector[PLAN_NUTRIENTS.index(column)] = value
+    return vector
+
+
+def within_bounds(block, lower=None, upper=None):
+    """Rows (last axis: PLAN_NUTRIENTS) within ``[lower, upper]`` on every nutrient
+
+    Only bounds that are set (finite) are tested, so a missing value (NaN) fails
+    a real bound but passes an unbounded one.
+    """
+    lower_ok = np.all((block >= lower) | np.isneginf(lower), axis=-1) if lower is not None else True
+    upper_ok = np.all((block <= upper) | np.isposinf(upper), axis=-1) if upper is not None else True
+    return lower_ok & upper_ok
+
+
+def weighted_nutrient_distance(nutrients, targets, weights):
+    """Weighted squared relative distance of every row of ``nutrients`` to ``targets`` (one matrix product)"""
+    scale = np.where(targets > 0, targets, 1).astype(np.float32)
+    relative = (nutrients - np.nan_to_num(targets)) / scale
+    return np.nan_to_num(relative * relative, nan=1e6) @ weights
+
+
+# Preference answers translated into filter-expression predicates
+PREFERENCE_FLAGS = {
+    'vegetarian': 'Vegetarian', 'vegan': 'Vegan', 'pescatarian': 'Pescatarian',
+    'easy': 'Easy', 'glutenfree': 'GlutenFree', 'dairyfree': 'DairyFree'
+}
+PREFERENCE_LEVELS = {
+    'calories': {'l': 'LowCalorie', 'm': 'ModerateCalorie', 'h': 'HighCalorie'},
+    'protein': {'l': 'LowProtein', 'm': 'ModerateProtein', 'h': 'HighProtein'},
+    'preptime': {'q': 'Quick', 's': 'StandardPrepTime', 'l': 'LongPrepTime'},
+}
+
+
+def preference_flags(preferences):
+    """Flag columns required by the preference answers (keywords and expressions excluded)"""
+    flags = [flag for key, flag in PREFERENCE_FLAGS.items() if preferences.get(key) == 'y']
+    flags += [levels[preferences[key]] for key, levels in PREFERENCE_LEVELS.items()
+              if preferences.get(key) in levels]
+    return flags
+
+
+def preferences_expression(preferences):
+    """Compile the preference answers into one filter expression (see ``models.query``)"""
+    predicates = preference_flags(preferences)
+    predicates += [f'keyword:"{keyword}"' for keyword in preferences.get('keywords') or []]
+    if preferences.get('expression'):
+        predicates.append(f"({preferences['expression']})")
+    return ' AND '.join(predicates)
+
+
+@metrics.timed('filter_by_preferences')
+@profiler.profiled('filter_by_preferences')
+def filter_by_preferences(dataframe, preferences, keyword_index=None, engine=None):
+    """Filter dataframe based on user preferences - enhanced version from first script
+
+    Preferences (plus an optional free-form ``preferences['expression']``) are
+    compiled into one expression and run by a ``QueryEngine``, which applies
+    the most selective predicates first. Pass the table's shared ``engine`` to
+    reuse its indexes; ``keyword_index`` rows must follow ``dataframe``'s order.
+    """
+    if engine is None:
+        engine = QueryEngine(dataframe, keyword_index=keyword_index)
+    return engine.filter(preferences_expression(preferences))
+
+def generate_meal_names(count=3):
+    """Generate appropriate meal names based on count"""
+    base_names = ["Breakfast", "Lunch", "Dinner"]
+    
+    if count <= 3:
+        return base_names[:count]
+    elif count == 4:
+        return ["Breakfast", "Lunch", "Snack", "Dinner"]
+    elif count == 5:
+        return ["Breakfast", "Mid-Morning", "Lunch", "Afternoon Snack", "Dinner"]
+    elif count == 6:
+        return ["Breakfast", "Mid-Morning", "Lunch", "Afternoon Snack", "Dinner", "Evening Snack"]
+    else:
+        return [f"Meal {i+1}" for i in range(count)]
+
+def optimal_weights_per_meal(count=3):
+    """Give appropriate weight to each meal during the day, to assign appropriate amount of calories/protein to each of them"""
+    # Defining weights for every possible named meal (see function above)
+    meal_weights = {
+        "Breakfast": 3, "Lunch": 4, "Dinner": 4, 
+        "Mid-Morning": 2, "Afternoon Snack": 2, 
+        "Evening Snack": 2, "Snack": 2, "Default": 3
+    } 
+    
+    meal_slots = generate_meal_names(count)
+    meal_plan_weights = {meal: None for meal in meal_slots}
+    
+    for meal in meal_plan_weights:
+        if meal in meal_weights:  # this should somehow get the key and not the value
+            meal_plan_weights[meal] = meal_weights[meal] 
+        else:
+            meal_plan_weights[meal] = meal_weights["Default"]
+    
+    # calculate the total sum of points
+    total_weight = sum(meal_plan_weights.values())
+    for meal in meal_plan_weights:
+        meal_plan_weights[meal] = round(meal_plan_weights[meal] / total_weight, 2)  # possibly remove the rounding if I feel like it will make it simpler
+    
+    return meal_plan_weights
+
+def number_of_meals(df_filtered, target_calories=2500, target_protein=120, max_meals=6, nutrient_means=None):
+    """Estimate optimal number of meals for given goals
+    
+    ``nutrient_means`` ({column: mean}, e.g. from the aggregate cube) skips
+    recomputing the averages over ``df_filtered``.
+    """
+    if df_filtered.empty:
+        return ["Breakfast", "Lunch", "Dinner"]
+    
+    if nutrient_means is not None:
+        avg_calories = nutrient_means["Calories"]
+        avg_protein = nutrient_means["ProteinContent"]
+    else:
+        avg_calories = df_filtered["Calories"].mean()
+        avg_protein = df_filtered["ProteinContent"].mean()
+    
+    estimated_meals_by_cal = min(max_meals, max(2, int(target_calories // (avg_calories * 0.8))))
+    estimated_meals_by_protein = min(max_meals, max(2, int(target_protein // (avg_protein * 0.8))))
+    
+    optimal_meals = max(estimated_meals_by_cal, estimated_meals_by_protein)
+    
+    return generate_meal_names(optimal_meals)
+
+@metrics.timed('generate_daily_meal_plan')
+def generate_daily_meal_plan(df_filtered, target_calories=2500, target_protein=120, tolerance=0.2, max_meals=6,
+                             top_k=None, rng=None, nutrient_targets=None, nutrient_weights=None, nutrient_limits=None,
+                             nutrient_means=None, exclude_recipe_ids=None, preference_model=None, portions=False,
+                             min_portion=MIN_PORTION, max_portion=MAX_PORTION):
+    """Generate a daily meal plan from filtered recipes - enhanced version with adaptive targeting and meal categorization
+    
+    Candidates for each slot are walked best-first along the presorted ranking
+    order and the search stops after ``top_k`` recipes within tolerance; one of
+    those is picked at random so repeated plans still vary.
+    
+    Beyond calories and protein, ``nutrient_targets`` ({column: daily amount})
+    adds soft targets for any of PLAN_NUTRIENTS, weighted by ``nutrient_weights``
+    (default 1), and ``nutrient_limits`` ({column: daily maximum}) adds hard caps.
+    With targets, each slot scores a wider best-ranked pool by weighted distance
+    and picks among the closest ``top_k``. A trained ``preference_model``
+    (``models.learning``) scores every slot's pool in one dot product and tilts
+    the pick towards recipes the user tends to keep. With ``portions`` the
+    servings of every meal are solved for (see ``generate_meal_plans``).
+    """
+    
+    if df_filtered.empty:
+        return None, "No recipes available with your current filters!", 0, 0
+    
+    return generate_meal_plans(
+        df_filtered, 1, target_calories, target_protein, tolerance=tolerance, max_meals=max_meals,
+        top_k=top_k, rng=rng, nutrient_targets=nutrient_targets, nutrient_weights=nutrient_weights,
+        nutrient_limits=nutrient_limits, nutrient_means=nutrient_means, exclude_recipe_ids=exclude_recipe_ids,
+        preference_model=preference_model, portions=portions, min_portion=min_portion, max_portion=max_portion
+    )[0]
+
+
+@metrics.timed('generate_meal_plans')
+@profiler.profiled('generate_meal_plans')
+def generate_meal_plans(df_filtered, n_plans=5, target_calories=2500, target_protein=120, tolerance=0.2, max_meals=6,
+                        top_k=None, rng=None, nutrient_targets=None, nutrient_weights=None, nutrient_limits=None,
+                        nutrient_means=None, exclude_recipe_ids=None, preference_model=None, portions=False,
+                        min_portion=MIN_PORTION, max_portion=MAX_PORTION):
+    """Generate ``n_plans`` alternative daily plans that share no recipes, from one candidate search per slot
+    
+    Each slot retrieves a single best-first pool sized for all plans, checks it
+    against every plan's remaining hard-limit budget in one broadcast, and hands
+    out distinct recipes by sampling without replacement (a random priority
+    matrix with taken/infeasible entries masked). Returns a list of
+    ``(meal_plan, summary, total_calories, total_protein)`` tuples; a plan only
+    reuses a recipe from another plan when the pool runs out of distinct options.
+    ``nutrient_means`` is passed through to ``number_of_meals``. Recipes in
+    ``exclude_recipe_ids`` (e.g. served recently) are only used as a last resort.
+    Limits are only broken when no recipe left fits them; the plan's summary
+    then names the nutrients over their limit.
+    
+    With a trained ``preference_model`` the pool is widened like with targets,
+    narrowed to the candidates the model scores highest (or, with targets, the
+    closest) and the priority matrix becomes ``score + Gumbel noise``: sampling
+    without replacement in proportion to ``exp(score)``.
+    
+    With ``portions`` servings become a continuous multiplier in
+    ``[min_portion, max_portion]``. A slot then accepts any recipe that some
+    multiplier scales to the slot's calories and whose protein per calorie is
+    within ``tolerance`` of the day's ratio, which admits far more candidates
+    than the absolute window. The wider pool is narrowed by the error left
+    after each recipe's best portion (its macro ratio fit). Once all slots are
+    filled, the multipliers of each plan are solved together so that the day's
+    totals meet the targets (``portions.solve_day_portions``). Returned recipes
+    then carry their ``Servings`` and nutrients scaled to them.
+    """
+    
+    if df_filtered.empty:
+        return [(None, "No recipes available with your current filters!", 0, 0)] * n_plans
+    
+    rng = rng if rng is not None else np.random.default_rng()
+    top_k = top_k or settings.PLAN_TOP_K
+    if preference_model is not None and not preference_model.trained:
+        preference_model = None
+    pool_size = top_k * n_plans * (settings.PLAN_SCORE_POOL if nutrient_targets or preference_model or portions else 1)
+    
+    # Get meal slots and initialize plans
+    meal_slots = number_of_meals(df_filtered, target_calories, target_protein, max_meals, nutrient_means)
+    meal_plans = [{} for _ in range(n_plans)]
+    
+    # Daily target, weight and limit vectors aligned with the nutrient matrix
+    weights = optimal_weights_per_meal(len(meal_slots))
+    daily_targets = nutrient_vector(nutrient_targets)
+    daily_targets[_CALORIES] = target_calories
+    daily_targets[_PROTEIN] = target_protein
+    target_weights = nutrient_vector(
+        {column: (nutrient_weights or {}).get(column, 1.0) for column in nutrient_targets or {}}, default=0
+    )
+    target_weights[_CALORIES] = (nutrient_weights or {}).get('Calories', 1.0)
+    target_weights[_PROTEIN] = (nutrient_weights or {}).get('ProteinContent', 1.0)
+    daily_limits = nutrient_vector(nutrient_limits, default=np.inf)
+    consumed = np.zeros((n_plans, len(PLAN_NUTRIENTS)), dtype=np.float32)
+    # Portioned plans: chosen rows and each meal's own best portion, per plan
+    chosen_rows = [[] for _ in range(n_plans)]
+    chosen_portions = [[] for _ in range(n_plans)]
+    protein_ratio = target_protein / target_calories if target_calories > 0 else 0.0
+    
+    nutrients = nutrient_matrix(df_filtered)
+    scores = df_filtered[RANK_SCORE_COLUMN].to_numpy()
+    recipe_ids = df_filtered['RecipeId'].to_numpy()
+    rank_orders = category_rank_orders(df_filtered)
+    # Rows already served in any plan: keeps plans disjoint and stops repeats within a day
+    used = np.zeros(len(df_filtered), dtype=bool)
+    if exclude_recipe_ids is not None and len(exclude_recipe_ids):
+        used = np.isin(recipe_ids, exclude_recipe_ids)
+        metrics.increment('excluded_recipes', int(used.sum()))
+    
+    for position, meal in enumerate(meal_slots):
+        # Flexible targets for this meal: +-tolerance on calories/protein, and at
+        # most this slot's share of whatever is left of each hard limit
+        slot_targets = daily_targets * weights[meal]
+        lower = np.full(len(PLAN_NUTRIENTS), -np.inf, dtype=np.float32)
+        upper = np.full(len(PLAN_NUTRIENTS), np.inf, dtype=np.float32)
+        for index in (_CALORIES, _PROTEIN):
+            lower[index] = slot_targets[index] * (1 - tolerance)
+            upper[index] = slot_targets[index] * (1 + tolerance)
+        remaining_share = sum(weights[m] for m in meal_slots[position:])
+        remaining_budget = daily_limits - consumed
+        limit_share = min(1.0, weights[meal] / remaining_share * (1 + tolerance))
+        plan_upper = np.minimum(upper, remaining_budget * limit_share)
+        # One retrieval serves every plan, so search with the loosest plan's bounds
+        search_upper = plan_upper.max(axis=0)
+        
+        def within_slot_targets(rows):
+            return ~used[rows] & within_bounds(nutrients[rows], lower, search_upper)
+        
+        # Scalable to the slot's calories, with the day's protein per calorie; limits apply after scaling
+        portion_budget = (remaining_budget * limit_share).max(axis=0)
+        
+        def within_portioned_targets(rows):
+            block = nutrients[rows]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                servings = slot_targets[_CALORIES] / block[:, _CALORIES]
+                accept = (servings >= min_portion) & (servings <= max_portion)
+                if protein_ratio > 0:
+                    accept &= np.abs(block[:, _PROTEIN] / block[:, _CALORIES] / protein_ratio - 1) <= tolerance
+            return ~used[rows] & accept & within_bounds(block * servings[:, np.newaxis], upper=portion_budget)
+        
+        within_targets = within_portioned_targets if portions else within_slot_targets
+        
+        with metrics.span('slot_search', slot=meal):
+            category = MEAL_CATEGORY_MAP.get(meal)
+            candidates = None
+            if category is not None:
+                candidates = best_first(rank_orders.get(category, np.empty(0, dtype=np.int64)), within_targets, pool_size)
+                if len(candidates) == 0:
+                    # Fallback: try without meal category restriction
+                    metrics.increment('fallback', reason='any_category')
+                    candidates = None
+            if candidates is None:
+                candidates = best_first_across(rank_orders, scores, within_targets, pool_size)
+            if len(candidates) == 0 and nutrient_limits:
+                # Fallback: drop the calorie/protein window but keep the hard limits
+                metrics.increment('fallback', reason='limits_only')
+                loosest_budget = remaining_budget.max(axis=0)
+                candidates = best_first_across(
+                    rank_orders, scores,
+                    lambda rows: ~used[rows] & within_bounds(nutrients[rows], upper=loosest_budget), pool_size
+                )
+        
+        with metrics.span('selection', slot=meal):
+            learned = preference_model.score(recipe_ids[candidates]) if preference_model is not None else None
+            servings = np.ones(len(candidates), dtype=np.float32)
+            if portions:
+                servings = solve_portions(nutrients[candidates], slot_targets[np.newaxis, :], target_weights,
+                                          min_portion, max_portion)[0]
+            if len(candidates) > top_k * n_plans:
+                if portions:
+                    error = portion_error(servings[np.newaxis, :], nutrients[candidates], slot_targets[np.newaxis, :],
+                                          target_weights)[0]
+                    keep = np.argsort(error, kind='stable')[:top_k * n_plans]
+                elif nutrient_targets:
+                    distance = weighted_nutrient_distance(nutrients[candidates], slot_targets, target_weights)
+                    keep = np.argsort(distance, kind='stable')[:top_k * n_plans]
+                else:
+                    keep = np.argsort(-learned, kind='stable')[:top_k * n_plans]
+                candidates = candidates[keep]
+                servings = servings[keep]
+                learned = learned[keep] if learned is not None else None
+            
+            # (plans x candidates) feasibility against each plan's own remaining budget
+            pool = nutrients[candidates] * servings[:, np.newaxis]
+            feasible = within_bounds(pool[np.newaxis, :, :], upper=remaining_budget[:, np.newaxis, :])
+            priority = sampling_priority(feasible.shape, rng, learned)
+            priority[~feasible] = -np.inf
+            
+            for plan_index, meal_plan in enumerate(meal_plans):
+                choice = int(np.argmax(priority[plan_index])) if len(candidates) else -1
+                if choice >= 0 and np.isfinite(priority[plan_index, choice]):
+                    selected_row = candidates[choice]
+                    # Sampling without replacement: nobody else may take this candidate
+                    priority[:, choice] = -np.inf
+                elif feasible[plan_index].any():
+                    # Fewer distinct candidates than plans: share one with another plan
+                    metrics.increment('fallback', reason='shared_recipe')
+                    selected_row = rng.choice(candidates[feasible[plan_index]])
+                else:
+                    # Last resort: any recipe of the filtered set still within this plan's limits
+                    metrics.increment('fallback', reason='any_recipe')
+                    selected_row = any_recipe(nutrients, remaining_budget[plan_index], rng, used)
+                
+                portion = 1.0
+                if portions:
+                    portion = float(solve_portions(nutrients[[selected_row]], slot_targets[np.newaxis, :],
+                                                   target_weights, min_portion, max_portion)[0, 0])
+                    chosen_rows[plan_index].append(selected_row)
+                    chosen_portions[plan_index].append(portion)
+                
+                # Add to meal plan with full recipe data
+                meal_plan[meal] = df_filtered.iloc[selected_row]
+                used[selected_row] = True
+                consumed[plan_index] += np.nan_to_num(nutrients[selected_row]) * portion
+                metrics.increment('slots_planned')
+    
+    if portions:
+        # Re-solve every plan's servings together so the day's totals meet the targets
+        for plan_index, meal_plan in enumerate(meal_plans):
+            rows = chosen_rows[plan_index]
+            with metrics.span('portion_solve'):
+                servings = solve_day_portions(nutrients[rows], daily_targets, np.array(chosen_portions[plan_index]),
+                                              target_weights, min_portion, max_portion, daily_limits)
+            for meal, serving in zip(meal_slots, servings):
+                meal_plan[meal] = portioned_recipe(meal_plan[meal], serving)
+            consumed[plan_index] = servings @ np.nan_to_num(nutrients[rows])
+    
+    results = []
+    for plan_index, meal_plan in enumerate(meal_plans):
+        total_calories = int(consumed[plan_index, _CALORIES])
+        total_protein = int(consumed[plan_index, _PROTEIN])
+        summary = f"Total: {total_calories} calories, {total_protein}g protein"
+        over = [column for column, total, limit in zip(PLAN_NUTRIENTS, consumed[plan_index], daily_limits)
+                if total > limit]
+        if over:
+            # No recipe left fitted the hard limits: say so rather than hand out the plan silently
+            metrics.increment('limits_broken')
+            summary += f" (over the daily limit for {', '.join(over)})"
+        results.append((meal_plan, summary, total_calories, total_protein))
+    return results
+
+
+def any_recipe(nutrients, budget, rng, used=None):
+    """Random row within ``budget`` (each nutrient's remaining limit), preferring rows not ``used`` yet
+
+    Limits outrank variety: a used row that fits is taken before an unused one
+    that does not. Any row is returned when nothing fits.
+    """
+    fits = within_bounds(nutrients, upper=budget)
+    fresh = ~used if used is not None else np.ones(len(nutrients), dtype=bool)
+    for pool in (fits & fresh, fits, fresh):
+        rows = np.flatnonzero(pool)
+        if len(rows):
+            return int(rng.choice(rows))
+    return int(rng.integers(len(nutrients)))
+
+
+def portioned_recipe(recipe, servings):
+    """Copy of ``recipe`` with its PLAN_NUTRIENTS scaled to ``servings`` servings, recorded in 'Servings'"""
+    values = recipe.to_dict()
+    for column in PLAN_NUTRIENTS:
+        if column in values:
+            values[column] = float(values[column]) * float(servings)
+    values['Servings'] = round(float(servings), 2)
+    return pd.Series(values, name=recipe.name, dtype=object)
+
+
+def sampling_priority(shape, rng, learned=None):
+    """Random priorities whose argmax samples uniformly, or in proportion to ``exp(learned)`` (Gumbel-max)"""
+    if learned is None:
+        return rng.random(shape)
+    return learned[np.newaxis, :] + rng.gumbel(size=shape)
+
+
+def swap_meal(df_filtered, meal_plan, meal, tolerance=0.2, top_k=None, rng=None, preference_model=None,
+              exclude_recipe_ids=None):
+    """A replacement for ``meal_plan[meal]``: same category, calories and protein within ``tolerance``
+    
+    The best-ranked matching recipes not already in the plan form the pool; one
+    is sampled as in ``generate_meal_plans`` (uniformly among ``top_k``, or by
+    the trained ``preference_model`` over a wider pool). A portioned meal (one
+    with ``Servings``) is replaced at its own calories. Returns ``None`` when
+    nothing else fits.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    top_k = top_k or settings.PLAN_TOP_K
+    if preference_model is not None and not preference_model.trained:
+        preference_model = None
+    pool_size = top_k * (settings.PLAN_SCORE_POOL if preference_model is not None else 1)
+    
+    current = meal_plan[meal]
+    nutrients = nutrient_matrix(df_filtered)
+    recipe_ids = df_filtered['RecipeId'].to_numpy()
+    rank_orders = category_rank_orders(df_filtered)
+    taken = [recipe['RecipeId'] for recipe in meal_plan.values()]
+    if exclude_recipe_ids is not None:
+        taken = np.concatenate([taken, exclude_recipe_ids])
+    blocked = np.isin(recipe_ids, taken)
+    center = np.array([current['Calories'], current['ProteinContent']], dtype=np.float32)
+    lower, upper = center * (1 - tolerance), center * (1 + tolerance)
+    
+    def similar(rows):
+        block = nutrients[rows][:, [_CALORIES, _PROTEIN]]
+        return ~blocked[rows] & np.all((block >= lower) & (block <= upper), axis=1)
+    
+    category = current.get('MealCat') or MEAL_CATEGORY_MAP.get(meal)
+    candidates = best_first(rank_orders.get(category, np.empty(0, dtype=np.int64)), similar, pool_size)
+    if len(candidates) == 0:
+        metrics.increment('fallback', reason='swap_any_category')
+        candidates = best_first_across(rank_orders, df_filtered[RANK_SCORE_COLUMN].to_numpy(), similar, pool_size)
+    if len(candidates) == 0:
+        return None
+    learned = preference_model.score(recipe_ids[candidates]) if preference_model is not None else None
+    choice = int(np.argmax(sampling_priority((1, len(candidates)), rng, learned)[0]))
+    metrics.increment('meals_swapped')
+    replacement = df_filtered.iloc[candidates[choice]]
+    if 'Servings' in current.index and replacement['Calories'] > 0:
+        # Portioned plan: serve the replacement at the calories of the meal it replaces
+        return portioned_recipe(replacement, current['Calories'] / replacement['Calories'])
+    return replacement
+
+
+def plan_nutrient_totals(meal_plan):
+    """Sum every PLAN_NUTRIENTS column over the recipes of a plan"""
+    return {
+        column: float(sum(float(recipe.get(column, 0) or 0) for recipe in meal_plan.values()))
+        for column in PLAN_NUTRIENTS
+    }
@@ -0,0 +1,115 @@
+"""Bounded, thread-safe LRU cache with size-based eviction and hit-rate counters.
+
+Entries are charged their approximate in-memory size (``approximate_size``);
+once the total exceeds ``max_bytes`` the least recently used entries are
+evicted. Hits, misses and evictions are always counted on the cache itself (a
+few integer increments under the lock) and are mirrored to ``utils.metrics``
+when instrumentation is enabled.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, TypeVar
+
+from .metrics import metrics
+
+T = TypeVar('T')
+
+_MISSING = object()
+
+
+def approximate_size(value) -> int:
+    """Deep size in bytes of strings, numbers and (nested) containers and dataclasses."""
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, dict):
+        return size + sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return size + sum(approximate_size(item) for item in value)
+    if hasattr(value, '__dict__'):
+        return size + approximate_size(vars(value))
+    return size
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by total approximate size in bytes."""
+
+    def __init__(self, max_bytes: int, name: str = 'cache', max_entries: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.name = name
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        metrics.increment('cache_misses' if entry is None else 'cache_hits', cache=self.name)
+        return default if entry is None else entry[0]
+
+    def put(self, key: Hashable, value, size: Optional[int] = None) -> None:
+        """Insert ``value``; values larger than the whole cache are not stored."""
+        size = approximate_size(value) if size is None else size
+        if size > self.max_bytes:
+            return
+        evicted = 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self._entries and (self.bytes > self.max_bytes or
+                                     (self.max_entries is not None and len(self._entries) > self.max_entries)):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                evicted += 1
+            self.evictions += evicted
+        if evicted:
+            metrics.increment('cache_evictions', evicted, cache=self.name)
+
+    def get_or_build(self, key: Hashable, build: Callable[[], T]) -> T:
+        """Cached value for ``key``, building and storing it on a miss.
+
+        Concurrent misses on the same key may both build; the last one stored wins.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = build()
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
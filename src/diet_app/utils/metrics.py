@@ -0,0 +1,257 @@
+"""Lightweight timing spans and counters for the planning hot path.
+
+Instrumentation is off by default. While disabled, ``span`` hands back a shared
+no-op context manager and ``increment``/``observe`` return immediately, so the
+instrumented code pays roughly one attribute lookup per call.
+"""
+
+import bisect
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds; tuned for interactive latencies from sub-millisecond lookups to slow loads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NULL_SPAN = nullcontext()
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (cumulative buckets on export, like Prometheus)."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside the matching bucket."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count > 0:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+
+class _Span:
+    """Times a block and records it into the registry on exit."""
+
+    __slots__ = ('registry', 'name', 'labels', 'start')
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, labels: Dict[str, str]):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Process-wide store of stage histograms and event counters."""
+
+    def __init__(self, enabled: bool = False, namespace: str = 'diet_app'):
+        self.enabled = enabled
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+
+    def span(self, name: str, **labels):
+        """Context manager timing a stage; a shared no-op when disabled."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, labels)
+
+    def timed(self, name: str):
+        """Decorator form of ``span`` for whole functions."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Span(self, name, {}):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name: str, amount: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def summary(self):
+        """Rows of per-stage latency statistics and counter values for display."""
+        with self._lock:
+            stages = [
+                {
+                    'stage': name,
+                    'labels': _format_labels(labels),
+                    'count': h.count,
+                    'mean_ms': h.sum / h.count * 1000 if h.count else 0.0,
+                    'p50_ms': h.quantile(0.5) * 1000,
+                    'p95_ms': h.quantile(0.95) * 1000,
+                    'p99_ms': h.quantile(0.99) * 1000,
+                }
+                for (name, labels), h in sorted(self._histograms.items())
+            ]
+            counters = [
+                {'counter': name, 'labels': _format_labels(labels), 'value': value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+        return stages, counters
+
+    def render_prometheus(self) -> str:
+        """Dump all metrics in the Prometheus text exposition format."""
+        lines = []
+        stage_metric = f'{self.namespace}_stage_seconds'
+        with self._lock:
+            if self._histograms:
+                lines.append(f'# HELP {stage_metric} Time spent per instrumented stage.')
+                lines.append(f'# TYPE {stage_metric} histogram')
+            for (name, labels), h in sorted(self._histograms.items()):
+                base = (('stage', name),) + labels
+                cumulative = 0
+                for bound, bucket_count in zip(h.buckets, h.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{stage_metric}_bucket{_render_labels(base + (("le", repr(bound)),))} {cumulative}')
+                lines.append(f'{stage_metric}_bucket{_render_labels(base + (("le", "+Inf"),))} {h.count}')
+                lines.append(f'{stage_metric}_sum{_render_labels(base)} {h.sum}')
+                lines.append(f'{stage_metric}_count{_render_labels(base)} {h.count}')
+
+            for name in sorted({name for name, _ in self._counters}):
+                metric = f'{self.namespace}_{name}_total'
+                lines.append(f'# TYPE {metric} counter')
+                for (counter_name, labels), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(f'{metric}{_render_labels(labels)} {value:g}')
+        return '\n'.join(lines) + '\n'
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelKey) -> str:
+    return ', '.join(f'{key}={value}' for key, value in labels)
+
+
+def _render_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = MetricsRegistry(enabled=settings.METRICS_ENABLED)
+
+
+# Returns (ready, details) for GET /ready; processes without a warm-up are always ready
+ReadinessCheck = Callable[[], Tuple[bool, Dict]]
+_readiness_check: ReadinessCheck = lambda: (True, {})
+
+
+def set_readiness_check(check: ReadinessCheck) -> None:
+    """Back ``GET /ready`` with ``check`` (e.g. ``Warmup.probe``)."""
+    global _readiness_check
+    _readiness_check = check
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves ``GET /metrics`` for Prometheus scrapes and ``GET /ready`` for load balancers."""
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/metrics':
+            self._reply(200, metrics.render_prometheus(), 'text/plain; version=0.0.4; charset=utf-8')
+        elif path == '/ready':
+            # 503 until warmed up, so traffic is only routed to warm instances
+            ready, details = _readiness_check()
+            self._reply(200 if ready else 503, json.dumps({'ready': ready, **details}), 'application/json')
+        else:
+            self.send_error(404)
+
+    def _reply(self, status: int, text: str, content_type: str) -> None:
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics endpoint: " + format, *args)
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+# Ports that could not be bound; not retried on every rerun
+_failed_ports: Set[int] = set()
+
+
+def start_metrics_server(port: Optional[int] = None, host: str = '0.0.0.0') -> Optional[ThreadingHTTPServer]:
+    """Start the ``/metrics`` and ``/ready`` endpoints on a daemon thread (idempotent per process)."""
+    global _server
+    port = port if port is not None else settings.METRICS_PORT
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None and port not in _failed_ports:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                # e.g. the port is taken by another process: run on without the exporter
+                _failed_ports.add(port)
+                logger.error(f"Metrics endpoint disabled, cannot listen on {host}:{port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name='metrics-endpoint', daemon=True).start()
+            logger.info(f"Metrics endpoint listening on {host}:{port}/metrics (readiness: /ready)")
+    return _server
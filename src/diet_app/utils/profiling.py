@@ -0,0 +1,273 @@
+"""Opt-in memory accounting for the load, filter, planning and export stages.
+
+When enabled, every stage records its wall time, RSS before/after, the net and
+peak Python allocations seen by ``tracemalloc``, and the call sites that
+allocated the most. Repeated stages (one per request) are aggregated by name.
+A memory budget turns the profile into a regression check: a stage that
+pushes the process' peak RSS over the budget raises ``MemoryBudgetExceeded``.
+
+Disabled (the default), ``stage`` returns a shared no-op context manager, like
+``utils.metrics``. Scripts with a single linear pipeline can call
+``checkpoint(name)`` at the end of each step instead of wrapping blocks.
+
+``tracemalloc`` is process-wide, so with several threads running stages at
+once the per-stage attribution is approximate; RSS figures are always
+process-wide.
+"""
+
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_NULL_STAGE = nullcontext()
+_MB = 1024 ** 2
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    """Raised when a profiled stage pushes peak RSS over the configured budget."""
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process (Linux /proc, falling back to peak RSS)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    """Highest RSS this process has reached so far."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+@dataclass
+class StageStats:
+    """Aggregated measurements of every run of one named stage."""
+
+    name: str
+    calls: int = 0
+    seconds: float = 0.0
+    net_allocated_bytes: int = 0
+    peak_traced_bytes: int = 0
+    rss_growth_bytes: int = 0
+    peak_rss_bytes: int = 0
+    top_sites: Dict[str, int] = field(default_factory=dict)
+
+
+class _Frame:
+    __slots__ = ('name', 'start', 'rss', 'traced', 'snapshot', 'max_peak')
+
+    def __init__(self, name, snapshot):
+        self.name = name
+        self.start = time.perf_counter()
+        self.rss = current_rss_bytes()
+        self.traced = tracemalloc.get_traced_memory()[0]
+        self.snapshot = snapshot
+        self.max_peak = 0
+
+
+class _Stage:
+    __slots__ = ('profiler', 'name')
+
+    def __init__(self, profiler: 'MemoryProfiler', name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler._open(self.name)
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.profiler._close(check_budget=exc_type is None)
+        return False
+
+
+class MemoryProfiler:
+    """Collects per-stage memory statistics and enforces an optional RSS budget."""
+
+    def __init__(self, enabled: bool = False, budget_mb: Optional[float] = None,
+                 top_sites: int = 10, frames: int = 1):
+        self.enabled = False
+        self.budget_mb = budget_mb
+        self.top_sites = top_sites
+        self.frames = frames
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats: Dict[str, StageStats] = {}
+        self._checkpoint: Optional[_Frame] = None
+        if enabled:
+            self.enable(budget_mb)
+
+    def enable(self, budget_mb: Optional[float] = None) -> None:
+        """Start tracing allocations (optionally with a peak-RSS budget in MB)."""
+        if budget_mb is not None:
+            self.budget_mb = budget_mb
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.enabled = True
+        self._checkpoint = self._new_frame('')
+
+    def disable(self) -> None:
+        self.enabled = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    # -- recording ------------------------------------------------------------
+
+    def stage(self, name: str):
+        """Context manager profiling one stage; a shared no-op when disabled."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def profiled(self, name: str):
+        """Decorator form of ``stage`` for whole functions."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with _Stage(self, name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def checkpoint(self, name: str) -> None:
+        """Close the stage running since the previous checkpoint (or enable) under ``name``."""
+        if not self.enabled:
+            return
+        frame, self._checkpoint = self._checkpoint, None
+        frame.name = name
+        self._stack().append(frame)
+        try:
+            self._close(check_budget=True)
+        finally:
+            self._checkpoint = self._new_frame('')
+
+    def _stack(self) -> List[_Frame]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _new_frame(self, name: str) -> _Frame:
+        # Carry the peak so far into every open stage before resetting it for this one
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in self._stack():
+            frame.max_peak = max(frame.max_peak, peak)
+        if self._checkpoint is not None:
+            self._checkpoint.max_peak = max(self._checkpoint.max_peak, peak)
+        tracemalloc.reset_peak()
+        return _Frame(name, self._snapshot())
+
+    def _open(self, name: str) -> None:
+        self._stack().append(self._new_frame(name))
+
+    def _close(self, check_budget: bool) -> None:
+        frame = self._stack().pop()
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, frame.max_peak)
+        for outer in self._stack():
+            outer.max_peak = max(outer.max_peak, peak)
+        rss = current_rss_bytes()
+        peak_rss = max(peak_rss_bytes(), rss)
+        sites = self._top_sites(frame.snapshot)
+
+        with self._lock:
+            stats = self._stats.get(frame.name)
+            if stats is None:
+                stats = self._stats[frame.name] = StageStats(frame.name)
+            stats.calls += 1
+            stats.seconds += time.perf_counter() - frame.start
+            stats.net_allocated_bytes += current - frame.traced
+            stats.peak_traced_bytes = max(stats.peak_traced_bytes, peak)
+            stats.rss_growth_bytes += rss - frame.rss
+            stats.peak_rss_bytes = max(stats.peak_rss_bytes, peak_rss)
+            for site, size in sites.items():
+                stats.top_sites[site] = stats.top_sites.get(site, 0) + size
+
+        if check_budget and self.budget_mb and peak_rss > self.budget_mb * _MB:
+            raise MemoryBudgetExceeded(
+                f"Stage '{frame.name}' pushed peak RSS to {peak_rss / _MB:.0f} MB, "
+                f"over the {self.budget_mb:.0f} MB budget"
+            )
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        # Leave out the profiler's own bookkeeping
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)
+        ])
+
+    def _top_sites(self, before: tracemalloc.Snapshot) -> Dict[str, int]:
+        """Call sites with the largest allocation growth since ``before``."""
+        differences = self._snapshot().compare_to(before, 'lineno')
+        sites = {}
+        for difference in differences[:self.top_sites]:
+            if difference.size_diff <= 0:
+                continue
+            origin = difference.traceback[0]
+            sites[f'{origin.filename}:{origin.lineno}'] = difference.size_diff
+        return sites
+
+    # -- reporting ----------------------------------------------------------------
+
+    def stats(self) -> List[StageStats]:
+        with self._lock:
+            return [StageStats(**asdict(stats)) for stats in self._stats.values()]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def report(self) -> str:
+        """Human-readable per-stage table followed by each stage's top allocation sites."""
+        lines = [
+            f"{'stage':<32} {'calls':>6} {'time s':>8} {'net MB':>8} {'peak py MB':>10} "
+            f"{'ΔRSS MB':>8} {'peak RSS MB':>11}"
+        ]
+        stages = self.stats()
+        for stats in stages:
+            lines.append(
+                f"{stats.name[:32]:<32} {stats.calls:>6} {stats.seconds:>8.2f} "
+                f"{stats.net_allocated_bytes / _MB:>8.1f} {stats.peak_traced_bytes / _MB:>10.1f} "
+                f"{stats.rss_growth_bytes / _MB:>+8.1f} {stats.peak_rss_bytes / _MB:>11.1f}"
+            )
+        if self.budget_mb:
+            lines.append(f"Budget: {self.budget_mb:.0f} MB peak RSS")
+        for stats in stages:
+            if not stats.top_sites:
+                continue
+            lines.append(f"\nTop allocation sites in '{stats.name}' (summed over {stats.calls} call(s)):")
+            for site, size in sorted(stats.top_sites.items(), key=lambda item: -item[1])[:self.top_sites]:
+                lines.append(f"  {size / _MB:>9.2f} MB  {site}")
+        return '\n'.join(lines)
+
+    def write_report(self, path) -> Path:
+        """Write the report as JSON (``.json`` paths) or plain text."""
+        path = Path(path)
+        if path.suffix == '.json':
+            payload = {'budget_mb': self.budget_mb, 'stages': [asdict(stats) for stats in self.stats()]}
+            path.write_text(json.dumps(payload, indent=2))
+        else:
+            path.write_text(self.report() + '\n')
+        logger.info(f"Memory profile written to {path}")
+        return path
+
+
+profiler = MemoryProfiler(enabled=settings.PROFILE_MEMORY, budget_mb=settings.MEMORY_BUDGET_MB or None)
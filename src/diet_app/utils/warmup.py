@@ -0,0 +1,103 @@
+"""Background warm-up of a process's shared state, with a readiness signal.
+
+A fresh process pays for the CSV load and for every lazily built structure
+(indexes, cubes, query bitmaps) on its first request. ``Warmup`` runs a list of
+named steps on a daemon thread at startup instead, recording how long each
+took and which failed, so the first user finds them ready. ``ready`` turns true
+once every step has been attempted and none of the ``required`` ones failed;
+``probe`` reports the same as ``(ready, status)`` for an HTTP readiness check
+(see ``utils.metrics.set_readiness_check``). A step can ``report`` its own
+progress (a loader's ``LoadProgress``, say), so pages waiting on it can draw it.
+"""
+
+import logging
+import dataclasses
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+WarmupStep = Tuple[str, Callable[[], object]]
+
+
+class Warmup:
+    """Runs named steps once, in order, on a background thread."""
+
+    def __init__(self, steps: Sequence[WarmupStep], required: Iterable[str] = ()):
+        self.steps: List[WarmupStep] = list(steps)
+        self.required = set(required)
+        self.current: Optional[str] = None
+        self.progress: Optional[object] = None
+        self.durations: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def ready(self) -> bool:
+        return self.finished and not (self.required & set(self.errors))
+
+    def start(self) -> 'Warmup':
+        """Start the warm-up thread (idempotent)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.run, name='warmup', daemon=True)
+                self._thread.start()
+        return self
+
+    def run(self) -> None:
+        """Run every step in the calling thread; a failing step is logged and skipped."""
+        self.started_at = time.time()
+        for name, step in self.steps:
+            self.current = name
+            self.progress = None
+            start = time.perf_counter()
+            try:
+                with metrics.span('warmup_step', step=name):
+                    step()
+            except Exception as e:
+                logger.exception(f"Warm-up step '{name}' failed")
+                self.errors[name] = f"{type(e).__name__}: {e}"
+                metrics.increment('warmup_failures', step=name)
+            self.durations[name] = time.perf_counter() - start
+        self.current = None
+        self.progress = None
+        self.finished_at = time.time()
+        self._done.set()
+        logger.info(f"Warm-up finished in {self.finished_at - self.started_at:.1f}s"
+                    + (f" ({len(self.errors)} steps failed)" if self.errors else ""))
+
+    def report(self, progress: object) -> None:
+        """Record the running step's latest progress (a dataclass); usable as a loader's progress callback."""
+        self.progress = progress
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the warm-up finished (or ``timeout`` seconds passed); returns ``ready``."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def status(self) -> Dict:
+        progress = self.progress
+        return {
+            'ready': self.ready,
+            'current_step': self.current,
+            'progress': dataclasses.asdict(progress) if progress is not None else None,
+            'steps_done': len(self.durations),
+            'steps_total': len(self.steps),
+            'durations': {name: round(seconds, 3) for name, seconds in self.durations.items()},
+            'errors': dict(self.errors),
+            'elapsed': round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else 0.0,
+        }
+
+    def probe(self) -> Tuple[bool, Dict]:
+        return self.ready, self.status()
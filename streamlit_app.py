@@ -5,6 +5,21 @@ import random
 import re
 import time
 
+from src.diet_app.config.settings import settings
+from src.diet_app.data.loaders import RecipeDataLoader
+from src.diet_app.data.store import PlanStore
+from src.diet_app.data.table import RecipeTable, enable_copy_on_write
+from src.diet_app.models.household import HouseholdMember, generate_household_plan, household_preferences
+from src.diet_app.models.learning import ACCEPT, SWAP, PreferenceModel, RecipeFeatures
+from src.diet_app.models.query import QueryEngine, QuerySyntaxError
+from src.diet_app.models.recommender import (PREFERENCE_FLAGS, filter_by_preferences, generate_meal_plans,
+                                             plan_nutrient_totals, preference_flags, preferences_expression,
+                                             swap_meal)
+from src.diet_app.utils.cache import LRUCache
+from src.diet_app.utils.metrics import metrics, set_readiness_check, start_metrics_server
+from src.diet_app.utils.profiling import profiler
+from src.diet_app.utils.warmup import Warmup
+
 # Set page config
 st.set_page_config(
     page_title="Daily Meal Planner",
@@ -12,56 +27,394 @@ st.set_page_config(
     layout="wide"
 )
 
-@st.cache_data
-def _load_csv_data():
-    return pd.read_csv('data/mvp_recipes_clean.csv')
+# Sessions share read-only tables and write only to copy-on-write views of them (see data.table)
+enable_copy_on_write()
+
+# Optional daily nutrient goals shown in the sidebar: (column, label, unit, session key)
+NUTRIENT_TARGET_INPUTS = [
+    ('FatContent', 'Fat target', 'g', 'target_fat'),
+    ('CarbohydrateContent', 'Carbs target', 'g', 'target_carbs'),
+    ('FiberContent', 'Fiber target', 'g', 'target_fiber'),
+]
+NUTRIENT_LIMIT_INPUTS = [
+    ('SodiumContent', 'Sodium limit', 'mg', 'limit_sodium'),
+    ('SugarContent', 'Sugar limit', 'g', 'limit_sugar'),
+    ('SaturatedFatContent', 'Saturated fat limit', 'g', 'limit_saturated_fat'),
+]
+
+# Sidebar settings remembered in a user's profile
+PROFILE_KEYS = (['target_calories', 'target_protein', 'max_meals', 'tolerance', 'n_plans', 'no_repeat_days',
+                 'flexible_portions']
+                + [key for _, _, _, key in NUTRIENT_TARGET_INPUTS + NUTRIENT_LIMIT_INPUTS])
+
+# Number of most common keywords offered as tag filters
+KEYWORD_FILTER_OPTIONS = 300
+
+# Browse mode: sort options (label -> (column, descending)), page sizes and the lightweight columns shown
+BROWSE_SORTS = {
+    'Best rated': ('RankScore', True),
+    'Fewest calories': ('Calories', False),
+    'Most protein': ('ProteinContent', True),
+    'Least sugar': ('SugarContent', False),
+    'Least sodium': ('SodiumContent', False),
+}
+BROWSE_PAGE_SIZES = [25, 50, 100]
+BROWSE_COLUMNS = {
+    'MealCat': 'Meal type', 'AggregatedRating': 'Rating', 'ReviewCount': 'Reviews', 'Calories': 'Calories',
+    'ProteinContent': 'Protein (g)', 'FatContent': 'Fat (g)', 'CarbohydrateContent': 'Carbs (g)',
+}
+
+# Preference sets primed at startup until the store has saved ones (the form's defaults first)
+_DEFAULT_PREFERENCES = {'calories': 'h', 'protein': 'h', 'preptime': 'q'}
+WARMUP_PREFERENCES = [_DEFAULT_PREFERENCES] + [{**_DEFAULT_PREFERENCES, key: 'y'} for key in PREFERENCE_FLAGS]
+
+def _progress_reporter(progress_bar, status_text, label):
+    """Build a loader callback that drives a Streamlit progress bar from real read progress"""
+    def report(progress):
+        progress_bar.progress(int(progress.fraction * 100))
+        status_text.text(
+            f"{label} {progress.rows_read:,} recipes "
+            f"({progress.bytes_read / 1024**2:.0f} / {progress.total_bytes / 1024**2:.0f} MB, "
+            f"{progress.elapsed:.1f}s)"
+        )
+    return report
+
+def _load_with_progress(load, label, progress=None):
+    """Run a loader, reporting to ``progress`` (the warm-up's) or else to a progress bar of this page"""
+    if progress is not None:
+        return load(progress=progress)
+    # Created inside the cached loaders so Streamlit can replay (and clear) them on cache hits
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    result = load(progress=_progress_reporter(progress_bar, status_text, label))
+    progress_bar.empty()
+    status_text.empty()
+    return result
+
+@st.cache_resource(show_spinner=False)
+def _load_recipe_table(_progress=None):
+    # One read-only table per process; sessions get views of it (see data.table)
+    return RecipeTable(_load_with_progress(RecipeDataLoader().load_filter_columns, '📊 Reading recipe data:',
+                                           _progress))
+
+@st.cache_resource(show_spinner=False)
+def _load_detail_table(_progress=None):
+    # Only the text columns, read on first use (or by the warm-up) so the page never waits for them
+    return RecipeTable(_load_with_progress(RecipeDataLoader().load_detail_columns, '📖 Loading recipe details:',
+                                           _progress))
+
+@st.cache_resource(show_spinner=False)
+def _load_keyword_index():
+    return RecipeDataLoader().load_keyword_index()
+
+def load_keyword_index(df):
+    """Keyword index with rows aligned to the loaded table, or None when unavailable"""
+    try:
+        index = _load_keyword_index()
+        return index.aligned_to(df['RecipeId'].to_numpy()) if index is not None else None
+    except Exception as e:
+        st.warning(f"⚠️ Keyword filters unavailable: {str(e)}")
+        return None
+
+@st.cache_resource(show_spinner=False)
+def _load_query_engine(_df, _keyword_index, n_rows, version):
+    # Underscored arguments are not hashed; row count and dataset version key the engine to the loaded table
+    loader = RecipeDataLoader()
+    ingredient_index = loader.load_ingredient_index()
+    if ingredient_index is not None:
+        ingredient_index = ingredient_index.aligned_to(_df['RecipeId'].to_numpy())
+    return QueryEngine(_df, keyword_index=_keyword_index, ingredient_index=ingredient_index,
+                       statistics=loader.load_metadata())
+
+def load_query_engine(df, keyword_index):
+    """Shared filter engine for the loaded table, so its indexes are built once per process"""
+    try:
+        return _load_query_engine(df, keyword_index, len(df), dataset_version())
+    except Exception as e:
+        st.warning(f"⚠️ Shared filter indexes unavailable, so every filter rebuilds its own and "
+                   f"ingredient: filters are off: {str(e)}")
+        return None
+
+@st.cache_resource(show_spinner=False)
+def _load_cube(_df, n_rows):
+    cube = RecipeDataLoader().load_cube(_df)
+    if cube is not None:
+        cube.stats()  # expand the dense superset table once, at load time
+    return cube
+
+def load_cube(df):
+    """Aggregate cube for O(1) counts and nutrient means per flag combination, or None"""
+    try:
+        return _load_cube(df, len(df))
+    except Exception as e:
+        st.warning(f"⚠️ Aggregate statistics unavailable: {str(e)}")
+        return None
+
+def preference_stats(cube, preferences):
+    """Cube aggregates for the current preferences, or None when keywords/expressions need a real query"""
+    if cube is None or preferences.get('keywords') or preferences.get('expression'):
+        return None
+    return cube.stats(preference_flags(preferences))
+
+def preview_match_count(cube, query_engine, preferences):
+    """Number of recipes the current preferences would match, without building the filtered table"""
+    stats = preference_stats(cube, preferences)
+    if stats is not None:
+        return stats.count
+    if query_engine is None:
+        return None
+    try:
+        return len(query_engine.query(preferences_expression(preferences)))
+    except QuerySyntaxError:
+        return None
+
+@st.cache_resource(show_spinner=False)
+def _load_quantity_table():
+    return RecipeDataLoader().load_quantity_table()
+
+def load_quantity_table():
+    """Parsed ingredient amounts for shopping lists, or None when they were not exported"""
+    try:
+        return _load_quantity_table()
+    except Exception as e:
+        st.warning(f"⚠️ Shopping lists unavailable: {str(e)}")
+        return None
+
+@st.cache_resource(show_spinner=False)
+def load_plan_store():
+    """Process-wide plan history store (None if the database cannot be opened)"""
+    try:
+        return PlanStore()
+    except Exception as e:
+        st.warning(f"⚠️ Plan history unavailable: {str(e)}")
+        return None
+
+def current_user():
+    return (st.session_state.get('user_id') or '').strip() or None
+
+def restore_profile():
+    """Load the saved sidebar settings of the user who just signed in"""
+    store = load_plan_store()
+    user_id = current_user()
+    profile = store.get_profile(user_id) if store is not None and user_id else None
+    for key, value in (profile or {}).items():
+        if key in PROFILE_KEYS:
+            st.session_state[key] = value
+
+def record_served_plans(preferences, plans):
+    """Persist the user's settings, preferences and served plans (queued, written in the background)"""
+    store = load_plan_store()
+    user_id = current_user()
+    if store is None or user_id is None:
+        return
+    store.save_profile(user_id, {key: st.session_state[key] for key in PROFILE_KEYS if key in st.session_state})
+    preference_set_id = store.save_preferences(user_id, preferences)
+    served_at = time.time()
+    for meal_plan, total_cal, total_prot in plans:
+        store.record_plan(user_id, meal_plan, total_cal, total_prot, preference_set_id, served_at)
+    # Kept in the session too: the store only answers for what its writer has committed
+    served = st.session_state.setdefault('served_recipe_ids', [])
+    served.append((user_id, served_at, [int(recipe['RecipeId']) for meal_plan, _, _ in plans
+                                        for recipe in meal_plan.values()]))
+
+def recently_served_recipe_ids():
+    """RecipeIds served to the current user within the no-repeat window, or None"""
+    store = load_plan_store()
+    user_id = current_user()
+    days = st.session_state.get('no_repeat_days', settings.NO_REPEAT_DAYS)
+    if store is None or user_id is None or not days:
+        return None
+    since = time.time() - days * 86400
+    served = [entry for entry in st.session_state.get('served_recipe_ids', []) if entry[1] >= since]
+    st.session_state.served_recipe_ids = served
+    queued = [recipe_id for entry_user, _, recipe_ids in served if entry_user == user_id for recipe_id in recipe_ids]
+    return np.union1d(store.recent_recipe_ids(user_id, days), np.asarray(queued, dtype=np.int64))
+
+@st.cache_resource(show_spinner=False)
+def _load_recipe_features(_df, _keyword_index, n_rows, version):
+    return RecipeFeatures.from_frame(_df, _keyword_index)
+
+def user_preference_model(df, keyword_index):
+    """The current user's online preference model (restored from the store on sign-in), or None"""
+    try:
+        features = _load_recipe_features(df, keyword_index, len(df), dataset_version())
+    except Exception as e:
+        st.warning(f"⚠️ Preference learning unavailable: {str(e)}")
+        return None
+    user_id = current_user()
+    state = st.session_state.get('preference_model')
+    if state is None or state[0] != user_id or state[1].features is not features:
+        store = load_plan_store()
+        try:
+            saved = store.get_preference_model(user_id) if store is not None and user_id else None
+        except Exception as e:
+            st.warning(f"⚠️ Could not restore your preference model, starting fresh: {str(e)}")
+            saved = None
+        state = st.session_state.preference_model = (user_id, PreferenceModel.from_bytes(features, saved))
+    return state[1]
+
+def record_feedback(event, recipe_ids):
+    """One incremental model update from an accept/swap, persisted (queued) for signed-in users"""
+    state = st.session_state.get('preference_model')
+    if state is None:
+        return
+    user_id, model = state
+    model.update(recipe_ids, event)
+    store = load_plan_store()
+    if store is not None and user_id is not None:
+        store.record_feedback(user_id, event, recipe_ids)
+        store.save_preference_model(user_id, model.to_bytes())
+
+def plan_history_panel():
+    """Sidebar list of the current user's latest plans"""
+    store = load_plan_store()
+    user_id = current_user()
+    if store is None or user_id is None:
+        return
+    with st.sidebar.expander("📜 Recent Plans"):
+        history = store.plan_history(user_id, limit=10)
+        if history.empty:
+            st.caption("No plans saved yet.")
+            return
+        plans = (history.groupby('plan_id', sort=False)
+                 .agg(Created=('created_at', 'first'), Calories=('total_calories', 'first'),
+                      Meals=('meal', 'size'))
+                 .reset_index(drop=True))
+        plans['Created'] = pd.to_datetime(plans['Created'], unit='s').dt.strftime('%Y-%m-%d %H:%M')
+        st.dataframe(plans, use_container_width=True, hide_index=True)
+
+def dataset_version():
+    """Version of the dataset file on disk; part of every render cache key"""
+    try:
+        return RecipeDataLoader().dataset_version()
+    except OSError:
+        return None
+
+def await_warmup_step(step, label):
+    """Draw the warm-up's progress while it runs ``step``, instead of blocking on its cached loader"""
+    warmup = start_warmup()
+    if warmup is None or warmup.current != step:
+        return
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    report = _progress_reporter(progress_bar, status_text, label)
+    while warmup.current == step:
+        progress = warmup.progress
+        if progress is not None:
+            report(progress)
+        time.sleep(0.2)
+    progress_bar.empty()
+    status_text.empty()
 
 def load_data():
-    """Load data with simple progress indication"""
+    """View of the shared filtering/planning table (loaded once per process, with real progress indication)"""
     try:
-        if 'data_loaded' not in st.session_state:
-            # Simple progress indication without threading
-            with st.spinner('🔍 Loading recipe database...'):
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                # Show loading messages
-                messages = [
-                    '📊 Reading recipe data...',
-                    '🧹 Processing nutritional information...',
-                    '✅ Validating recipe database...',
-                    '✨ Almost ready...'
-                ]
-                
-                for i, message in enumerate(messages):
-                    status_text.text(message)
-                    progress_bar.progress((i + 1) * 25)
-                    time.sleep(0.2)  # Brief pause for user feedback
-                
-                # Load the data (this is cached by @st.cache_data)
-                df = _load_csv_data()
-                
-                # Final progress
-                status_text.text('✨ Ready to create your meal plan!')
-                progress_bar.progress(100)
-                time.sleep(0.3)
-                
-                # Clean up progress elements
-                progress_bar.empty()
-                status_text.empty()
-                
-                st.session_state.data_loaded = True
-                return df
-        else:
-            # Data already loaded, return from cache
-            return _load_csv_data()
-            
+        await_warmup_step('recipe table', '📊 Reading recipe data:')
+        return _load_recipe_table().frame()
     except FileNotFoundError:
         st.error("📁 Recipe dataset not found. Please ensure 'data/mvp_recipes_clean.csv' exists.")
         return pd.DataFrame()
     except Exception as e:
         st.error(f"❌ Error loading data: {str(e)}")
         return pd.DataFrame()
+
+def load_recipe_details():
+    """View of the shared display-only columns (names, ingredients, instructions), indexed by RecipeId"""
+    try:
+        await_warmup_step('recipe details', '📖 Loading recipe details:')
+        return _load_detail_table().frame()
+    except Exception as e:
+        st.error(f"❌ Error loading recipe details: {str(e)}")
+        return None
+
+def warmup_preferences(store):
+    """Most common saved preference sets (keyword/expression filters included), else the defaults"""
+    saved = store.common_preferences(settings.WARMUP_PROFILES) if store is not None else []
+    return saved or WARMUP_PREFERENCES[:settings.WARMUP_PROFILES]
+
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    """Build the shared table, indexes and caches on a background thread, once per server process
+
+    Steps call the same cached loaders as the pages, so the first session finds
+    them filled. The warm-up thread has no page to draw on, so the loaders report
+    to the warm-up instead, and a session arriving mid-load draws that progress
+    (see await_warmup_step). The warm-up backs the /ready probe of the metrics
+    endpoint.
+    """
+    if not settings.WARMUP_ENABLED:
+        return None
+    state = {}
+
+    def load_table():
+        state['df'] = _load_recipe_table(warmup.report).frame()
+
+    def load_indexes():
+        df = state['df']
+        keyword_index = _load_keyword_index()
+        state['keyword_index'] = keyword_index.aligned_to(df['RecipeId'].to_numpy()) if keyword_index else None
+        state['engine'] = _load_query_engine(df, state['keyword_index'], len(df), dataset_version())
+
+    def load_cube():
+        state['cube'] = _load_cube(state['df'], len(state['df']))
+
+    def prime_filters():
+        for preferences in warmup_preferences(state['store']):
+            try:
+                filter_by_preferences(state['df'], preferences, state['keyword_index'], engine=state['engine'])
+            except QuerySyntaxError:
+                continue
+            preference_stats(state['cube'], preferences)
+
+    warmup = Warmup([
+        ('recipe table', load_table),
+        ('indexes', load_indexes),
+        ('aggregate cube', load_cube),
+        ('recipe features', lambda: _load_recipe_features(state['df'], state['keyword_index'], len(state['df']),
+                                                          dataset_version())),
+        ('plan store', lambda: state.update(store=load_plan_store())),
+        ('common filters', prime_filters),
+        ('shopping quantities', _load_quantity_table),
+        ('recipe details', lambda: _load_detail_table(warmup.report)),
+    ], required=['recipe table'])
+    set_readiness_check(warmup.probe)
+    return warmup.start()
+
+def warmup_indicator(warmup):
+    """Sidebar readiness flag for this server process"""
+    if warmup is None:
+        return
+    status = warmup.status()
+    if not warmup.finished:
+        progress = warmup.progress
+        percent = f" {progress.fraction:.0%}" if progress is not None else ""
+        st.sidebar.caption(f"⏳ Warming up: {status['current_step'] or 'starting'}{percent} "
+                           f"({status['steps_done']}/{status['steps_total']})")
+    elif not warmup.ready:
+        st.sidebar.caption(f"⚠️ Warm-up failed: {', '.join(status['errors'])}")
+    else:
+        st.sidebar.caption(f"✅ Ready (warmed up in {status['elapsed']:.1f}s)")
+
+def collect_nutrient_goals():
+    """Read the optional nutrient targets and hard limits from the sidebar (0 means not set)"""
+    targets = {column: st.session_state[key] for column, _, _, key in NUTRIENT_TARGET_INPUTS
+               if st.session_state.get(key)}
+    limits = {column: st.session_state[key] for column, _, _, key in NUTRIENT_LIMIT_INPUTS
+              if st.session_state.get(key)}
+    return targets, limits
+
+def attach_recipe_details(meal_plan, details):
+    """Merge display columns into the planned recipes"""
+    if details is None:
+        return meal_plan
+    return {
+        meal: pd.concat([recipe, details.loc[recipe['RecipeId']]])
+        for meal, recipe in meal_plan.items()
+    }
+    
+def plan_servings(meal_plan):
+    """Portion multiplier of every planned meal (1 unless the plan was portioned)"""
+    return [float(recipe.get('Servings', 1.0)) for recipe in meal_plan.values()]
     
 def format_time(time_str):
     """Convert PT time format to readable format"""
@@ -193,8 +546,71 @@ def format_ingredients(ingredients_str, quantities_str=None):
     
     return ["Ingredients not available"]
 
+@st.cache_resource(show_spinner=False)
+def render_cache():
+    """Process-wide LRU cache of prepared recipe cards, shared by all sessions"""
+    return LRUCache(settings.RENDER_CACHE_MB * 1024**2, name='recipe_cards')
+
+def build_recipe_card(recipe_data):
+    """Everything a recipe card shows, formatted once: metric values, nutrition lines, ingredients, steps"""
+    rating = recipe_data.get('AggregatedRating', 0)
+    reviews = recipe_data.get('ReviewCount', 0)
+    metric_columns = [
+        [("🔥 Calories", f"{int(recipe_data.get('Calories', 0))}"),
+         ("🧈 Fat", f"{recipe_data.get('FatContent', 0):.1f}g")],
+        [("💪 Protein", f"{int(recipe_data.get('ProteinContent', 0))}g"),
+         ("🍞 Carbs", f"{recipe_data.get('CarbohydrateContent', 0):.1f}g")],
+        [("⭐ Rating", f"{float(rating):.1f}" if rating and not pd.isna(rating) else "N/A"),
+         ("👥 Reviews", f"{int(reviews)}" if reviews and not pd.isna(reviews) else "N/A")],
+        [("⏱️ Cook Time", format_time(recipe_data.get('CookTime', ''))),
+         ("🔪 Prep Time", format_time(recipe_data.get('PrepTime', '')))],
+    ]
+    nutrition_columns = [
+        [f"**Saturated Fat:** {recipe_data.get('SaturatedFatContent', 0):.1f}g",
+         f"**Fiber:** {recipe_data.get('FiberContent', 0):.1f}g"],
+        [f"**Sodium:** {recipe_data.get('SodiumContent', 0):.0f}mg",
+         f"**Sugar:** {recipe_data.get('SugarContent', 0):.1f}g"],
+        [f"**Servings:** {recipe_data.get('RecipeYield', 'Not specified')}",
+         f"**Total Time:** {format_time(recipe_data.get('TotalTime', ''))}"],
+    ]
+    
+    # Check if quantities column exists
+    has_quantities = 'RecipeIngredientQuantities' in recipe_data
+    if has_quantities:
+        ingredients = format_ingredients(
+            recipe_data.get('RecipeIngredientParts', ''),
+            recipe_data.get('RecipeIngredientQuantities', '')
+        )
+    else:
+        ingredients = format_ingredients(recipe_data.get('RecipeIngredientParts', ''))
+    
+    instructions = format_instructions(recipe_data.get('RecipeInstructions', ''))
+    if len(instructions) > 1:
+        instructions = [f"**Step {i}:** {instruction}" for i, instruction in enumerate(instructions, 1)]
+    
+    description = recipe_data.get('Description', '')
+    return {
+        'name': str(recipe_data['Name']),
+        'description': None if pd.isna(description) else str(description),
+        'metric_columns': metric_columns,
+        'nutrition_columns': nutrition_columns,
+        'ingredients': [f"• {ingredient}" for ingredient in ingredients],
+        'has_quantities': has_quantities,
+        'instructions': instructions,
+    }
+
+def recipe_card(recipe_data):
+    """Prepared card for a recipe, from the render cache when it was built before for this dataset and portion"""
+    if 'RecipeId' not in recipe_data:
+        return build_recipe_card(recipe_data)
+    # Portioned recipes carry nutrients scaled to their 'Servings' (rounded to 2 decimals), so a card is per portion
+    servings = recipe_data.get('Servings')
+    key = (dataset_version(), int(recipe_data['RecipeId']), None if servings is None else float(servings))
+    return render_cache().get_or_build(key, lambda: build_recipe_card(recipe_data))
+
 def display_detailed_recipe(recipe_data, meal_name):
     """Display detailed recipe information in a beautiful card format"""
+    card = recipe_card(recipe_data)
     
     # Main recipe card
     with st.container():
@@ -202,94 +618,46 @@ def display_detailed_recipe(recipe_data, meal_name):
         <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
                     padding: 20px; border-radius: 15px; margin: 10px 0; color: white;">
             <h2 style="margin: 0; color: white;">🍽️ {meal_name}</h2>
-            <h3 style="margin: 5px 0; color: #f0f0f0;">{recipe_data['Name']}</h3>
+            <h3 style="margin: 5px 0; color: #f0f0f0;">{card['name']}</h3>
         </div>
         """, unsafe_allow_html=True)
         
         # Description
-        if not pd.isna(recipe_data.get('Description', '')):
-            st.markdown(f"**📝 Description:** {recipe_data['Description']}")
+        if card['description'] is not None:
+            st.markdown(f"**📝 Description:** {card['description']}")
         
         # Main metrics in columns
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("🔥 Calories", f"{int(recipe_data.get('Calories', 0))}")
-            st.metric("🧈 Fat", f"{recipe_data.get('FatContent', 0):.1f}g")
-            
-        with col2:
-            st.metric("💪 Protein", f"{int(recipe_data.get('ProteinContent', 0))}g")
-            st.metric("🍞 Carbs", f"{recipe_data.get('CarbohydrateContent', 0):.1f}g")
-            
-        with col3:
-            rating = recipe_data.get('AggregatedRating', 0)
-            if rating and not pd.isna(rating):
-                st.metric("⭐ Rating", f"{float(rating):.1f}")
-            else:
-                st.metric("⭐ Rating", "N/A")
-            
-            reviews = recipe_data.get('ReviewCount', 0)
-            if reviews and not pd.isna(reviews):
-                st.metric("👥 Reviews", f"{int(reviews)}")
-            else:
-                st.metric("👥 Reviews", "N/A")
-                
-        with col4:
-            st.metric("⏱️ Cook Time", format_time(recipe_data.get('CookTime', '')))
-            st.metric("🔪 Prep Time", format_time(recipe_data.get('PrepTime', '')))
+        for column, metric_pair in zip(st.columns(4), card['metric_columns']):
+            with column:
+                for label, value in metric_pair:
+                    st.metric(label, value)
         
         # Additional nutritional information
         st.markdown("---")
         st.markdown("**🥗 Detailed Nutrition Information**")
         
-        nutr_col1, nutr_col2, nutr_col3 = st.columns(3)
-        
-        with nutr_col1:
-            st.markdown(f"**Saturated Fat:** {recipe_data.get('SaturatedFatContent', 0):.1f}g")
-            st.markdown(f"**Fiber:** {recipe_data.get('FiberContent', 0):.1f}g")
-            
-        with nutr_col2:
-            st.markdown(f"**Sodium:** {recipe_data.get('SodiumContent', 0):.0f}mg")
-            st.markdown(f"**Sugar:** {recipe_data.get('SugarContent', 0):.1f}g")
-            
-        with nutr_col3:
-            yield_info = recipe_data.get('RecipeYield', 'Not specified')
-            st.markdown(f"**Servings:** {yield_info}")
-            total_time = format_time(recipe_data.get('TotalTime', ''))
-            st.markdown(f"**Total Time:** {total_time}")
+        for column, lines in zip(st.columns(3), card['nutrition_columns']):
+            with column:
+                for line in lines:
+                    st.markdown(line)
         
         # Ingredients section
         st.markdown("---")
         st.markdown("**🛒 Ingredients**")
-        
-        # Check if quantities column exists
-        if 'RecipeIngredientQuantities' in recipe_data:
-            ingredients = format_ingredients(
-                recipe_data.get('RecipeIngredientParts', ''),
-                recipe_data.get('RecipeIngredientQuantities', '')
-            )
-        else:
-            # Fallback to ingredients only with a note
-            ingredients = format_ingredients(recipe_data.get('RecipeIngredientParts', ''))
+        if not card['has_quantities']:
             st.markdown("*Note: Ingredient quantities not available in this dataset version*")
         
         # Display ingredients as clean bullet points
-        for ingredient in ingredients:
-            st.markdown(f"• {ingredient}")
+        for ingredient in card['ingredients']:
+            st.markdown(ingredient)
         
         # Instructions section
         st.markdown("---")
         st.markdown("**👩‍🍳 Cooking Instructions**")
-        instructions = format_instructions(recipe_data.get('RecipeInstructions', ''))
-        
-        # Display instructions in a nice format
-        if len(instructions) > 1:
-            for i, instruction in enumerate(instructions, 1):
-                st.markdown(f"**Step {i}:** {instruction}")
-        else:
-            st.markdown(instructions[0])
+        for instruction in card['instructions']:
+            st.markdown(instruction)
 
-def collect_preferences():
+def collect_preferences(keyword_index=None):
     """Collect user dietary preferences using Streamlit widgets"""
     st.subheader("🥗 Dietary Preferences")
     
@@ -325,6 +693,21 @@ def collect_preferences():
             index=0  # default to quick
         )
     
+    keywords = []
+    if keyword_index is not None:
+        # Vocabulary is ordered by frequency, so this offers the most common tags
+        keywords = st.multiselect(
+            "🏷️ Recipe tags (all selected tags required):",
+            options=keyword_index.vocabulary[:KEYWORD_FILTER_OPTIONS]
+        )
+    
+    expression = st.text_input(
+        "🔎 Advanced filter (optional):",
+        placeholder="Vegan AND Calories < 500 AND NOT ingredient:peanut",
+        help="Combine flags, nutrient comparisons, keyword:\"...\", ingredient:... and category:... "
+             "with AND, OR, NOT and parentheses."
+    )
+    
     return {
         'vegetarian': 'y' if vegetarian else 'n',
         'vegan': 'y' if vegan else 'n',
@@ -334,225 +717,61 @@ def collect_preferences():
         'dairyfree': 'y' if dairyfree else 'n',
         'calories': calories[0],  # first letter
         'protein': protein[0],
-        'preptime': preptime[0]
+        'preptime': preptime[0],
+        'keywords': keywords,
+        'expression': expression.strip()
     }
 
-def filter_by_preferences(dataframe, preferences):
-    """Filter dataframe based on user preferences - enhanced version from first script"""
-    df_filtered = dataframe.copy()
-    
-    if preferences.get('vegetarian') == 'y':
-        df_filtered = df_filtered[df_filtered['Vegetarian']==1]
-        
-    if preferences.get('vegan') == 'y':
-        df_filtered = df_filtered[df_filtered['Vegan']==1]
-        
-    if preferences.get('pescatarian') == 'y':
-        df_filtered = df_filtered[df_filtered['Pescatarian']==1]
-        
-    if preferences.get('easy') == 'y':
-        df_filtered = df_filtered[df_filtered['Easy']==1]
-        
-    if preferences.get('glutenfree') == 'y':
-        df_filtered = df_filtered[df_filtered['GlutenFree']==1]
-        
-    if preferences.get('dairyfree') == 'y':
-        df_filtered = df_filtered[df_filtered['DairyFree']==1]
-        
-    if preferences.get('calories') == 'l':
-        df_filtered = df_filtered[df_filtered['LowCalorie']==1]
-    elif preferences.get('calories') == 'm':
-        df_filtered = df_filtered[df_filtered['ModerateCalorie']==1]
-    elif preferences.get('calories') == 'h':
-        df_filtered = df_filtered[df_filtered['HighCalorie']==1]
-        
-    if preferences.get('protein') == 'l':
-        df_filtered = df_filtered[df_filtered['LowProtein']==1]
-    elif preferences.get('protein') == 'm':
-        df_filtered = df_filtered[df_filtered['ModerateProtein']==1]    
-    elif preferences.get('protein') == 'h':
-        df_filtered = df_filtered[df_filtered['HighProtein']==1]
-        
-    if preferences.get('preptime') == 'q':
-        df_filtered = df_filtered[df_filtered['Quick']==1]
-    elif preferences.get('preptime') == 's':
-        df_filtered = df_filtered[df_filtered['StandardPrepTime']==1]
-    elif preferences.get('preptime') == 'l':
-        df_filtered = df_filtered[df_filtered['LongPrepTime']==1]
-        
-    return df_filtered.reset_index(drop=True)
-
-def generate_meal_names(count=3):
-    """Generate appropriate meal names based on count"""
-    base_names = ["Breakfast", "Lunch", "Dinner"]
-    
-    if count <= 3:
-        return base_names[:count]
-    elif count == 4:
-        return ["Breakfast", "Lunch", "Snack", "Dinner"]
-    elif count == 5:
-        return ["Breakfast", "Mid-Morning", "Lunch", "Afternoon Snack", "Dinner"]
-    elif count == 6:
-        return ["Breakfast", "Mid-Morning", "Lunch", "Afternoon Snack", "Dinner", "Evening Snack"]
-    else:
-        return [f"Meal {i+1}" for i in range(count)]
-
-def optimal_weights_per_meal(count=3):
-    """Give appropriate weight to each meal during the day, to assign appropriate amount of calories/protein to each of them"""
-    # Defining weights for every possible named meal (see function above)
-    meal_weights = {
-        "Breakfast": 3, "Lunch": 4, "Dinner": 4, 
-        "Mid-Morning": 2, "Afternoon Snack": 2, 
-        "Evening Snack": 2, "Snack": 2, "Default": 3
-    } 
-    
-    meal_slots = generate_meal_names(count)
-    meal_plan_weights = {meal: None for meal in meal_slots}
-    
-    for meal in meal_plan_weights:
-        if meal in meal_weights:  # this should somehow get the key and not the value
-            meal_plan_weights[meal] = meal_weights[meal] 
-        else:
-            meal_plan_weights[meal] = meal_weights["Default"]
-    
-    # calculate the total sum of points
-    total_weight = sum(meal_plan_weights.values())
-    for meal in meal_plan_weights:
-        meal_plan_weights[meal] = round(meal_plan_weights[meal] / total_weight, 2)  # possibly remove the rounding if I feel like it will make it simpler
-    
-    return meal_plan_weights
-
-def number_of_meals(df_filtered, target_calories=2500, target_protein=120, max_meals=6):
-    """Estimate optimal number of meals for given goals"""
-    if df_filtered.empty:
-        return ["Breakfast", "Lunch", "Dinner"]
-    
-    avg_calories = df_filtered["Calories"].mean()
-    avg_protein = df_filtered["ProteinContent"].mean()
-    
-    estimated_meals_by_cal = min(max_meals, max(2, int(target_calories // (avg_calories * 0.8))))
-    estimated_meals_by_protein = min(max_meals, max(2, int(target_protein // (avg_protein * 0.8))))
-    
-    optimal_meals = max(estimated_meals_by_cal, estimated_meals_by_protein)
-    
-    return generate_meal_names(optimal_meals)
-
-def generate_daily_meal_plan(df_filtered, target_calories=2500, target_protein=120, tolerance=0.2, max_meals=6):
-    """Generate a daily meal plan from filtered recipes - enhanced version with adaptive targeting and meal categorization"""
-    
-    if df_filtered.empty:
-        return None, "No recipes available with your current filters!", 0, 0
-    
-    # Get meal slots and initialize plan
-    meal_slots = number_of_meals(df_filtered, target_calories, target_protein, max_meals)
-    meal_plan = {}
-    
-    # Calculate targets per meal using optimal weights
-    weights = optimal_weights_per_meal(len(meal_slots))
-    calories_per_meal = {meal: weights[meal] * target_calories for meal in meal_slots}
-    protein_per_meal = {meal: weights[meal] * target_protein for meal in meal_slots}
-    
-    # Initialize totals
-    total_calories = 0
-    total_protein = 0
-    
-    # Meal category mapping for better recipe selection
-    meal_category_map = {
-        "Lunch": "Lunch/Dinner",
-        "Dinner": "Lunch/Dinner", 
-        "Snack": "Snacks",
-        "Mid-Morning": "Snacks",
-        "Afternoon Snack": "Snacks",
-        "Evening Snack": "Snacks",
-        "Breakfast": "Breakfast"
-    }
-    
-    for meal in meal_slots:
-        #Filtering the dataframe for a list of meals that fulfill our criteria, +- standard deviation
-        # Calculate remaining targets
-        remaining_meals = len([m for m in meal_slots if m not in meal_plan])
-        remaining_calories = target_calories - total_calories
-        remaining_protein = target_protein - total_protein
-        
-        # Flexible targets for this meal
-        target_cal = calories_per_meal[meal]
-        target_prot = protein_per_meal[meal]
-        
-        # Find suitable recipes with wider tolerance
-        df_suitable = df_filtered.loc[
-            (df_filtered['Calories'] >= target_cal * (1 - tolerance)) &
-            (df_filtered['Calories'] <= target_cal * (1 + tolerance)) &
-            (df_filtered['ProteinContent'] >= target_prot * (1 - tolerance)) & 
-            (df_filtered['ProteinContent'] <= target_prot * (1 + tolerance))
-        ]
-        
-        meal_category_map = {
-            "Lunch": "Lunch/Dinner",
-            "Dinner": "Lunch/Dinner", 
-            "Snack": "Snacks",
-            "Breakfast": "Breakfast"
-        }
-        
-        if meal in meal_category_map:
-            df_suitable = df_suitable.loc[df_suitable["MealCat"] == meal_category_map[meal]]
-        
-        if len(df_suitable) == 0:
-            # Fallback: try without meal category restriction
-            df_suitable = df_filtered.loc[
-                (df_filtered['Calories'] >= target_cal * (1 - tolerance)) &
-                (df_filtered['Calories'] <= target_cal * (1 + tolerance)) &
-                (df_filtered['ProteinContent'] >= target_prot * (1 - tolerance)) & 
-                (df_filtered['ProteinContent'] <= target_prot * (1 + tolerance))
-            ]
-            
-            if len(df_suitable) == 0:
-                # Last resort: pick any recipe from filtered set
-                if len(df_filtered) > 0:
-                    selected_recipe = df_filtered.sample(n=1).iloc[0]
-                else:
-                    continue
-            else:
-                # Select highest rated recipe from suitable options
-                if 'AggregatedRating' in df_suitable.columns and not df_suitable['AggregatedRating'].isna().all():
-                    max_rating = df_suitable['AggregatedRating'].max()
-                    top_rated = df_suitable[df_suitable['AggregatedRating'] == max_rating]
-                    if len(top_rated) > 0:
-                        selected_recipe = top_rated.sample(n=1).iloc[0]
-                    elif len(df_suitable) > 0:
-                        selected_recipe = df_suitable.sample(n=1).iloc[0]
-                    else:
-                        continue
-                else:
-                    if len(df_suitable) > 0:
-                        selected_recipe = df_suitable.sample(n=1).iloc[0]
-                    else:
-                        continue
+def metrics_debug_panel():
+    """Show stage latency histograms and fallback counters (only when instrumentation is enabled)"""
+    if not metrics.enabled:
+        return
+    
+    with st.sidebar.expander("🛠️ Debug: Performance Metrics"):
+        stages, counters = metrics.summary()
+        if stages:
+            st.markdown("**⏱️ Stage latency**")
+            st.dataframe(pd.DataFrame(stages).round(2), use_container_width=True, hide_index=True)
         else:
-            # Select highest rated recipe from suitable options
-            if 'AggregatedRating' in df_suitable.columns and not df_suitable['AggregatedRating'].isna().all():
-                max_rating = df_suitable['AggregatedRating'].max()
-                top_rated = df_suitable[df_suitable['AggregatedRating'] == max_rating]
-                if len(top_rated) > 0:
-                    selected_recipe = top_rated.sample(n=1).iloc[0]
-                elif len(df_suitable) > 0:
-                    selected_recipe = df_suitable.sample(n=1).iloc[0]
-                else:
-                    continue
-            else:
-                if len(df_suitable) > 0:
-                    selected_recipe = df_suitable.sample(n=1).iloc[0]
-                else:
-                    continue
+            st.markdown("*No timings recorded yet*")
         
-        # Add to meal plan with full recipe data
-        meal_plan[meal] = selected_recipe
+        if counters:
+            st.markdown("**🔢 Counters**")
+            st.dataframe(pd.DataFrame(counters), use_container_width=True, hide_index=True)
+            slots = sum(c['value'] for c in counters if c['counter'] == 'slots_planned')
+            fallbacks = sum(c['value'] for c in counters if c['counter'] == 'fallback')
+            if slots:
+                st.markdown(f"**Fallback rate:** {fallbacks / slots * 100:.1f}% of meal slots")
         
-        # Update totals
-        total_calories += int(selected_recipe["Calories"])
-        total_protein += int(selected_recipe["ProteinContent"])
-    
-    summary = f"Total: {total_calories} calories, {total_protein}g protein"
-    return meal_plan, summary, total_calories, total_protein
+        cache_stats = render_cache().stats()
+        st.markdown(f"**🗂️ Recipe card cache:** {cache_stats['entries']} cards, "
+                    f"{cache_stats['bytes'] / 1024**2:.1f}/{cache_stats['max_bytes'] / 1024**2:.0f} MB, "
+                    f"hit rate {cache_stats['hit_rate'] * 100:.0f}%, {cache_stats['evictions']} evictions")
+        
+        prometheus_text = metrics.render_prometheus()
+        st.download_button("⬇️ Prometheus dump", prometheus_text, file_name="metrics.prom", mime="text/plain")
+        if st.button("♻️ Reset metrics"):
+            metrics.reset()
+
+def memory_debug_panel():
+    """Show per-stage memory use and top allocation sites (only when DIET_APP_PROFILE_MEMORY is set)"""
+    if not profiler.enabled:
+        return
+    
+    with st.sidebar.expander("🧠 Debug: Memory Profile"):
+        stages = profiler.stats()
+        if not stages:
+            st.markdown("*No stages profiled yet*")
+            return
+        st.dataframe(pd.DataFrame([{
+            'stage': stats.name, 'calls': stats.calls,
+            'net MB': stats.net_allocated_bytes / 1024**2, 'peak py MB': stats.peak_traced_bytes / 1024**2,
+            'ΔRSS MB': stats.rss_growth_bytes / 1024**2, 'peak RSS MB': stats.peak_rss_bytes / 1024**2,
+        } for stats in stages]).round(1), use_container_width=True, hide_index=True)
+        st.download_button("⬇️ Memory report", profiler.report(), file_name=settings.MEMORY_REPORT_FILE,
+                           mime="text/plain")
+        if st.button("♻️ Reset memory profile"):
+            profiler.reset()
 
 # Main Streamlit App
 def about_page():
@@ -675,12 +894,423 @@ def about_page():
     st.markdown("---")
     st.markdown("*Built with ❤️ using Python and Streamlit*")
 
+def format_shopping_list(shopping):
+    """Shopping list rows with readable quantities"""
+    def quantity(row):
+        if pd.isna(row['Amount']):
+            return "as needed"
+        amount = row['Amount']
+        if row['Unit'] == 'g' and amount >= 1000:
+            return f"{amount / 1000:.2f} kg"
+        if row['Unit'] == 'ml' and amount >= 1000:
+            return f"{amount / 1000:.2f} l"
+        if row['Unit'] in ('g', 'ml'):
+            return f"{amount:.0f} {row['Unit']}"
+        if row['Unit']:
+            return f"{round(amount, 2):g} {row['Unit']}{'s' if amount > 1 else ''}"
+        return f"{round(amount, 2):g}"
+    
+    return pd.DataFrame({
+        'Ingredient': shopping['Ingredient'],
+        'Quantity': shopping.apply(quantity, axis=1) if not shopping.empty else [],
+        'Used in': shopping['Recipes'].map(lambda n: f"{n} recipe{'s' if n > 1 else ''}"),
+    })
+
+def display_shopping_list(shopping_table, recipe_ids, title="🛒 Shopping List", multipliers=None):
+    """Aggregated ingredient list for the given recipes (each optionally scaled by a batch multiplier)"""
+    if shopping_table is None:
+        return
+    with st.expander(title):
+        shopping = shopping_table.shopping_list(recipe_ids, multipliers)
+        if shopping.empty:
+            st.markdown("No ingredient quantities available for these recipes.")
+        else:
+            st.dataframe(format_shopping_list(shopping), use_container_width=True, hide_index=True)
+
+def display_plan_overview(meal_plan, total_cal, total_prot, target_calories, target_protein,
+                          nutrient_targets, nutrient_limits, plan_index=None):
+    """Compact overview of one meal plan with goal tracking (and keep/swap buttons when ``plan_index`` is given)"""
+    st.subheader("📋 Meal Plan Overview")
+    
+    # Display meal plan in enhanced cards
+    for meal_name, recipe_data in meal_plan.items():
+        with st.container():
+            col1, col2, col3, col4, col5 = st.columns([3, 1, 1, 1, 1])
+            with col1:
+                servings = recipe_data.get('Servings')
+                portion = f" × {servings:g} servings" if servings is not None and not pd.isna(servings) else ""
+                st.markdown(f"**{meal_name}:** {recipe_data['Name']}{portion}")
+            with col2:
+                st.markdown(f"🔥 {int(recipe_data['Calories'])} cal")
+            with col3:
+                st.markdown(f"💪 {int(recipe_data['ProteinContent'])}g protein")
+            with col4:
+                rating = recipe_data.get('AggregatedRating', 0)
+                if rating and not pd.isna(rating):
+                    st.markdown(f"⭐ {float(rating):.1f}")
+                else:
+                    st.markdown("⭐ N/A")
+            if plan_index is not None:
+                with col5:
+                    keep_col, swap_col = st.columns(2)
+                    keep_col.button("👍", key=f"keep_{plan_index}_{meal_name}", help="Keep: plan more meals like this",
+                                    on_click=record_feedback, args=(ACCEPT, [recipe_data['RecipeId']]))
+                    if swap_col.button("🔁", key=f"swap_{plan_index}_{meal_name}",
+                                       help="Swap for a similar meal: plan fewer like this"):
+                        # Swapping needs the table, which the controls fragment holds
+                        st.session_state.swap_request = (plan_index, meal_name)
+                        st.rerun()
+    
+    st.markdown("---")
+    
+    # Enhanced summary with goal tracking
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(f"**📊 Daily Totals:**")
+        st.markdown(f"🔥 **Calories:** {total_cal} / {target_calories} ({total_cal/target_calories*100:.1f}%)")
+        st.markdown(f"💪 **Protein:** {total_prot}g / {target_protein}g ({total_prot/target_protein*100:.1f}%)")
+        nutrient_totals = plan_nutrient_totals(meal_plan)
+        for column, label, unit, _ in NUTRIENT_TARGET_INPUTS + NUTRIENT_LIMIT_INPUTS:
+            goal = nutrient_targets.get(column) or nutrient_limits.get(column)
+            if goal:
+                st.markdown(f"**{label.rsplit(' ', 1)[0]}:** {nutrient_totals[column]:.0f}{unit} / {goal}{unit}")
+    
+    with col2:
+        st.markdown("**🎯 Goal Achievement:**")
+        cal_status = "✅" if abs(total_cal - target_calories) <= target_calories * 0.1 else "⚠️"
+        prot_status = "✅" if abs(total_prot - target_protein) <= target_protein * 0.1 else "⚠️"
+        st.markdown(f"{cal_status} Calorie target")
+        st.markdown(f"{prot_status} Protein target")
+        for column, label, _, _ in NUTRIENT_TARGET_INPUTS:
+            if column in nutrient_targets:
+                goal = nutrient_targets[column]
+                status = "✅" if abs(nutrient_totals[column] - goal) <= goal * 0.1 else "⚠️"
+                st.markdown(f"{status} {label}")
+        for column, label, _, _ in NUTRIENT_LIMIT_INPUTS:
+            if column in nutrient_limits:
+                status = "✅" if nutrient_totals[column] <= nutrient_limits[column] else "⚠️"
+                st.markdown(f"{status} {label}")
+    
+    over = [label.lower() for column, label, _, _ in NUTRIENT_LIMIT_INPUTS
+            if column in nutrient_limits and nutrient_totals[column] > nutrient_limits[column]]
+    if over:
+        st.warning(f"⚠️ No matching recipe fitted within your {', '.join(over)}: this plan goes over it. "
+                   f"Try relaxing your filters or limits.")
+
+def display_plan_analytics(meal_plan, total_prot):
+    """Per-meal analytics table with nutrition and time summaries"""
+    # Create analytics dataframe
+    analytics_data = []
+    for meal_name, recipe_data in meal_plan.items():
+        analytics_data.append({
+            'Meal': meal_name,
+            'Calories': int(recipe_data['Calories']),
+            'Protein': int(recipe_data['ProteinContent']),
+            'Fat': float(recipe_data.get('FatContent', 0)),
+            'Carbs': float(recipe_data.get('CarbohydrateContent', 0)),
+            'Prep Time': format_time(recipe_data.get('PrepTime', '')),
+            'Cook Time': format_time(recipe_data.get('CookTime', '')),
+            'Rating': float(recipe_data.get('AggregatedRating', 0)) if recipe_data.get('AggregatedRating') and not pd.isna(recipe_data.get('AggregatedRating')) else 0
+        })
+    
+    analytics_df = pd.DataFrame(analytics_data)
+    st.dataframe(analytics_df, use_container_width=True)
+    
+    # Nutrition breakdown
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**🥗 Nutrition Breakdown**")
+        total_fat = analytics_df['Fat'].sum()
+        total_carbs = analytics_df['Carbs'].sum()
+        st.markdown(f"**Total Fat:** {total_fat:.1f}g")
+        st.markdown(f"**Total Carbs:** {total_carbs:.1f}g")
+        st.markdown(f"**Total Protein:** {total_prot}g")
+    
+    with col2:
+        st.markdown("**⏱️ Time Summary**")
+        st.markdown("**Estimated prep time varies by recipe**")
+        st.markdown("**Check individual recipes for exact times**")
+
+def plan_labels(plans):
+    return [f"🍽️ Plan {i + 1} ({total_cal} cal)" for i, (_, total_cal, _) in enumerate(plans)]
+
+# The planner page is split into fragments: interacting with a widget inside one
+# reruns only that fragment, not the whole script. Generated plans live in
+# st.session_state['plan_result'] so the plan fragments can redraw on their own.
+
+@st.fragment
+def planner_controls(df, cube, keyword_index, query_engine, preference_model=None):
+    """Preferences, live match count, plan generation and meal swaps"""
+    swap = st.session_state.pop('swap_request', None)
+    if swap is not None:
+        swap_planned_meal(df, keyword_index, query_engine, preference_model, *swap)
+    
+    preferences = collect_preferences(keyword_index)
+    
+    # Show current filter summary
+    active_filters = []
+    for key, value in preferences.items():
+        if value == 'y':
+            active_filters.append(key.capitalize())
+        elif key in ['calories', 'protein', 'preptime'] and value != 'm':
+            filter_map = {'l': 'Low', 'h': 'High', 'q': 'Quick', 's': 'Standard'}
+            active_filters.append(f"{key.capitalize()}: {filter_map.get(value, value)}")
+        elif key == 'keywords' and value:
+            active_filters.append(f"Tags: {', '.join(value)}")
+        elif key == 'expression' and value:
+            active_filters.append(f"Expression: {value}")
+    
+    if active_filters:
+        st.info(f"**Active filters:** {', '.join(active_filters)}")
+    
+    match_count = preview_match_count(cube, query_engine, preferences)
+    if match_count is not None:
+        st.caption(f"🔢 {match_count:,} recipes match these preferences")
+    
+    # Generate meal plan button ("Generate New Plan" below the plan asks for the same)
+    regenerate = st.session_state.pop('regenerate_plan', False)
+    if st.button("🎯 Generate My Meal Plan", type="primary") or regenerate:
+        with st.spinner("Creating your personalized meal plan..."):
+            result = generate_plan_result(df, cube, keyword_index, query_engine, preferences, preference_model)
+        if result is not None:
+            st.session_state.plan_result = result
+            # Plan fragments sit outside this one: redraw the page once with the new plan
+            st.rerun()
+
+def generate_plan_result(df, cube, keyword_index, query_engine, preferences, preference_model=None):
+    """Filter, plan and record; returns the state the plan fragments render, or None after an error"""
+    # Get sidebar values
+    target_calories = st.session_state.get('target_calories', 2500)
+    target_protein = st.session_state.get('target_protein', 120)
+    tolerance = st.session_state.get('tolerance', 0.2)
+    max_meals = st.session_state.get('max_meals', 4)
+    n_plans = st.session_state.get('n_plans', 1)
+    portions = st.session_state.get('flexible_portions', False)
+    nutrient_targets, nutrient_limits = collect_nutrient_goals()
+    
+    # Filter recipes
+    try:
+        df_filtered = filter_by_preferences(df, preferences, keyword_index, engine=query_engine)
+    except QuerySyntaxError as e:
+        st.error(f"❌ Invalid filter expression: {str(e)}")
+        return None
+    
+    if df_filtered.empty:
+        st.error("❌ No recipes match your criteria. Try adjusting your preferences!")
+        return None
+    
+    # Generate meal plan(s): alternatives share one candidate search per slot
+    stats = preference_stats(cube, preferences)
+    plans = generate_meal_plans(
+        df_filtered, n_plans, target_calories, target_protein, tolerance=tolerance, max_meals=max_meals,
+        nutrient_targets=nutrient_targets, nutrient_limits=nutrient_limits,
+        nutrient_means=stats.means if stats is not None else None,
+        exclude_recipe_ids=recently_served_recipe_ids(), preference_model=preference_model, portions=portions
+    )
+    
+    plans = [plan for plan in plans if plan[0]]
+    if not plans:
+        st.error("❌ Could not generate meal plan. Try adjusting your preferences!")
+        return None
+    
+    record_served_plans(preferences, [(meal_plan, total_cal, total_prot)
+                                      for meal_plan, _, total_cal, total_prot in plans])
+    details = load_recipe_details()
+    return {
+        'matches': len(df_filtered),
+        'plans': [(attach_recipe_details(meal_plan, details), total_cal, total_prot)
+                  for meal_plan, _, total_cal, total_prot in plans],
+        'goals': (target_calories, target_protein, nutrient_targets, nutrient_limits),
+        'preferences': preferences,
+    }
+
+def swap_planned_meal(df, keyword_index, query_engine, preference_model, plan_index, meal):
+    """Learn from the swap, then replace one meal of the current plan with a similar recipe"""
+    result = st.session_state.get('plan_result')
+    if result is None or plan_index >= len(result['plans']) or meal not in result['plans'][plan_index][0]:
+        return
+    meal_plan = dict(result['plans'][plan_index][0])
+    record_feedback(SWAP, [meal_plan[meal]['RecipeId']])
+    
+    df_filtered = filter_by_preferences(df, result['preferences'], keyword_index, engine=query_engine)
+    # Keep the alternatives disjoint and respect the no-repeat window
+    exclude = [recipe['RecipeId'] for plan, _, _ in result['plans'] for recipe in plan.values()]
+    recent = recently_served_recipe_ids()
+    if recent is not None:
+        exclude = np.concatenate([exclude, recent])
+    replacement = swap_meal(df_filtered, meal_plan, meal, tolerance=st.session_state.get('tolerance', 0.2),
+                            preference_model=preference_model, exclude_recipe_ids=exclude)
+    if replacement is None:
+        st.warning(f"⚠️ No similar alternative for {meal}; try relaxing your preferences")
+        return
+    
+    meal_plan[meal] = attach_recipe_details({meal: replacement}, load_recipe_details())[meal]
+    totals = plan_nutrient_totals(meal_plan)
+    result['plans'][plan_index] = (meal_plan, int(totals['Calories']), int(totals['ProteinContent']))
+
+@st.fragment
+def plan_overview():
+    """Overview, goal tracking and shopping lists of the current plan(s)"""
+    result = st.session_state.get('plan_result')
+    if result is None:
+        return
+    plans = result['plans']
+    shopping_table = load_quantity_table()
+    show_compact = st.session_state.get('show_compact', True)
+    st.success(f"✅ Found {result['matches']} recipes matching your preferences!")
+    
+    with metrics.span('render_plan', section='overview'):
+        # Side-by-side alternatives, all built from the same candidate search
+        containers = [st.container()] if len(plans) == 1 else st.tabs(plan_labels(plans))
+        for plan_index, (container, (meal_plan, total_cal, total_prot)) in enumerate(zip(containers, plans)):
+            with container:
+                if show_compact:
+                    display_plan_overview(meal_plan, total_cal, total_prot, *result['goals'], plan_index=plan_index)
+                display_shopping_list(shopping_table, [recipe['RecipeId'] for recipe in meal_plan.values()],
+                                      multipliers=plan_servings(meal_plan))
+        if len(plans) > 1:
+            display_shopping_list(
+                shopping_table,
+                [recipe['RecipeId'] for meal_plan, _, _ in plans for recipe in meal_plan.values()],
+                title="🛒 Combined Shopping List (all plans)",
+                multipliers=[serving for meal_plan, _, _ in plans for serving in plan_servings(meal_plan)]
+            )
+
+@st.fragment
+def plan_details():
+    """Detailed recipe cards; switching between alternative plans reruns only this fragment"""
+    result = st.session_state.get('plan_result')
+    if result is None or not st.session_state.get('show_detailed', True):
+        return
+    plans = result['plans']
+    
+    st.markdown("---")
+    st.subheader("🍽️ Detailed Recipe Information")
+    selected = 0
+    if len(plans) > 1:
+        labels = plan_labels(plans)
+        selected = labels.index(st.radio("Show recipes for:", labels, horizontal=True))
+    
+    with metrics.span('render_plan', section='details'):
+        for meal_name, recipe_data in plans[selected][0].items():
+            display_detailed_recipe(recipe_data, meal_name)
+            st.markdown("---")
+
+def toggle_analytics():
+    st.session_state.show_analytics = not st.session_state.get('show_analytics', False)
+
+@st.fragment
+def plan_actions():
+    """Regenerate and analytics buttons; toggling analytics leaves the recipe cards alone"""
+    result = st.session_state.get('plan_result')
+    if result is None:
+        return
+    
+    # Action buttons
+    st.markdown("---")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("🔄 Generate New Plan"):
+            st.session_state.regenerate_plan = True
+            st.rerun()
+    with col2:
+        showing = st.session_state.get('show_analytics', False)
+        st.button("🙈 Hide Meal Analytics" if showing else "📊 Show Meal Analytics",
+                  on_click=toggle_analytics)
+    
+    # Show meal analytics if requested
+    if st.session_state.get('show_analytics', False):
+        st.subheader("📊 Meal Plan Analytics")
+        plans = result['plans']
+        containers = [st.container()] if len(plans) == 1 else st.tabs(plan_labels(plans))
+        for container, (meal_plan, _, total_prot) in zip(containers, plans):
+            with container:
+                display_plan_analytics(meal_plan, total_prot)
+
+def _browse_next(cursor):
+    st.session_state.browse_cursors.append(cursor)
+
+def _browse_previous():
+    st.session_state.browse_cursors.pop()
+
+def browse_page():
+    """Explore the catalogue one page at a time (keyset pagination over the query engine's sort indexes)"""
+    st.title("🔎 Browse Recipes")
+    st.markdown("Filter and sort the whole catalogue - only the page on screen is fetched.")
+    
+    df = load_data()
+    if df.empty:
+        st.stop()
+    keyword_index = load_keyword_index(df)
+    query_engine = load_query_engine(df, keyword_index)
+    if query_engine is None:
+        st.error("❌ Browsing needs the query engine, which could not be built.")
+        return
+    
+    col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
+    with col1:
+        expression = st.text_input(
+            "🔎 Filter:",
+            key="browse_expression",
+            placeholder="Vegetarian AND Calories < 500 AND ingredient:mushroom",
+            help="Same syntax as the planner's advanced filter. Leave empty to browse everything."
+        )
+    with col2:
+        category = st.selectbox("Meal type:", ['All', 'Breakfast', 'Lunch/Dinner', 'Snacks'], key="browse_category")
+    with col3:
+        sort = st.selectbox("Sort by:", list(BROWSE_SORTS), key="browse_sort")
+    with col4:
+        page_size = st.selectbox("Per page:", BROWSE_PAGE_SIZES, key="browse_page_size")
+    
+    predicates = [f"({expression.strip()})"] if expression.strip() else []
+    if category != 'All':
+        predicates.append(f'category:"{category}"')
+    query = ' AND '.join(predicates)
+    
+    # Cursors of every page visited for the current query, so "Previous" is a pop
+    if st.session_state.get('browse_key') != (query, sort, page_size):
+        st.session_state.browse_key = (query, sort, page_size)
+        st.session_state.browse_cursors = [None]
+    cursors = st.session_state.browse_cursors
+    
+    column, descending = BROWSE_SORTS[sort]
+    try:
+        page = query_engine.page(query, column, descending, after=cursors[-1], limit=page_size)
+    except QuerySyntaxError as e:
+        st.error(f"❌ Invalid filter expression: {str(e)}")
+        return
+    if page.total == 0:
+        st.info("No recipes match this filter.")
+        return
+    
+    rows = df.take(page.rows)
+    # float64 so one-decimal rounding displays cleanly
+    table = rows[list(BROWSE_COLUMNS)].rename(columns=BROWSE_COLUMNS).astype(
+        {label: np.float64 for column, label in BROWSE_COLUMNS.items() if rows[column].dtype == np.float32}
+    ).round(1)
+    details = load_recipe_details()
+    if details is not None:
+        table.insert(0, 'Recipe', details['Name'].reindex(rows['RecipeId']).to_numpy())
+    table.insert(0, 'RecipeId', rows['RecipeId'].to_numpy())
+    
+    n_pages = -(-page.total // page_size)
+    st.caption(f"Page {len(cursors):,} of {n_pages:,} · {page.total:,} matching recipes")
+    st.dataframe(table, use_container_width=True, hide_index=True)
+    
+    col_prev, col_next = st.columns(2)
+    with col_prev:
+        st.button("◀ Previous", key="browse_previous", disabled=len(cursors) == 1, on_click=_browse_previous,
+                  use_container_width=True)
+    with col_next:
+        st.button("Next ▶", key="browse_next", disabled=page.next_cursor is None, on_click=_browse_next,
+                  args=(page.next_cursor,), use_container_width=True)
+
 def meal_planner_page():
     """Display the main meal planner functionality"""
     # Add top navigation hint
     st.markdown("""
     <div style="background-color: #f0f8ff; padding: 10px; border-radius: 5px; margin-bottom: 20px; border-left: 4px solid #2196F3;">
-        💡 <strong>Tip:</strong> Use the sidebar navigation buttons to switch between <strong>Meal Planner</strong> and <strong>About Project</strong> pages!
+        💡 <strong>Tip:</strong> Use the sidebar navigation buttons to switch between <strong>Meal Planner</strong>, <strong>Browse Recipes</strong> and <strong>About Project</strong> pages!
     </div>
     """, unsafe_allow_html=True)
     
@@ -695,158 +1325,126 @@ def meal_planner_page():
     if df.empty:
         st.stop()
     
+    cube = load_cube(df)
+    
     # Display dataset info
     with st.expander("📊 Dataset Information"):
-        st.write(f"**Total recipes available:** {len(df)}")
+        totals = cube.stats() if cube is not None else None
+        st.write(f"**Total recipes available:** {totals.count if totals else len(df)}")
+        if settings.SCOPE_MEAL_CATEGORIES or settings.SCOPE_FLAGS:
+            scope = ', '.join(settings.SCOPE_MEAL_CATEGORIES + settings.SCOPE_FLAGS)
+            st.write(f"**Serving scope:** {scope} (only these partitions were loaded)")
         if not df.empty:
-            st.write(f"**Average calories per recipe:** {df['Calories'].mean():.0f}")
-            st.write(f"**Average protein per recipe:** {df['ProteinContent'].mean():.1f}g")
+            avg_calories = totals.mean('Calories') if totals else df['Calories'].mean()
+            avg_protein = totals.mean('ProteinContent') if totals else df['ProteinContent'].mean()
+            st.write(f"**Average calories per recipe:** {avg_calories:.0f}")
+            st.write(f"**Average protein per recipe:** {avg_protein:.1f}g")
             st.write(f"**Recipe columns:** {', '.join(df.columns.tolist())}")
     
     # Main content area
-    preferences = collect_preferences()
-    
-    # Show current filter summary
-    active_filters = []
-    for key, value in preferences.items():
-        if value == 'y':
-            active_filters.append(key.capitalize())
-        elif key in ['calories', 'protein', 'preptime'] and value != 'm':
-            filter_map = {'l': 'Low', 'h': 'High', 'q': 'Quick', 's': 'Standard'}
-            active_filters.append(f"{key.capitalize()}: {filter_map.get(value, value)}")
-    
-    if active_filters:
-        st.info(f"**Active filters:** {', '.join(active_filters)}")
-    
-    # Generate meal plan button
-    if st.button("🎯 Generate My Meal Plan", type="primary"):
-        with st.spinner("Creating your personalized meal plan..."):
-            # Get sidebar values
-            target_calories = st.session_state.get('target_calories', 2500)
-            target_protein = st.session_state.get('target_protein', 120)
-            tolerance = st.session_state.get('tolerance', 0.2)
-            max_meals = st.session_state.get('max_meals', 4)
-            show_compact = st.session_state.get('show_compact', True)
-            show_detailed = st.session_state.get('show_detailed', True)
-            
-            # Filter recipes
-            df_filtered = filter_by_preferences(df, preferences)
-            
-            if df_filtered.empty:
-                st.error("❌ No recipes match your criteria. Try adjusting your preferences!")
+    keyword_index = load_keyword_index(df)
+    query_engine = load_query_engine(df, keyword_index)
+    preference_model = user_preference_model(df, keyword_index)
+    planner_controls(df, cube, keyword_index, query_engine, preference_model)
+    plan_overview()
+    plan_details()
+    plan_actions()
+    household_planner(df, cube, query_engine)
+
+HOUSEHOLD_DIETS = ['none', 'vegetarian', 'vegan', 'pescatarian']
+
+def household_members(table):
+    """HouseholdMembers from the household editor rows (unnamed rows are skipped)"""
+    members = []
+    for row in table.to_dict('records'):
+        if not isinstance(row.get('Name'), str) or not row['Name'].strip():
+            continue
+        preferences = {'glutenfree': 'y' if row.get('Gluten free') else 'n',
+                       'dairyfree': 'y' if row.get('Dairy free') else 'n'}
+        if row.get('Diet') in PREFERENCE_FLAGS:
+            preferences[row['Diet']] = 'y'
+        members.append(HouseholdMember(row['Name'].strip(), float(row.get('Calories') or 2000),
+                                       float(row.get('Protein') or 80), preferences))
+    return members
+
+@st.fragment
+def household_planner(df, cube, query_engine):
+    """Shared meals for several people, with a portion size per person"""
+    with st.expander("👨‍👩‍👧 Household Planner: shared meals, individual portions"):
+        st.markdown("Everyone eats the same meals; portions are sized to each person's goals.")
+        members_table = st.data_editor(
+            pd.DataFrame({
+                'Name': ['Adult 1', 'Adult 2', 'Child'],
+                'Calories': [2500, 2000, 1500],
+                'Protein': [120, 90, 50],
+                'Diet': ['none', 'none', 'none'],
+                'Gluten free': [False, False, False],
+                'Dairy free': [False, False, False],
+            }),
+            num_rows="dynamic",
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                'Calories': st.column_config.NumberColumn(min_value=800, max_value=5000, step=50),
+                'Protein': st.column_config.NumberColumn("Protein (g)", min_value=20, max_value=300, step=5),
+                'Diet': st.column_config.SelectboxColumn(options=HOUSEHOLD_DIETS),
+            },
+            key="household_members"
+        )
+        
+        if st.button("👨‍👩‍👧 Plan Shared Meals"):
+            members = household_members(members_table)
+            if not members:
+                st.error("❌ Add at least one named household member.")
             else:
-                st.success(f"✅ Found {len(df_filtered)} recipes matching your preferences!")
-                
-                # Generate meal plan
-                meal_plan, summary, total_cal, total_prot = generate_daily_meal_plan(
-                    df_filtered, target_calories, target_protein, tolerance=tolerance, max_meals=max_meals
+                # Size the day from what the household can eat, not from the whole catalogue
+                stats = preference_stats(cube, household_preferences(members))
+                plan = generate_household_plan(
+                    df, members, engine=query_engine, max_meals=st.session_state.get('max_meals', 4),
+                    nutrient_means=stats.means if stats is not None else None,
+                    exclude_recipe_ids=recently_served_recipe_ids()
                 )
-                
-                if meal_plan:
-                    # Compact overview
-                    if show_compact:
-                        st.subheader("📋 Meal Plan Overview")
-                        
-                        # Display meal plan in enhanced cards
-                        for meal_name, recipe_data in meal_plan.items():
-                            with st.container():
-                                col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
-                                with col1:
-                                    st.markdown(f"**{meal_name}:** {recipe_data['Name']}")
-                                with col2:
-                                    st.markdown(f"🔥 {int(recipe_data['Calories'])} cal")
-                                with col3:
-                                    st.markdown(f"💪 {int(recipe_data['ProteinContent'])}g protein")
-                                with col4:
-                                    rating = recipe_data.get('AggregatedRating', 0)
-                                    if rating and not pd.isna(rating):
-                                        st.markdown(f"⭐ {float(rating):.1f}")
-                                    else:
-                                        st.markdown("⭐ N/A")
-                        
-                        st.markdown("---")
-                        
-                        # Enhanced summary with goal tracking
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown(f"**📊 Daily Totals:**")
-                            st.markdown(f"🔥 **Calories:** {total_cal} / {target_calories} ({total_cal/target_calories*100:.1f}%)")
-                            st.markdown(f"💪 **Protein:** {total_prot}g / {target_protein}g ({total_prot/target_protein*100:.1f}%)")
-                        
-                        with col2:
-                            st.markdown("**🎯 Goal Achievement:**")
-                            cal_status = "✅" if abs(total_cal - target_calories) <= target_calories * 0.1 else "⚠️"
-                            prot_status = "✅" if abs(total_prot - target_protein) <= target_protein * 0.1 else "⚠️"
-                            st.markdown(f"{cal_status} Calorie target")
-                            st.markdown(f"{prot_status} Protein target")
-                    
-                    # Detailed recipe information (now shown by default)
-                    if show_detailed:
-                        st.markdown("---")
-                        st.subheader("🍽️ Detailed Recipe Information")
-                        
-                        for meal_name, recipe_data in meal_plan.items():
-                            display_detailed_recipe(recipe_data, meal_name)
-                            st.markdown("---")
-                    
-                    # Action buttons
-                    st.markdown("---")
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        if st.button("🔄 Generate New Plan"):
-                            st.rerun()
-                    with col2:
-                        if st.button("📊 Show Meal Analytics"):
-                            st.session_state.show_analytics = True
-                    
-                    # Show meal analytics if requested
-                    if st.session_state.get('show_analytics', False):
-                        st.subheader("📊 Meal Plan Analytics")
-                        
-                        # Create analytics dataframe
-                        analytics_data = []
-                        for meal_name, recipe_data in meal_plan.items():
-                            analytics_data.append({
-                                'Meal': meal_name,
-                                'Calories': int(recipe_data['Calories']),
-                                'Protein': int(recipe_data['ProteinContent']),
-                                'Fat': float(recipe_data.get('FatContent', 0)),
-                                'Carbs': float(recipe_data.get('CarbohydrateContent', 0)),
-                                'Prep Time': format_time(recipe_data.get('PrepTime', '')),
-                                'Cook Time': format_time(recipe_data.get('CookTime', '')),
-                                'Rating': float(recipe_data.get('AggregatedRating', 0)) if recipe_data.get('AggregatedRating') and not pd.isna(recipe_data.get('AggregatedRating')) else 0
-                            })
-                        
-                        analytics_df = pd.DataFrame(analytics_data)
-                        st.dataframe(analytics_df, use_container_width=True)
-                        
-                        # Nutrition breakdown
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.markdown("**🥗 Nutrition Breakdown**")
-                            total_fat = analytics_df['Fat'].sum()
-                            total_carbs = analytics_df['Carbs'].sum()
-                            st.markdown(f"**Total Fat:** {total_fat:.1f}g")
-                            st.markdown(f"**Total Carbs:** {total_carbs:.1f}g")
-                            st.markdown(f"**Total Protein:** {total_prot}g")
-                        
-                        with col2:
-                            st.markdown("**⏱️ Time Summary**")
-                            total_prep_mins = 0
-                            total_cook_mins = 0
-                            for _, recipe in meal_plan.items():
-                                # Rough time calculation for display
-                                prep_time = recipe.get('PrepTime', '')
-                                cook_time = recipe.get('CookTime', '')
-                                # You could implement proper time parsing here
-                            st.markdown("**Estimated prep time varies by recipe**")
-                            st.markdown("**Check individual recipes for exact times**")
-                
+                if plan is None:
+                    st.error("❌ No recipes suit every household member. Try relaxing someone's restrictions!")
                 else:
-                    st.error("❌ Could not generate meal plan. Try adjusting your preferences!")
+                    details = load_recipe_details()
+                    plan.meal_plan = attach_recipe_details(plan.meal_plan, details)
+                    st.session_state.household_plan = plan
+        
+        plan = st.session_state.get('household_plan')
+        if plan is None:
+            return
+        batches = plan.batch_multipliers()
+        st.markdown("**🍽️ Shared Meals**")
+        st.dataframe(pd.DataFrame({
+            'Meal': list(plan.meal_plan),
+            'Recipe': [recipe['Name'] for recipe in plan.meal_plan.values()],
+            'Servings': plan.servings.to_numpy(),
+            'Batches to cook': batches.round(2).to_numpy(),
+        }), use_container_width=True, hide_index=True)
+        
+        st.markdown("**🥄 Servings per person**")
+        st.dataframe(plan.portions, use_container_width=True)
+        
+        st.markdown("**📊 Daily totals per person**")
+        members = {member.name: member for member in household_members(members_table)}
+        totals = pd.DataFrame({
+            'Calories': plan.totals['Calories'].round(0),
+            'Calorie goal': [members[name].target_calories if name in members else np.nan for name in plan.members],
+            'Protein (g)': plan.totals['ProteinContent'].round(0),
+            'Protein goal': [members[name].target_protein if name in members else np.nan for name in plan.members],
+        }, index=plan.members)
+        st.dataframe(totals, use_container_width=True)
+        
+        display_shopping_list(load_quantity_table(), [recipe['RecipeId'] for recipe in plan.meal_plan.values()],
+                              title="🛒 Household Shopping List", multipliers=batches.to_numpy())
 
 def main():
     """Main application with page navigation"""
+    # Expose /metrics for scraping and /ready for load balancers when DIET_APP_METRICS_PORT is set
+    start_metrics_server()
+    warmup_indicator(start_warmup())
+    
     # Page selection in sidebar with prominent buttons
     st.sidebar.markdown("""
     <div style="text-align: center; padding: 10px; margin-bottom: 20px; 
@@ -861,7 +1459,7 @@ def main():
         st.session_state.current_page = "🍽️ Meal Planner"
     
     # Create navigation buttons
-    col1, col2 = st.sidebar.columns(2)
+    col1, col2, col3 = st.sidebar.columns(3)
     
     with col1:
         if st.button("🍽️\nMeal\nPlanner", 
@@ -871,6 +1469,13 @@ def main():
             st.session_state.current_page = "🍽️ Meal Planner"
     
     with col2:
+        if st.button("🔎\nBrowse\nRecipes", 
+                    key="nav_browse",
+                    help="Explore the whole recipe catalogue",
+                    use_container_width=True):
+            st.session_state.current_page = "🔎 Browse"
+    
+    with col3:
         if st.button("📖\nAbout\nProject", 
                     key="nav_about",
                     help="Learn about this project",
@@ -886,6 +1491,14 @@ def main():
             <small><strong>📍 Currently on: Meal Planner</strong></small>
         </div>
         """, unsafe_allow_html=True)
+    elif st.session_state.current_page == "🔎 Browse":
+        st.sidebar.markdown("""
+        <div style="text-align: center; padding: 5px; margin: 10px 0; 
+                    background-color: #fff4e5; border-radius: 5px; 
+                    border-left: 4px solid #FF9800;">
+            <small><strong>📍 Currently on: Browse Recipes</strong></small>
+        </div>
+        """, unsafe_allow_html=True)
     else:
         st.sidebar.markdown("""
         <div style="text-align: center; padding: 5px; margin: 10px 0; 
@@ -900,6 +1513,24 @@ def main():
     # Sidebar for inputs (only show on meal planner page)
     if page == "🍽️ Meal Planner":
         st.sidebar.markdown("---")
+        st.sidebar.header("👤 Profile")
+        st.sidebar.text_input(
+            "Your name (optional):",
+            key="user_id",
+            on_change=restore_profile,
+            help="Remembers your goals and avoids repeating recipes you were recently served"
+        )
+        if current_user():
+            st.sidebar.number_input(
+                "Don't repeat recipes from the last N days:",
+                min_value=0,
+                max_value=60,
+                value=settings.NO_REPEAT_DAYS,
+                help="0 allows repeats",
+                key="no_repeat_days"
+            )
+            plan_history_panel()
+        
         st.sidebar.header("📊 Daily Goals")
         target_calories = st.sidebar.number_input(
             "Target Calories:", 
@@ -938,6 +1569,30 @@ def main():
             key="tolerance"
         )
         
+        st.sidebar.slider(
+            "Alternative plans to compare:",
+            min_value=1,
+            max_value=5,
+            value=1,
+            help="Build several plans with no recipes in common in one go",
+            key="n_plans"
+        )
+        
+        st.sidebar.checkbox(
+            "Flexible portion sizes",
+            value=False,
+            help="Scale each meal between half and double a serving so the day hits your goals",
+            key="flexible_portions"
+        )
+        
+        with st.sidebar.expander("🥗 Nutrient Targets & Limits"):
+            st.caption("Optional daily goals. Leave at 0 to ignore.")
+            for _, label, unit, key in NUTRIENT_TARGET_INPUTS:
+                st.number_input(f"{label} ({unit}):", min_value=0, max_value=1000, value=0, step=5, key=key)
+            for _, label, unit, key in NUTRIENT_LIMIT_INPUTS:
+                st.number_input(f"{label} ({unit}):", min_value=0, max_value=10000, value=0, step=5, key=key,
+                                help="Hard daily maximum - recipes that would exceed it are skipped")
+        
         # Display options
         st.sidebar.header("📋 Display Options")
         show_compact = st.sidebar.checkbox("Show compact meal overview", value=True, key="show_compact")
@@ -946,8 +1601,13 @@ def main():
     # Display selected page
     if page == "🍽️ Meal Planner":
         meal_planner_page()
+    elif page == "🔎 Browse":
+        browse_page()
     elif page == "📖 About":
         about_page()
+    
+    metrics_debug_panel()
+    memory_debug_panel()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Modules are imported as ``src.diet_app...``, like the app and scripts do
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.diet_app.data.loaders import FLAG_COLUMNS, NUTRITION_COLUMNS  # noqa: E402
+from src.diet_app.data.table import enable_copy_on_write  # noqa: E402
+from src.diet_app.models.ranking import add_rank_score, sort_by_rank  # noqa: E402
+from src.diet_app.utils.metrics import metrics  # noqa: E402
+
+# Like the app and the batch planner at startup
+enable_copy_on_write()
+
+
+def make_recipes(n=600, seed=0):
+    """Synthetic recipe table with the loader's filter columns, presorted like an export."""
+    rng = np.random.default_rng(seed)
+    calories = rng.uniform(150, 900, n)
+    df = pd.DataFrame({
+        'RecipeId': np.arange(1, n + 1),
+        'Name': [f'Recipe {i}' for i in range(1, n + 1)],
+        'MealCat': rng.choice(['Breakfast', 'Lunch/Dinner', 'Snacks'], n),
+        'AggregatedRating': rng.uniform(1, 5, n).round(1),
+        'ReviewCount': rng.integers(0, 200, n).astype(float),
+        'Calories': calories,
+        'ProteinContent': calories * rng.uniform(0.02, 0.09, n),
+        'FatContent': calories * rng.uniform(0.01, 0.05, n),
+        'SaturatedFatContent': calories * rng.uniform(0.002, 0.02, n),
+        'CarbohydrateContent': calories * rng.uniform(0.05, 0.15, n),
+        'SodiumContent': rng.uniform(50, 1500, n),
+        'FiberContent': rng.uniform(0, 12, n),
+        'SugarContent': rng.uniform(0, 40, n),
+    })
+    for flag in FLAG_COLUMNS:
+        df[flag] = rng.integers(0, 2, n).astype(np.int8)
+    df[NUTRITION_COLUMNS] = df[NUTRITION_COLUMNS].astype(np.float32)
+    add_rank_score(df)
+    return sort_by_rank(df)
+
+
+@pytest.fixture
+def recipes():
+    return make_recipes()
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.enabled = True
+    metrics.reset()
+    yield metrics
+    metrics.enabled = False
+    metrics.reset()
+
+
+def counter(name, **labels):
+    """Value of one counter of the metrics registry."""
+    _, counters = metrics.summary()
+    label_text = ', '.join(f'{key}={value}' for key, value in sorted(labels.items()))
+    return sum(row['value'] for row in counters if row['counter'] == name and row['labels'] == label_text)
@@ -0,0 +1,86 @@
+import pandas as pd
+import pytest
+
+from src.diet_app.data.classifier import DietaryClassifier, classify_recipes
+
+
+@pytest.fixture(scope='module')
+def classifier():
+    return DietaryClassifier()
+
+
+@pytest.mark.parametrize('ingredient, categories', [
+    ('boneless skinless chicken breasts', ['meat']),
+    ('ground beef', ['meat']),
+    ('hot dogs', ['meat']),
+    ('hamburger', ['meat']),         # compound words are listed on their own
+    ('lean hamburger', ['meat']),
+    ('ham hocks', ['meat']),
+    ('hamhocks', ['meat']),
+    ('chicken broth', ['meat']),
+    ('anchovies', ['fish']),
+    ('Worcestershire sauce', ['fish']),
+    ('imitation crab meat', ['fish']),
+    ('crab meat', ['shellfish']),
+    ('shrimp', ['shellfish']),
+    ('parmesan cheese', ['dairy']),
+    ('goat cheese', ['dairy']),
+    ('buttermilk', ['dairy']),
+    ('eggs', ['egg']),
+    ('mayonnaise', ['egg']),
+    ('egg noodles', ['egg', 'gluten']),
+    ('honey', ['honey']),
+    ('marshmallows', ['gelatin']),
+    ('all-purpose flour', ['gluten']),
+    ('graham crackers', ['gluten']),
+    ('soy sauce', ['gluten']),
+    ('peanut butter', ['nuts']),
+    ('almond milk', ['nuts']),
+    ('pine nuts', ['nuts']),
+])
+def test_terms_are_found(classifier, ingredient, categories):
+    assert classifier.categories_of(ingredient) == categories
+
+
+@pytest.mark.parametrize('ingredient', [
+    'eggplant',             # whole words only: no 'egg'
+    'nutmeg',               # ... and no 'nut'
+    'butternut squash',
+    'coconut milk',         # overrides: the phrase means something else
+    'butter beans',
+    'cream of tartar',
+    'egg substitute',
+    'rice flour',
+    'tamari soy sauce',
+    'gluten free flour',    # clears
+    'vegan cheese',
+    'non-dairy creamer',
+    'meatless crumbles',
+    'vegetable broth',
+    'tofu',
+    'olive oil',
+])
+def test_lookalikes_and_substitutes_are_not_flagged(classifier, ingredient):
+    assert classifier.categories_of(ingredient) == []
+
+
+def test_classify_recipes_flags():
+    parts = pd.Series([
+        'c("tofu", "soy sauce", "rice")',
+        'c("chicken breasts", "olive oil")',
+        'c("salmon", "lemon")',
+        'c("eggs", "milk", "gluten free flour")',
+        'c("almond milk", "honey")',
+        None,
+    ])
+    flags, index = classify_recipes(parts)
+
+    assert list(flags.columns) == ['Vegetarian', 'Pescatarian', 'Vegan', 'DairyFree', 'GlutenFree']
+    assert flags.to_dict('list') == {
+        'Vegetarian': [1, 0, 0, 1, 1, 0],
+        'Pescatarian': [1, 0, 1, 1, 1, 0],
+        'Vegan': [1, 0, 0, 0, 0, 0],
+        'DairyFree': [1, 1, 1, 0, 1, 0],
+        'GlutenFree': [0, 1, 1, 1, 1, 0],
+    }
+    assert index.matrix.shape[0] == len(parts)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from src.diet_app.data.cube import AggregateCube
+from src.diet_app.data.loaders import FLAG_COLUMNS, NUTRITION_COLUMNS
+
+
+@pytest.fixture
+def table(recipes):
+    recipes.loc[recipes.index[::7], 'FiberContent'] = np.nan
+    return recipes
+
+
+@pytest.fixture
+def cube(table):
+    return AggregateCube.from_frame(table, FLAG_COLUMNS, NUTRITION_COLUMNS)
+
+
+@pytest.mark.parametrize('flags, category', [
+    ([], None),
+    ([], 'Snacks'),
+    (['Vegan'], None),
+    (FLAG_COLUMNS[:2], 'Breakfast'),
+    (FLAG_COLUMNS[1:4], 'Lunch/Dinner'),
+    (FLAG_COLUMNS[-3:], None),
+])
+def test_stats_match_direct_filtering(table, cube, flags, category):
+    rows = table[(table[flags] == 1).all(axis=1)] if flags else table
+    if category is not None:
+        rows = rows[rows['MealCat'] == category]
+
+    stats = cube.stats(flags, category)
+
+    assert stats.count == len(rows)
+    for nutrient in NUTRITION_COLUMNS:
+        values = rows[nutrient].astype(np.float64)
+        assert stats.means[nutrient] == pytest.approx(values.mean(), rel=1e-6, nan_ok=True)
+        assert stats.stds[nutrient] == pytest.approx(values.std(ddof=0), rel=1e-4, abs=1e-6, nan_ok=True)
+
+
+def test_unknown_flag_or_category_and_round_trip(cube, tmp_path):
+    assert cube.stats(['NoSuchFlag']) is None
+    assert cube.stats([], 'Brunch') is None
+    cube.save(tmp_path)
+    loaded = AggregateCube.load(tmp_path)
+    assert loaded.stats(['Vegan'], 'Snacks') == cube.stats(['Vegan'], 'Snacks')
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.diet_app.data.dedup import (CLUSTER_COLUMN, CLUSTER_SIZE_COLUMN, MinHashDeduplicator,
+                                     collapse_near_duplicates, name_tokens)
+from src.diet_app.data.keywords import build_keyword_index
+
+BANANA_BREAD = [f'ingredient {i}' for i in range(20)]
+LENTIL_SOUP = [f'other {i}' for i in range(20)]
+
+
+def recipe_frame(rows):
+    """(RecipeId, Name, MealCat, RankScore, ingredients) rows -> frame and ingredient index."""
+    df = pd.DataFrame(rows, columns=['RecipeId', 'Name', 'MealCat', 'RankScore', 'Ingredients'])
+    index = build_keyword_index(df['Ingredients'], df['RecipeId'])
+    return df.drop(columns='Ingredients'), index
+
+
+def test_name_tokens_drop_filler_words():
+    assert name_tokens("Grandma's Best Easy Banana Bread II") == ['banana', 'bread']
+    assert name_tokens(None) == []
+
+
+def test_exact_and_near_duplicates_collapse_into_the_best_ranked_recipe():
+    df, index = recipe_frame([
+        (1, 'Easy Banana Bread', 'Snacks', 0.5, BANANA_BREAD),
+        (2, 'Best Banana Bread', 'Snacks', 0.9, BANANA_BREAD),
+        (3, 'Banana Bread', 'Snacks', 0.7, BANANA_BREAD[:-1] + ['walnuts']),
+        (4, 'Lentil Soup', 'Lunch/Dinner', 0.6, LENTIL_SOUP),
+    ])
+    collapsed, duplicates, report = collapse_near_duplicates(df, index)
+
+    assert collapsed['RecipeId'].tolist() == [2, 4]
+    assert collapsed[CLUSTER_COLUMN].tolist() == [2, 4]
+    assert collapsed[CLUSTER_SIZE_COLUMN].tolist() == [3, 1]
+    assert duplicates.to_dict('list') == {'RecipeId': [1, 3], CLUSTER_COLUMN: [2, 2]}
+    assert report['rows_removed'] == 2
+    assert report['largest_clusters'] == [{'cluster_id': 2, 'name': 'Best Banana Bread', 'size': 3}]
+
+
+def test_distinct_recipes_and_other_meal_categories_are_kept():
+    df, index = recipe_frame([
+        (1, 'Banana Bread', 'Snacks', 0.5, BANANA_BREAD),
+        (2, 'Banana Bread', 'Breakfast', 0.9, BANANA_BREAD),
+        (3, 'Lentil Soup', 'Snacks', 0.7, LENTIL_SOUP),
+        (4, 'Half And Half', 'Snacks', 0.6, BANANA_BREAD[:10] + LENTIL_SOUP[:10]),
+        (5, 'Empty', 'Snacks', 0.1, []),
+    ])
+    collapsed, duplicates, report = collapse_near_duplicates(df, index)
+    assert collapsed['RecipeId'].tolist() == [1, 2, 3, 4, 5]
+    assert duplicates.empty
+    assert report['clusters_with_duplicates'] == 0
+
+
+def test_chained_links_do_not_collapse_dissimilar_recipes():
+    # Each recipe shares 38 of 40 features with the next, but the ends share none
+    columns = np.concatenate([np.arange(2 * i, 2 * i + 40) for i in range(10)])
+    features = sparse.csr_matrix((np.ones(len(columns)), (np.repeat(np.arange(10), 40), columns)), shape=(10, 60))
+    deduplicator = MinHashDeduplicator(num_perm=128, bands=32, threshold=0.8)
+    result = deduplicator.find(features)
+
+    signatures, _ = deduplicator.signatures(features)
+    agreement = (signatures == signatures[result.canonical]).mean(axis=1)
+    assert (agreement >= 0.8).all()
+    assert result.detached > 0
+    assert result.cluster_sizes.sum() == 10
+    assert result.n_clusters == len(np.unique(result.labels))
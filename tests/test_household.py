@@ -0,0 +1,24 @@
+import numpy as np
+
+from src.diet_app.models.household import HouseholdMember, generate_household_plan
+from src.diet_app.models.portions import MAX_PORTION, MIN_PORTION
+
+from conftest import counter
+
+
+def test_uncategorised_slots_are_not_counted_as_fallbacks(recipes, enabled_metrics):
+    # Seven meals are named "Meal 1".."Meal 7", which map to no category
+    members = [HouseholdMember('a', target_calories=4000, target_protein=50)]
+    plan = generate_household_plan(recipes, members, max_meals=7, rng=np.random.default_rng(0))
+    assert list(plan.meal_plan) == [f'Meal {i}' for i in range(1, 8)]
+    assert counter('slots_planned') == 7
+    assert counter('fallback', reason='any_category') == 0
+
+
+def test_portions_stay_within_the_planners_bounds(recipes):
+    members = [HouseholdMember('big', target_calories=5000, target_protein=250),
+               HouseholdMember('small', target_calories=1000, target_protein=30)]
+    plan = generate_household_plan(recipes, members, max_meals=3, rng=np.random.default_rng(0))
+    portions = plan.portions.to_numpy()
+    assert (portions >= MIN_PORTION).all() and (portions <= MAX_PORTION).all()
+    assert portions[0].max() == MAX_PORTION
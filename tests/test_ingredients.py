@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.diet_app.data.ingredients import build_quantity_table, parse_quantity, split_r_vector
+
+
+@pytest.mark.parametrize('text, amount, unit', [
+    ('2', 2.0, ''),
+    ('1/2', 0.5, ''),
+    ('1 1/2', 1.5, ''),
+    ('1-1/2', 1.5, ''),
+    ('2 - 3/4', 2.75, ''),
+    ('½', 0.5, ''),
+    ('1½', 1.5, ''),
+    ('.5', 0.5, ''),
+    ('2 -3', 3.0, ''),
+    ('1/2-1', 1.0, ''),
+    ('1 -1 1/2', 1.5, ''),
+    ('8 oz', 8 * 28.3495, 'g'),
+    ('1 lb', 453.592, 'g'),
+    ('2 tablespoons', 2 * 14.7868, 'ml'),
+    ('1 1/2 cups', 1.5 * 236.588, 'ml'),
+    ('3 cloves', 3.0, 'clove'),
+    ('1 head', 1.0, 'head'),
+    ('2 leaves', 2.0, 'leaf'),
+    ('2 pinches', 2.0, 'pinch'),
+])
+def test_parse_quantity(text, amount, unit):
+    parsed_amount, parsed_unit = parse_quantity(text)
+    assert parsed_amount == pytest.approx(amount, rel=1e-6)
+    assert parsed_unit == unit
+
+
+@pytest.mark.parametrize('text', ['', 'to taste', None, '1/0'])
+def test_unparseable_quantities(text):
+    amount, unit = parse_quantity(text)
+    assert np.isnan(amount) and unit == ''
+
+
+def test_split_r_vector_keeps_positions():
+    assert split_r_vector('c("1", NA, "2 -3")') == ['1', '', '2 -3']
+
+
+@pytest.fixture
+def table():
+    parts = pd.Series(['c("eggs", "onion", "garlic")', 'c("eggs", "garlic", "flour")', 'c("flour")'])
+    quantities = pd.Series(['c("2", "1", "3 cloves")', 'c("1-1/2", "1 head", "1 cup")', 'c("2 cups")'])
+    return build_quantity_table(parts, quantities, pd.Series([10, 20, 30]))
+
+
+def test_shopping_list_adds_up_only_same_ingredient_and_unit(table):
+    shopping = table.shopping_list([10, 20, 30]).set_index(['Ingredient', 'Unit'])
+    assert shopping.loc[('eggs', ''), 'Amount'] == pytest.approx(3.5)
+    assert shopping.loc[('onion', ''), 'Amount'] == pytest.approx(1.0)
+    assert shopping.loc[('garlic', 'clove'), 'Amount'] == pytest.approx(3.0)
+    assert shopping.loc[('garlic', 'head'), 'Amount'] == pytest.approx(1.0)
+    assert shopping.loc[('flour', 'ml'), 'Amount'] == pytest.approx(3 * 236.588, rel=1e-5)
+    assert shopping.loc[('flour', 'ml'), 'Recipes'] == 2
+    assert len(shopping) == 5
+
+
+def test_shopping_list_scales_by_multiplier_and_skips_unknown_recipes(table):
+    shopping = table.shopping_list([10, 99], [2.0, 1.0]).set_index('Ingredient')
+    assert shopping.loc['eggs', 'Amount'] == pytest.approx(4.0)
+    assert set(shopping.index) == {'eggs', 'onion', 'garlic'}
@@ -0,0 +1,60 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from src.diet_app.models.learning import ACCEPT, SWAP, PreferenceModel, RecipeFeatures
+
+
+@pytest.fixture
+def features(recipes):
+    return RecipeFeatures.from_frame(recipes)
+
+
+def trained_model(features, recipe_ids):
+    model = PreferenceModel(features)
+    model.update(recipe_ids[:5], ACCEPT)
+    model.update(recipe_ids[5:10], SWAP)
+    return model
+
+
+def test_round_trip_keeps_scores_and_keeps_learning(features, recipes):
+    recipe_ids = recipes['RecipeId'].to_numpy()
+    model = trained_model(features, recipe_ids)
+
+    restored = PreferenceModel.from_bytes(features, model.to_bytes())
+
+    assert restored.n_updates == model.n_updates
+    np.testing.assert_allclose(restored.score(recipe_ids), model.score(recipe_ids), rtol=1e-6)
+    restored.update(recipe_ids[10:12], ACCEPT)
+    assert restored.n_updates == model.n_updates + 2
+
+
+def test_saved_model_is_json_not_pickle(features, recipes):
+    blob = trained_model(features, recipes['RecipeId'].to_numpy()).to_bytes()
+    assert blob.startswith(b'{')
+
+
+@pytest.mark.parametrize('blob', [
+    b'not json at all',
+    b'\x80\x04\x95 truncated',
+    b'[1, 2, 3]',
+    b'{"signature": "x"',
+    pickle.dumps({'signature': 'anything', 'n_updates': 3, 'classifier': None}),
+])
+def test_unreadable_blob_gives_a_fresh_model(features, blob):
+    model = PreferenceModel.from_bytes(features, blob)
+    assert not model.trained
+
+
+def test_wrong_shape_or_signature_gives_a_fresh_model(features, recipes):
+    blob = trained_model(features, recipes['RecipeId'].to_numpy()).to_bytes()
+    other = RecipeFeatures.from_frame(recipes.drop(columns=['Vegan']))
+    assert not PreferenceModel.from_bytes(other, blob).trained
+
+    tampered = blob.replace(b'"coef": [', b'"coef": [0.5, ')
+    assert not PreferenceModel.from_bytes(features, tampered).trained
+
+
+def test_untrained_model_round_trips(features):
+    assert not PreferenceModel.from_bytes(features, PreferenceModel(features).to_bytes()).trained
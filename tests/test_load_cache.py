@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import counter
+from src.diet_app.data.load_cache import COLUMNS_FILE, LoadCache
+from src.diet_app.data.validation import ValidationReport
+
+KEY = {'columns': ['RecipeId', 'Name', 'MealCat', 'Calories'], 'stage': 'test'}
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'RecipeId': np.arange(5, dtype=np.int64),
+        'Name': pd.array(['a', 'b', None, 'd', 'e'], dtype='string'),
+        'MealCat': pd.Categorical(['Breakfast', 'Snacks', 'Breakfast', 'Lunch/Dinner', 'Snacks']),
+        'Calories': np.array([100, 250.5, np.nan, 400, 50], dtype=np.float32),
+    })
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / 'recipes.csv'
+    path.write_text('RecipeId,Name\n1,a\n')
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LoadCache(tmp_path / 'cache')
+
+
+def entry_files(cache, dataset):
+    return sorted(cache.entry_dir(dataset, KEY).iterdir())
+
+
+def test_round_trip_keeps_values_and_dtypes(cache, dataset, frame, enabled_metrics):
+    report = ValidationReport(rows=5, nan_counts={'Calories': 1})
+    assert cache.load(dataset, KEY) is None
+    cache.store(dataset, KEY, frame, report)
+
+    loaded, loaded_report = cache.load(dataset, KEY)
+
+    pd.testing.assert_frame_equal(loaded, frame)
+    assert loaded_report == report
+    assert not loaded['Calories'].to_numpy().flags.writeable
+    assert counter('load_cache', result='miss') == 1
+    assert counter('load_cache', result='hit') == 1
+
+
+def test_changed_source_misses_and_prunes_old_entries(cache, dataset, frame):
+    cache.store(dataset, KEY, frame, ValidationReport(rows=5))
+    old_entry = cache.entry_dir(dataset, KEY)
+
+    dataset.write_text('RecipeId,Name\n1,a\n2,b\n')
+    assert cache.load(dataset, KEY) is None
+
+    cache.store(dataset, KEY, frame.head(2), ValidationReport(rows=2))
+    assert not old_entry.parent.exists()
+    assert len(cache.load(dataset, KEY)[0]) == 2
+
+
+def test_same_size_rewrite_is_detected_by_mtime(cache, dataset, frame):
+    cache.store(dataset, KEY, frame, ValidationReport(rows=5))
+    dataset.write_text('RecipeId,Name\n1,z\n')
+    stat = dataset.stat()
+    os.utime(dataset, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.load(dataset, KEY) is None
+
+
+@pytest.mark.parametrize('damage', ['truncate_array', 'truncate_text', 'garble_text', 'drop_column', 'bad_layout'])
+def test_corrupt_entry_is_discarded_and_rebuilt(cache, dataset, frame, enabled_metrics, damage):
+    cache.store(dataset, KEY, frame, ValidationReport(rows=5))
+    files = entry_files(cache, dataset)
+    arrays = [path for path in files if path.suffix == '.npy']
+    if damage == 'truncate_array':
+        arrays[3].write_bytes(arrays[3].read_bytes()[:-8])
+    elif damage == 'truncate_text':
+        arrays[1].write_bytes(arrays[1].read_bytes()[:-20])
+    elif damage == 'garble_text':
+        data = arrays[1].read_bytes()
+        arrays[1].write_bytes(data[:128] + b'\x00' * (len(data) - 128))
+    elif damage == 'drop_column':
+        arrays[0].unlink()
+    else:
+        (cache.entry_dir(dataset, KEY) / COLUMNS_FILE).write_text('{"rows": 5, "columns": [')
+
+    assert cache.load(dataset, KEY) is None
+    assert counter('load_cache', result='corrupt') == 1
+    assert not cache.entry_dir(dataset, KEY).exists()
+
+    cache.store(dataset, KEY, frame, ValidationReport(rows=5))
+    pd.testing.assert_frame_equal(cache.load(dataset, KEY)[0], frame)
+
+
+def test_corrupt_stamp_rehashes(cache, dataset, frame, tmp_path):
+    cache.store(dataset, KEY, frame, ValidationReport(rows=5))
+    (tmp_path / 'cache' / 'dataset.stamp.json').write_text('not json')
+    pd.testing.assert_frame_equal(cache.load(dataset, KEY)[0], frame)
@@ -0,0 +1,24 @@
+import pandas as pd
+import pytest
+
+from src.diet_app.data.loaders import DETAIL_COLUMNS, FILTER_COLUMNS, RecipeDataLoader
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    rows = []
+    for i, (category, score) in enumerate([('Breakfast', 4.5), ('Breakfast', 4.0), ('Lunch/Dinner', 3.0)]):
+        row = {col: 0 for col in FILTER_COLUMNS + DETAIL_COLUMNS}
+        row.update(RecipeId=i + 1, MealCat=category, RankScore=score, Name=f'Recipe {i + 1}',
+                   Calories=100.0 * (i + 1), ProteinContent=10.0, AggregatedRating=4.0, ReviewCount=3)
+        rows.append(row)
+    # Repeated id in the export: the details lookup must still return a single row
+    rows.append({**rows[-1], 'Name': 'Repeated'})
+    pd.DataFrame(rows).to_csv(tmp_path / 'mvp_recipes_clean.csv', index=False)
+    return tmp_path
+
+
+def test_details_drop_repeated_recipe_ids(dataset):
+    details = RecipeDataLoader(data_dir=dataset, use_cache=False).load_detail_columns()
+    assert details.index.is_unique
+    assert details.loc[3, 'Name'] == 'Recipe 3'
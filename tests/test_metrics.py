@@ -0,0 +1,16 @@
+import socket
+
+from src.diet_app.utils import metrics as metrics_module
+from src.diet_app.utils.metrics import start_metrics_server
+
+
+def test_port_in_use_disables_exporter_without_raising(monkeypatch):
+    monkeypatch.setattr(metrics_module, '_server', None)
+    monkeypatch.setattr(metrics_module, '_failed_ports', set())
+    with socket.socket() as taken:
+        taken.bind(('127.0.0.1', 0))
+        taken.listen()
+        port = taken.getsockname()[1]
+        assert start_metrics_server(port, host='127.0.0.1') is None
+        assert port in metrics_module._failed_ports
+
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from conftest import counter, make_recipes
+from src.diet_app.config.settings import settings
+from src.diet_app.data.loaders import RecipeDataLoader
+from src.diet_app.data.partitions import DIET_CLASSES, PartitionManifest, diet_classes, write_partitions
+from src.diet_app.models.ranking import sort_by_rank
+
+
+@pytest.fixture
+def exported(tmp_path):
+    df = make_recipes()
+    # Diet flags nest like the export's: vegan implies vegetarian implies pescatarian
+    df['Vegetarian'] |= df['Vegan']
+    df['Pescatarian'] |= df['Vegetarian']
+    df.to_csv(tmp_path / settings.MVP_DATASET_FILE, index=False)
+    write_partitions(df, tmp_path, ['Vegan', 'Vegetarian', 'Pescatarian', 'GlutenFree'])
+    return tmp_path, df
+
+
+def test_every_row_lands_in_its_most_restrictive_class(exported):
+    data_dir, df = exported
+    manifest = PartitionManifest.load(data_dir)
+    assert manifest.total_rows == len(df)
+    assert len(manifest.partitions) == 3 * len(DIET_CLASSES)
+    classes = diet_classes(df)
+    for partition in manifest.partitions:
+        expected = df[(df['MealCat'] == partition.meal_category) & (classes == partition.diet)]
+        part = pd.read_csv(manifest.path(partition))
+        assert part['RecipeId'].tolist() == expected['RecipeId'].tolist()
+        assert partition.flag_counts['Vegan'] == (len(part) if partition.diet == 'vegan' else 0)
+
+
+@pytest.mark.parametrize('meal_categories, required_flags, expected', [
+    (None, [], {(category, diet) for category in ['Breakfast', 'Lunch/Dinner', 'Snacks'] for diet in DIET_CLASSES}),
+    (['Breakfast'], ['Vegan'], {('Breakfast', 'vegan')}),
+    (['Snacks'], ['Vegetarian'], {('Snacks', 'vegan'), ('Snacks', 'vegetarian')}),
+    (None, ['Pescatarian'], {(category, diet) for category in ['Breakfast', 'Lunch/Dinner', 'Snacks']
+                             for diet in DIET_CLASSES[:3]}),
+    (['Brunch'], [], set()),
+])
+def test_select_prunes_by_category_and_flag_counts(exported, meal_categories, required_flags, expected):
+    manifest = PartitionManifest.load(exported[0])
+    selected = manifest.select(meal_categories, required_flags)
+    assert {(partition.meal_category, partition.diet) for partition in selected} == expected
+
+
+@pytest.mark.parametrize('meal_categories, required_flags', [
+    (['Breakfast'], ['Vegan']),
+    (['Lunch/Dinner', 'Snacks'], ['Vegetarian', 'GlutenFree']),
+    (None, ['Pescatarian']),
+])
+def test_scoped_load_matches_filtered_whole_load(exported, enabled_metrics, meal_categories, required_flags):
+    data_dir, _ = exported
+    whole = RecipeDataLoader(data_dir=data_dir, use_cache=False).load_filter_columns(meal_categories=None,
+                                                                                       required_flags=[])
+    scoped = RecipeDataLoader(data_dir=data_dir, use_cache=False).load_filter_columns(
+        meal_categories=meal_categories, required_flags=required_flags)
+
+    mask = (whole[required_flags] == 1).all(axis=1)
+    if meal_categories is not None:
+        mask &= whole['MealCat'].isin(meal_categories)
+    expected = whole[mask].reset_index(drop=True)
+    pd.testing.assert_frame_equal(scoped, expected, check_categorical=False)
+    pd.testing.assert_frame_equal(scoped, sort_by_rank(scoped).reset_index(drop=True), check_categorical=False)
+    assert counter('partitions_pruned') > 0
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from src.diet_app.models.portions import portion_error, solve_day_portions, solve_portions
+from src.diet_app.models.recommender import generate_meal_plans
+
+# Columns: calories, protein, sodium
+MEALS = np.array([
+    [400, 20, 600],
+    [600, 30, 300],
+    [500, 40, 900],
+], dtype=np.float32)
+
+
+def test_solve_portions_scales_to_the_target_and_clips():
+    targets = np.array([[800, 40, 0], [200, 10, 0], [4000, 200, 0]], dtype=np.float32)
+    portions = solve_portions(MEALS[:1], targets)
+    # Same macro ratio as the target: an exact fit, no error left
+    assert portions[:, 0].tolist() == pytest.approx([2.0, 0.5, 2.0])
+    assert portion_error(portions[:1], MEALS[:1], targets[:1])[0, 0] == pytest.approx(0, abs=1e-6)
+    # 1.6 servings, rounded to quarters
+    assert solve_portions(MEALS[:1], np.array([[640, 32, 0]]), step=0.25)[0, 0] == pytest.approx(1.5)
+
+
+def test_solve_portions_ignores_nutrients_without_a_target():
+    targets = np.array([[800, 0, 0]], dtype=np.float32)
+    assert solve_portions(MEALS, targets)[0].tolist() == pytest.approx([2.0, 800 / 600, 1.6])
+
+
+def test_day_portions_meet_the_daily_targets():
+    daily = np.array([2000, 120, 0], dtype=np.float64)
+    portions = solve_day_portions(MEALS, daily, np.ones(3), regularization=1e-6)
+    totals = portions @ MEALS
+    assert totals[:2] == pytest.approx(daily[:2], rel=0.01)
+    assert ((portions >= 0.5) & (portions <= 2.0)).all()
+
+
+def test_day_portions_shrink_to_respect_a_hard_limit():
+    daily = np.array([2000, 120, 0], dtype=np.float64)
+    limits = np.array([np.inf, np.inf, 1500])
+    portions = solve_day_portions(MEALS, daily, np.ones(3), daily_limits=limits)
+    assert (portions @ MEALS)[2] <= 1500 + 1e-3
+    # Shrinking stops at the smallest portion even if the limit is still broken
+    portions = solve_day_portions(MEALS, daily, np.ones(3), daily_limits=np.array([np.inf, np.inf, 100]))
+    assert portions.tolist() == pytest.approx([0.5, 0.5, 0.5])
+
+
+@pytest.mark.parametrize('limits', [None, {'SodiumContent': 1500, 'SugarContent': 60}])
+def test_portioned_plans_hit_targets_within_limits(recipes, limits):
+    plans = generate_meal_plans(recipes, 3, 2200, 110, portions=True, nutrient_limits=limits,
+                                rng=np.random.default_rng(0))
+    for meal_plan, summary, total_calories, total_protein in plans:
+        # Well inside the 20% slot tolerance; shrinking for a limit may cost a few percent
+        assert total_calories == pytest.approx(2200, rel=0.1)
+        assert total_protein == pytest.approx(110, rel=0.1)
+        assert 'over the daily limit' not in summary
+        for recipe in meal_plan.values():
+            assert 0.5 <= recipe['Servings'] <= 2.0
+        for column, limit in (limits or {}).items():
+            assert sum(recipe[column] for recipe in meal_plan.values()) <= limit
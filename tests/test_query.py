@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.diet_app.data.keywords import build_keyword_index
+from src.diet_app.models.query import And, Compare, Flag, Not, Or, QueryEngine, QuerySyntaxError, Tag, tokenize
+
+
+@pytest.fixture
+def engine():
+    df = pd.DataFrame({
+        'RecipeId': [1, 2, 3, 4],
+        'MealCat': pd.Categorical(['Breakfast', 'Breakfast', 'Lunch/Dinner', 'Snacks']),
+        'Calories': np.array([200, 450, 700, np.nan], dtype=np.float32),
+        'ProteinContent': np.array([5, 25, 40, 2], dtype=np.float32),
+        'RankScore': np.array([4.0, 3.5, 3.0, 2.0], dtype=np.float32),
+        'Vegan': np.array([1, 0, 0, 1], dtype=np.int8),
+        'HighProtein': np.array([0, 1, 1, 0], dtype=np.int8),
+    })
+    return QueryEngine(df)
+
+
+@pytest.mark.parametrize('expression, tree', [
+    ('Vegan', Flag('Vegan')),
+    ('vegan and calories < 500', And((Flag('Vegan'), Compare('Calories', '<', 500.0)))),
+    ('Vegan OR HighProtein AND Calories >= 450',
+     Or((Flag('Vegan'), And((Flag('HighProtein'), Compare('Calories', '>=', 450.0)))))),
+    ('NOT (Vegan OR HighProtein)', Not(Or((Flag('Vegan'), Flag('HighProtein'))))),
+    ('ingredient:Peanut', Tag('ingredient', 'peanut')),
+    ('keyword:"one dish meal"', Tag('keyword', 'one dish meal')),
+    ('ProteinContent != -2.5', Compare('ProteinContent', '!=', -2.5)),
+])
+def test_compile_valid_expressions(engine, expression, tree):
+    assert engine.compile(expression) == tree
+
+
+@pytest.mark.parametrize('expression, rows', [
+    ('Vegan', [0, 3]),
+    ('Calories < 500', [0, 1]),
+    ('Calories != 450', [0, 2]),  # NaN never matches
+    ('HighProtein AND NOT Calories > 600', [1]),
+    ('category:Breakfast OR Vegan', [0, 1, 3]),
+    ('Vegan AND HighProtein', []),
+])
+def test_query_rows(engine, expression, rows):
+    assert engine.query(expression).tolist() == rows
+
+
+@pytest.mark.parametrize('expression', [
+    'Calories < abc',
+    'Calories <',
+    'Calories < 5 5',
+    'Calories << 5',
+    'Vegan AND',
+    '(Vegan',
+    'Vegan)',
+    'Vegan $',
+])
+def test_bad_syntax_and_literals(engine, expression):
+    with pytest.raises(QuerySyntaxError):
+        engine.compile(expression)
+
+
+@pytest.mark.parametrize('expression', ['Spicy', 'Spicy < 3', 'recipe:soup', 'Calories'])
+def test_unknown_columns_fields_and_bare_numeric_columns(engine, expression):
+    with pytest.raises(QuerySyntaxError):
+        engine.compile(expression)
+
+
+@pytest.mark.parametrize('expression', ['MealCat > 3', 'MealCat = 1', 'Vegan AND mealcat <= 0'])
+def test_comparisons_on_non_numeric_columns_are_syntax_errors(engine, expression):
+    with pytest.raises(QuerySyntaxError, match='not numeric'):
+        engine.query(expression)
+
+
+def test_page_rejects_non_numeric_sort_column(engine):
+    with pytest.raises(QuerySyntaxError):
+        engine.page('Vegan', sort_by='MealCat')
+
+
+def test_tokenize_keeps_field_terms_together():
+    assert tokenize('keyword:"a b" AND NOT x') == [('field', 'keyword:a b'), ('AND', 'AND'), ('NOT', 'NOT'),
+                                                   ('word', 'x')]
+
+
+def test_runtime_flag_from_keyword_rules(engine):
+    keywords = build_keyword_index(pd.Series([['Low Carb', 'Breakfast'], ['Low Carb', 'Dessert'], ['Dessert'], []]),
+                                   pd.Series([1, 2, 3, 4]))
+    engine = QueryEngine(engine.df, keyword_index=keywords)
+
+    assert keywords.define_flag(any_of=['low carb'], none_of=['dessert', 'no such tag']).tolist() == [1, 0, 0, 0]
+    assert keywords.define_flag(all_of=['low carb', 'no such tag']).tolist() == [0, 0, 0, 0]
+
+    assert engine.define_flag('Keto', any_of=['low carb']) == 2
+    assert engine.query('keto AND Calories > 300').tolist() == [1]
+    assert engine.query('NOT Keto').tolist() == [2, 3]
+    assert 'Keto' not in engine.df.columns
+    with pytest.raises(ValueError):
+        engine.define_flag('Vegan', any_of=['dessert'])
+    with pytest.raises(QuerySyntaxError):
+        QueryEngine(engine.df).define_flag('Keto', any_of=['low carb'])
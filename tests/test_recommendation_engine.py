@@ -0,0 +1,81 @@
+import importlib.util
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from src.diet_app.models.query import QueryEngine
+
+SCRIPT = Path(__file__).resolve().parents[1] / 'scripts' / 'recommendation_engine.py'
+
+
+@pytest.fixture(scope='module')
+def script():
+    spec = importlib.util.spec_from_file_location('recommendation_engine', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def planner(script, recipes, monkeypatch):
+    """The script with its worker state set up on the synthetic table instead of the dataset."""
+    for key, value in {'df': recipes, 'engine': QueryEngine(recipes), 'cube': None, 'names': None}.items():
+        monkeypatch.setitem(script._state, key, value)
+    return script
+
+
+def test_bounded_map_keeps_input_order_and_bounds_the_backlog(script):
+    max_in_flight = 3
+    lock = threading.Lock()
+    consumed = running = most_running = 0
+
+    def items():
+        nonlocal consumed
+        for i in range(20):
+            consumed += 1
+            yield i
+
+    def work(i):
+        nonlocal running, most_running
+        with lock:
+            running += 1
+            most_running = max(most_running, running)
+        # Early items are the slowest, so later ones finish first
+        time.sleep(0.002 * (20 - i))
+        with lock:
+            running -= 1
+        return i * i
+
+    results = []
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for result in script.bounded_map(executor, work, items(), max_in_flight):
+            # Read but not yet written: this result, those still queued and the next input
+            assert consumed - len(results) <= max_in_flight + 1
+            results.append(result)
+
+    assert results == [i * i for i in range(20)]
+    assert most_running <= max_in_flight
+
+
+def test_bad_lines_become_error_records(planner):
+    lines = [
+        json.dumps({'id': 'u1', 'preferences': {'calories': 'l'}, 'seed': 1}),
+        '{not json',
+        '',
+        '[1, 2]',
+        json.dumps({'id': 'u4', 'preferences': {}, 'colour': 'red'}),
+        json.dumps({'preferences': {'expression': 'Calories <'}}),
+    ]
+    results = [planner.plan_profile(item) for item in planner.read_profiles(io.StringIO('\n'.join(lines)))]
+
+    assert [result.get('id', result.get('line')) for result in results] == ['u1', 2, 4, 'u4', 6]
+    assert 'error' not in results[0] and results[0]['plans']
+    assert results[1]['error'].startswith('Invalid JSON')
+    assert results[2]['error'] == 'Each line must be a JSON object'
+    assert results[3]['error'] == 'ValueError: Unknown profile fields: colour'
+    assert 'error' in results[4] and 'plans' not in results[4]
@@ -0,0 +1,57 @@
+import numpy as np
+
+from src.diet_app.models.recommender import PLAN_NUTRIENTS, any_recipe, generate_meal_plans, within_bounds
+
+from conftest import counter
+
+SODIUM = PLAN_NUTRIENTS.index('SodiumContent')
+
+
+def test_within_bounds_only_tests_bounds_that_are_set():
+    block = np.array([[100, np.nan], [100, 5], [300, 5]], dtype=np.float32)
+    lower = np.array([50, -np.inf], dtype=np.float32)
+    upper = np.array([200, np.inf], dtype=np.float32)
+    assert within_bounds(block, lower, upper).tolist() == [True, True, False]
+    # A missing value still fails a bound that is set
+    assert within_bounds(block, upper=np.array([200, 10], dtype=np.float32)).tolist() == [False, True, False]
+
+
+def test_missing_unbounded_nutrient_does_not_reject_recipes(recipes, enabled_metrics):
+    recipes['FiberContent'] = np.nan
+    plans = generate_meal_plans(recipes, 2, 2000, 90, rng=np.random.default_rng(0))
+    assert all(meal_plan for meal_plan, _, _, _ in plans)
+    assert counter('fallback', reason='any_recipe') == 0
+    assert counter('fallback', reason='any_category') == 0
+
+
+def test_any_recipe_keeps_to_the_remaining_limits():
+    nutrients = np.zeros((4, len(PLAN_NUTRIENTS)), dtype=np.float32)
+    nutrients[:, SODIUM] = [900, 100, 800, 700]
+    budget = np.full(len(PLAN_NUTRIENTS), np.inf, dtype=np.float32)
+    budget[SODIUM] = 200
+    rng = np.random.default_rng(0)
+    assert {any_recipe(nutrients, budget, rng) for _ in range(20)} == {1}
+
+
+def test_plan_that_cannot_meet_a_limit_says_so(recipes):
+    (meal_plan, summary, _, _), = generate_meal_plans(recipes, 1, 2000, 90, nutrient_limits={'SodiumContent': 1},
+                                                      rng=np.random.default_rng(0))
+    assert meal_plan
+    assert 'over the daily limit for SodiumContent' in summary
+
+
+def test_any_recipe_prefers_unused_rows_and_repeats_only_when_nothing_is_left():
+    nutrients = np.zeros((3, len(PLAN_NUTRIENTS)), dtype=np.float32)
+    budget = np.full(len(PLAN_NUTRIENTS), np.inf, dtype=np.float32)
+    rng = np.random.default_rng(0)
+    used = np.array([True, False, True])
+    assert {any_recipe(nutrients, budget, rng, used) for _ in range(20)} == {1}
+    assert any_recipe(nutrients, budget, rng, np.ones(3, dtype=bool)) in {0, 1, 2}
+
+
+def test_last_resort_picks_do_not_repeat_recipes_across_plans(recipes, enabled_metrics):
+    # A calorie window nothing meets forces every slot onto the last-resort pick
+    plans = generate_meal_plans(recipes, 3, 20000, 1, tolerance=0.01, max_meals=4, rng=np.random.default_rng(0))
+    assert counter('fallback', reason='any_recipe') > 0
+    recipe_ids = [recipe['RecipeId'] for meal_plan, _, _, _ in plans for recipe in meal_plan.values()]
+    assert len(recipe_ids) == len(set(recipe_ids))
@@ -0,0 +1,82 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from src.diet_app.data import store as store_module
+from src.diet_app.data.store import PlanStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_module, '_RETRY_BACKOFF', 0)
+    plan_store = PlanStore(tmp_path / 'store.db', batch_size=50, flush_interval=5.0)
+    yield plan_store
+    plan_store.close()
+
+
+class FlakyConnection:
+    """Writer connection whose first ``failures`` batches fail like a locked database."""
+
+    def __init__(self, connection, failures):
+        self.connection = connection
+        self.failures = failures
+
+    def __enter__(self):
+        return self.connection.__enter__()
+
+    def __exit__(self, *exc):
+        return self.connection.__exit__(*exc)
+
+    def executemany(self, statement, rows):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError('database is locked')
+        return self.connection.executemany(statement, rows)
+
+    def close(self):
+        self.connection.close()
+
+
+def meal_plan(*recipe_ids):
+    return {f'Meal {i}': pd.Series({'RecipeId': recipe_id}) for i, recipe_id in enumerate(recipe_ids)}
+
+
+def test_queued_writes_are_readable_after_flush(store):
+    store.save_profile('u1', {'target_calories': 1800})
+    store.record_plan('u1', meal_plan(3, 1, 2), 1800, 90)
+    store.record_feedback('u1', 'accept', [1, 2])
+    assert store.flush()
+    assert store.get_profile('u1') == {'target_calories': 1800}
+    assert store.recent_recipe_ids('u1', days=1, flush=False).tolist() == [1, 2, 3]
+    history = store.plan_history('u1')
+    assert sorted(history['recipe_id']) == [1, 2, 3]
+    assert history['total_calories'].iloc[0] == 1800
+
+
+def test_failed_batch_is_retried(store):
+    store._writer_connection = FlakyConnection(store._writer_connection, failures=2)
+    store.record_plan('u1', meal_plan(7))
+    assert store.flush()
+    assert store.write_errors == 0
+    assert store.recent_recipe_ids('u1', days=1, flush=False).tolist() == [7]
+
+
+def test_flush_reports_rows_lost_after_retries(store):
+    store._writer_connection = FlakyConnection(store._writer_connection, failures=store_module._COMMIT_RETRIES + 1)
+    store.record_plan('u1', meal_plan(7, 8))
+    assert not store.flush()
+    assert store.write_errors == 3
+    assert isinstance(store.last_error, sqlite3.OperationalError)
+    # Later writes go through again, and flush only reports failures since it was called
+    store.record_plan('u1', meal_plan(9))
+    assert store.flush()
+    assert store.recent_recipe_ids('u1', days=1, flush=False).tolist() == [9]
+
+
+def test_recent_recipe_ids_does_not_wait_for_the_writer_by_default(store, monkeypatch):
+    store.record_plan('u1', meal_plan(4))
+    assert store.flush()
+    with monkeypatch.context() as patch:
+        patch.setattr(store, 'flush', lambda timeout=None: pytest.fail('recent_recipe_ids flushed'))
+        assert store.recent_recipe_ids('u1', days=1).tolist() == [4]
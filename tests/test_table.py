@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.diet_app.data.table import _COPY_ON_WRITE_OPTIONAL, RecipeTable
+
+
+@pytest.fixture
+def table():
+    return RecipeTable(pd.DataFrame({
+        'RecipeId': np.arange(4, dtype=np.int64),
+        'Calories': np.array([100, np.nan, 300, np.nan], dtype=np.float32),
+        'MealCat': pd.Categorical(['Breakfast', 'Snacks', 'Breakfast', 'Snacks']),
+    }))
+
+
+def test_writes_to_a_view_stay_local(table):
+    view = table.frame()
+    view.loc[view['RecipeId'] >= 2, 'Calories'] = 0
+    view.fillna({'Calories': -1}, inplace=True)
+    view['MealCat'] = view['MealCat'].cat.rename_categories({'Snacks': 'Snack'})
+    view.sort_values('RecipeId', ascending=False, inplace=True)
+
+    assert view['Calories'].tolist() == [0, 0, -1, 100]
+    fresh = table.frame()
+    np.testing.assert_array_equal(fresh['Calories'].to_numpy(), [100, np.nan, 300, np.nan])
+    assert fresh['MealCat'].tolist() == ['Breakfast', 'Snacks', 'Breakfast', 'Snacks']
+
+
+def test_shared_buffers_are_read_only(table):
+    view = table.frame()
+    assert np.shares_memory(view['Calories'].to_numpy(), table.frame()['Calories'].to_numpy())
+    with pytest.raises(ValueError, match='read-only'):
+        view['Calories'].to_numpy()[0] = 1
+
+
+@pytest.mark.skipif(not _COPY_ON_WRITE_OPTIONAL, reason='copy-on-write is always on from pandas 3.0')
+def test_table_refuses_to_build_without_copy_on_write():
+    with pd.option_context('mode.copy_on_write', False):
+        with pytest.raises(RuntimeError, match='enable_copy_on_write'):
+            RecipeTable(pd.DataFrame({'RecipeId': [1]}))
@@ -0,0 +1,26 @@
+import json
+
+from src.diet_app.data.loaders import LoadProgress
+from src.diet_app.utils.warmup import Warmup
+
+
+def test_status_carries_the_running_steps_progress():
+    seen = []
+
+    def load():
+        warmup.report(LoadProgress('filter', bytes_read=50, total_bytes=200, rows_read=10, elapsed=0.5))
+        seen.append(warmup.status())
+
+    def fail():
+        raise OSError('missing')
+
+    warmup = Warmup([('recipe table', load), ('recipe details', fail)], required=['recipe table'])
+    warmup.run()
+
+    assert seen[0]['current_step'] == 'recipe table'
+    assert seen[0]['progress']['bytes_read'] == 50
+    json.dumps(seen[0])
+    status = warmup.status()
+    # Cleared once the step is over; an optional step failing leaves the process ready
+    assert status['progress'] is None and warmup.progress is None
+    assert status['ready'] and status['errors'] == {'recipe details': 'OSError: missing'}